@@ -0,0 +1,212 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import ReadSessionLocal, session_scope
+from src.models.models import Restaurant, Video
+from src.services.video_processing.utils import query_chatgpt, search_location, store_video_data
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decouple import config
+from sqlalchemy import and_, delete, or_, select
+import argparse
+import boto3
+import json
+import logging
+import time
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+S3_PREFIX = 'video_data/'
+
+def iter_s3_sources(bucket, prefix=S3_PREFIX):
+    """Yield (video_id, loader) for every video_data JSON in the bucket, page by page"""
+    s3_client = boto3.client('s3')
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get('Contents', []):
+            key = item['Key']
+            if not key.endswith('.json'):
+                continue
+            video_id = os.path.splitext(os.path.basename(key))[0]
+            yield video_id, lambda key=key: json.loads(
+                s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+            )
+
+def iter_local_sources(directory):
+    """Yield (video_id, loader) for a local directory holding video_data JSON files"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            video_id = os.path.splitext(entry.name)[0]
+
+            def load(path=entry.path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            yield video_id, load
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+def current_db_places(video_id):
+    """(name, address) of the restaurants currently linked to the video"""
+    with session_scope(ReadSessionLocal) as db:
+        rows = db.execute(
+            select(Restaurant.name, Restaurant.location)
+            .join(Video, Video.restaurant_id == Restaurant.id)
+            .where(Video.video_id == video_id, Video.platform == 'tiktok')
+        ).all()
+    return {(name, location) for name, location in rows}
+
+def place_keys(places_data):
+    return {(place['name'], place.get('address', 'No address found')) for place in (places_data or {}).values()}
+
+def unlink_places(video_id, places):
+    """Delete the video's links to restaurants (name, address) the replay no longer finds"""
+    with session_scope() as db:
+        restaurant_ids = select(Restaurant.id).where(or_(*(
+            and_(Restaurant.name == name, Restaurant.location == location) for name, location in places
+        )))
+        return db.execute(
+            delete(Video).where(
+                Video.video_id == video_id,
+                Video.platform == 'tiktok',
+                Video.restaurant_id.in_(restaurant_ids)
+            )
+        ).rowcount
+
+def backfill_video(video_id, load, stages, apply):
+    """Replay one stored video through the downstream stages and diff the result against the DB"""
+    data = load()
+    extracted = data['extracted_data']
+
+    recommendations = extracted.get('recommendations')
+    if 'llm' in stages:
+        recommendations = query_chatgpt(extracted.get('description'), extracted.get('text_data'), extracted.get('audio_data'))
+
+    places_data = data.get('places_data') or {}
+    if 'geocode' in stages:
+        places_data = search_location(recommendations)
+
+    before = current_db_places(video_id)
+    after = place_keys(places_data)
+
+    if apply:
+        store_video_data(
+            video_id=video_id,
+            url=data.get('video_url'),
+            creator_info=data.get('creator_info') or {},
+            description=extracted.get('description'),
+            text_data=extracted.get('text_data'),
+            audio_data=extracted.get('audio_data'),
+            recommendations=recommendations,
+            places_data=places_data,
+            # A failed write must count as a failure, not be checkpointed as done
+            raise_errors=True
+        )
+        # update_database only adds links; drop the ones the new result no longer has
+        if before - after:
+            unlink_places(video_id, before - after)
+
+    return {
+        'video_id': video_id,
+        'recommendations_changed': recommendations != extracted.get('recommendations'),
+        'added': sorted(after - before),
+        'removed': sorted(before - after),
+        'unchanged': len(after & before),
+    }
+
+def backfill(sources, stages=('llm', 'geocode'), concurrency=4, checkpoint=None, report=None,
+             apply=False, limit=None):
+    done = load_checkpoint(checkpoint)
+    if done:
+        logger.info(f"Resuming backfill, {len(done)} videos already in checkpoint")
+
+    stats = {'processed': 0, 'failed': 0, 'changed': 0, 'added': 0, 'removed': 0}
+    start_time = time.time()
+    checkpoint_file = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+    report_file = open(report, 'a', encoding='utf-8') if report else None
+    in_flight = {}
+
+    def handle(futures):
+        for future in futures:
+            video_id = in_flight.pop(future)
+            try:
+                diff = future.result()
+            except Exception as e:
+                logger.error(f"Error backfilling video {video_id}: {str(e)}")
+                stats['failed'] += 1
+                continue
+
+            stats['processed'] += 1
+            stats['added'] += len(diff['added'])
+            stats['removed'] += len(diff['removed'])
+            if diff['added'] or diff['removed']:
+                stats['changed'] += 1
+                logger.info(f"Video {video_id}: +{diff['added']} -{diff['removed']}")
+            if report_file:
+                report_file.write(json.dumps(diff, ensure_ascii=False) + '\n')
+            if checkpoint_file:
+                checkpoint_file.write(video_id + '\n')
+                checkpoint_file.flush()
+
+            if stats['processed'] % 100 == 0:
+                elapsed = time.time() - start_time
+                logger.info(f"Backfilled {stats['processed']} videos ({stats['processed'] / elapsed:.1f}/s), "
+                            f"{stats['changed']} changed, {stats['failed']} failed")
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            submitted = 0
+            for video_id, load in sources:
+                if video_id in done:
+                    continue
+                if limit and submitted >= limit:
+                    break
+                in_flight[pool.submit(backfill_video, video_id, load, stages, apply)] = video_id
+                submitted += 1
+
+                # Keep the source stream from running ahead of the workers
+                if len(in_flight) >= concurrency * 2:
+                    finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    handle(finished)
+
+            handle(wait(list(in_flight)).done)
+    finally:
+        if checkpoint_file:
+            checkpoint_file.close()
+        if report_file:
+            report_file.close()
+
+    logger.info(f"Backfill finished in {time.time() - start_time:.2f} seconds: {stats}")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay stored video_data JSON through the LLM and geocoding stages"
+    )
+    parser.add_argument('--source-dir', help="Local directory of video_data JSON files (default: S3 bucket)")
+    parser.add_argument('--bucket', default=None, help="S3 bucket (default: AWS_S3_BUCKET)")
+    parser.add_argument('--stages', default='llm,geocode', help="Stages to rerun: llm, geocode or both")
+    parser.add_argument('--concurrency', type=int, default=4, help="Videos processed at once")
+    parser.add_argument('--checkpoint', default=None,
+                        help="File of finished video ids (default: one file per mode, so a dry run "
+                             "never makes --apply skip videos)")
+    parser.add_argument('--report', default='backfill_report.jsonl', help="Per-video diff against the database")
+    parser.add_argument('--limit', type=int, help="Stop after this many videos")
+    parser.add_argument('--apply', action='store_true', help="Write new results to S3 and the database")
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or ('backfill_checkpoint_apply.txt' if args.apply else 'backfill_checkpoint_dry_run.txt')
+    stages = tuple(stage.strip() for stage in args.stages.split(',') if stage.strip())
+    if args.source_dir:
+        sources = iter_local_sources(args.source_dir)
+    else:
+        sources = iter_s3_sources(args.bucket or config('AWS_S3_BUCKET'))
+
+    backfill(sources, stages, args.concurrency, checkpoint, args.report, args.apply, args.limit)
@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.orm import sessionmaker
+from src.models.models import Base, Restaurant, Tag, restaurant_tags
+from consolidate_tags import consolidate_tags, CONSOLIDATION_LOOKUP
+import argparse
+import logging
+import random
+import tempfile
+import time
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def seed_database(engine, num_restaurants, num_noise_tags, tags_per_restaurant):
+    """Seed a database with restaurants, consolidatable tags, noise tags and random associations"""
+    Base.metadata.create_all(engine)
+    tag_names = list(CONSOLIDATION_LOOKUP) + [f"noise tag {i}" for i in range(num_noise_tags)]
+
+    with engine.begin() as connection:
+        connection.execute(insert(Tag.__table__), [{'name': name} for name in tag_names])
+        connection.execute(insert(Restaurant.__table__), [
+            {
+                'name': f"Restaurant {i}",
+                'location': f"Street {i}",
+                'city': 'Benchmark',
+                'location_link': '',
+                'coordinates': '0,0',
+            }
+            for i in range(num_restaurants)
+        ])
+        tag_ids = [row.id for row in connection.execute(select(Tag.id))]
+        restaurant_ids = [row.id for row in connection.execute(select(Restaurant.id))]
+
+        rows = [
+            {'restaurant_id': restaurant_id, 'tag_id': tag_id}
+            for restaurant_id in restaurant_ids
+            for tag_id in random.sample(tag_ids, tags_per_restaurant)
+        ]
+        connection.execute(insert(restaurant_tags), rows)
+
+    logger.info(f"Seeded {num_restaurants} restaurants, {len(tag_names)} tags and {len(rows)} associations")
+
+def run_benchmark(num_restaurants, num_noise_tags, tags_per_restaurant, database_url=None):
+    """Seed a throwaway database and time a full consolidation run against it"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = database_url or f"sqlite:///{os.path.join(tmp_dir, 'consolidate_benchmark.db')}"
+        engine = create_engine(url)
+        seed_database(engine, num_restaurants, num_noise_tags, tags_per_restaurant)
+
+        db = sessionmaker(bind=engine)()
+        try:
+            dry_start = time.time()
+            dry_stats = consolidate_tags(db, dry_run=True)
+            dry_time = time.time() - dry_start
+
+            start = time.time()
+            stats = consolidate_tags(db)
+            elapsed = time.time() - start
+
+            remaining = db.execute(select(func.count()).select_from(restaurant_tags)).scalar()
+        finally:
+            db.close()
+            engine.dispose()
+
+    print(f"""
+            Tag Consolidation Benchmark:
+            ----------------------------
+            Restaurants: {num_restaurants:,}
+            Tags per restaurant: {tags_per_restaurant}
+            Noise tags: {num_noise_tags:,}
+            Dry run: {dry_time:.2f}s {dry_stats}
+            Consolidation: {elapsed:.2f}s {stats}
+            Associations left: {remaining:,}
+                    """)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark set-based tag consolidation on a seeded database")
+    parser.add_argument('--restaurants', type=int, default=100000)
+    parser.add_argument('--noise-tags', type=int, default=5000)
+    parser.add_argument('--tags-per-restaurant', type=int, default=8)
+    parser.add_argument('--database-url', help="Seed this database instead of a temporary SQLite file")
+    args = parser.parse_args()
+
+    run_benchmark(args.restaurants, args.noise_tags, args.tags_per_restaurant, args.database_url)
@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from pathlib import Path
+from src.services.video_processing.download_video import description_from_html
+import argparse
+import json
+import random
+import time
+
+FIXTURES = Path(__file__).parent.parent / 'tests' / 'fixtures'
+
+def soup_description(html):
+    """The previous extractor: parse the whole page and json.loads every script tag"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup.find_all('script'):
+        if script.string:
+            try:
+                json_data = json.loads(script.string)
+                if '__DEFAULT_SCOPE__' in json_data:
+                    scope = json_data['__DEFAULT_SCOPE__']
+                    if isinstance(scope, list):
+                        for item in scope:
+                            if 'webapp.video-detail' in item:
+                                return item['webapp.video-detail']['itemInfo']['itemStruct']['desc']
+                    elif isinstance(scope, dict):
+                        return scope['webapp.video-detail']['itemInfo']['itemStruct']['desc']
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    return None
+
+def pad_page(html, page_kb):
+    """Grow a fixture to roughly page_kb with the inline scripts and markup a live page carries"""
+    blocks = []
+    size = len(html)
+    while size < page_kb * 1024:
+        payload = {'module': random.getrandbits(32), 'items': [{'k': i, 'v': 'x' * 40} for i in range(200)]}
+        block = (f'<div class="css-{random.getrandbits(24):x}"><span>{"lorem ipsum " * 50}</span></div>\n'
+                 f'<script type="application/json">{json.dumps(payload)}</script>\n'
+                 f'<script>window.__m{random.getrandbits(16)} = function(a){{return a + 1;}};</script>\n')
+        blocks.append(block)
+        size += len(block)
+    insert_at = html.index('<body>') + len('<body>')
+    return html[:insert_at] + ''.join(blocks) + html[insert_at:]
+
+def time_extractor(extractor, pages, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for html in pages:
+            if not extractor(html):
+                raise AssertionError("Extractor found no description")
+    return (time.perf_counter() - start) / (repeats * len(pages))
+
+def run_benchmark(fixtures_dir, page_kb, repeats):
+    paths = sorted(Path(fixtures_dir).glob('*.html'))
+    pages = []
+    for path in paths:
+        html = path.read_text(encoding='utf-8')
+        if '__UNIVERSAL_DATA_FOR_REHYDRATION__' not in html:
+            continue  # The old extractor only understood __DEFAULT_SCOPE__ pages
+        pages.append(pad_page(html, page_kb) if page_kb else html)
+    if not pages:
+        raise SystemExit(f"No rehydration fixtures in {fixtures_dir}")
+
+    old = time_extractor(soup_description, pages, repeats)
+    new = time_extractor(description_from_html, pages, repeats)
+    average_kb = sum(len(html) for html in pages) / len(pages) / 1024
+
+    print(f"""
+            Description Extraction Benchmark:
+            ---------------------------------
+            Pages: {len(pages)} (avg {average_kb:,.0f} KB)
+            BeautifulSoup scan: {old * 1000:.2f} ms/page
+            Rehydration script: {new * 1000:.2f} ms/page
+            Speedup: {old / new:.1f}x
+                    """)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time description extraction on saved TikTok HTML pages")
+    parser.add_argument('--fixtures', default=str(FIXTURES), help="Directory of saved video pages (*.html)")
+    parser.add_argument('--page-kb', type=int, default=2048,
+                        help="Pad each page to about this size like a live page; 0 to use pages as saved")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(args.fixtures, args.page_kb, args.repeats)
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import logging
+import tempfile
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def run_benchmark(num_jobs, worker_counts, job_seconds):
+    """Drain num_jobs simulated jobs once per worker count and report throughput"""
+    from sqlalchemy import delete
+    from src.database import Base, engine, session_scope
+    from src.models.models import Job
+    from src.utils.job_queue import enqueue
+    from run_job_workers import run_workers
+
+    Base.metadata.create_all(engine, tables=[Job.__table__])
+    results = {}
+    for num_workers in worker_counts:
+        with session_scope() as db:
+            db.execute(delete(Job))
+            db.commit()
+            enqueue(db, [
+                {'video_id': str(i), 'url': f"https://www.tiktok.com/@benchmark/video/{i}", 'priority': i % 10}
+                for i in range(num_jobs)
+            ])
+        results[num_workers] = run_workers(num_workers, simulate=job_seconds, drain=True, report_interval=5)
+
+    print("\nWorkers  jobs/min  speedup")
+    for num_workers, throughput in results.items():
+        print(f"{num_workers:>7}  {throughput:>8.1f}  {throughput / results[worker_counts[0]]:>6.2f}x")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure job queue throughput as workers are added")
+    parser.add_argument('--jobs', type=int, default=200, help="Simulated jobs per run")
+    parser.add_argument('--workers', default='1,2,4,8', help="Comma-separated worker counts")
+    parser.add_argument('--job-seconds', type=float, default=0.1, help="Simulated work per job")
+    parser.add_argument('--database-url', help="Queue database (default: throwaway SQLite in WAL mode)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Must be set before src.database creates its engine
+        os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'job_queue_benchmark.db')}"
+        os.environ.setdefault('DB_ECHO', 'False')
+        run_benchmark(args.jobs, [int(n) for n in args.workers.split(',')], args.job_seconds)
@@ -4,8 +4,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.database import SessionLocal
 from src.models.models import Tag, Restaurant, restaurant_tags
-from sqlalchemy import func, and_
+from src.utils.tagging import insert_ignore, clear_tag_cache
+from sqlalchemy import func, select, delete, exists, case
+import argparse
 import logging
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -40,89 +43,115 @@ TAG_CONSOLIDATION = {
     'michelin': ['michelin'],
 }
 
-def consolidate_tags():
-    db = SessionLocal()
+def _compile_consolidation(mapping):
+    """Flatten a consolidation mapping into a tag name -> main tag lookup"""
+    lookup = {main_tag: main_tag for main_tag in mapping}
+    for main_tag, subtags in mapping.items():
+        for subtag in subtags:
+            # First main tag listing a subtag wins, as in the original loop order
+            lookup.setdefault(subtag, main_tag)
+    return lookup
+
+# Compiled once at import: every known tag name -> the main tag it folds into
+CONSOLIDATION_LOOKUP = _compile_consolidation(TAG_CONSOLIDATION)
+
+def consolidate_tags(db=None, dry_run=False):
+    """
+    Fold every known subtag into its main tag and drop all non-main tags.
+
+    Runs as a handful of set-based statements in a single transaction instead of
+    walking restaurants one by one:
+        1. create any missing main tags
+        2. INSERT ... SELECT the remapped (restaurant_id, main_tag_id) pairs
+        3. DELETE associations pointing at non-main tags
+        4. DELETE the non-main tags themselves
+
+    Args:
+        db: Optional session to run in (defaults to a new SessionLocal)
+        dry_run: Roll the transaction back and only report affected counts
+
+    Returns:
+        dict: Affected row counts per step
+    """
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+
+    main_tags = set(TAG_CONSOLIDATION.keys())
+    stats = {}
+    start_time = time.time()
+
     try:
-        # Get all existing tags
-        existing_tags = {tag.name: tag for tag in db.query(Tag).all()}
-        logger.info(f"Found {len(existing_tags)} existing tags")
+        # Only tags the lookup knows about matter for the remap
+        existing_tags = dict(
+            db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(CONSOLIDATION_LOOKUP))).all()
+        )
+        logger.info(f"Found {len(existing_tags)} existing tags covered by the consolidation mapping")
 
-        # Get set of main tags (the ones we want to keep)
-        main_tags = set(TAG_CONSOLIDATION.keys())
-        logger.info(f"Main consolidated tags: {main_tags}")
+        # 1. Create missing main tags
+        missing_main_tags = sorted(main_tags - set(existing_tags))
+        if missing_main_tags:
+            db.execute(insert_ignore(Tag.__table__), [{'name': name} for name in missing_main_tags])
+            existing_tags.update(
+                db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(missing_main_tags))).all()
+            )
+        stats['main_tags_created'] = len(missing_main_tags)
 
-        # Process each consolidation
-        for main_tag, subtags in TAG_CONSOLIDATION.items():
-            logger.info(f"\nProcessing consolidation for {main_tag}")
-            
-            # Get or create the main tag
-            if main_tag not in existing_tags:
-                main_tag_obj = Tag(name=main_tag)
-                db.add(main_tag_obj)
-                db.flush()
-                logger.info(f"Created new main tag: {main_tag}")
-            else:
-                main_tag_obj = existing_tags[main_tag]
-                logger.info(f"Using existing main tag: {main_tag}")
-
-            # Process each subtag
-            for subtag in subtags:
-                if subtag in existing_tags and subtag != main_tag:
-                    old_tag = existing_tags[subtag]
-                    
-                    # Find restaurants with the old tag
-                    restaurants = db.query(Restaurant)\
-                        .join(restaurant_tags)\
-                        .filter(restaurant_tags.c.tag_id == old_tag.id)\
-                        .all()
-                    
-                    # Update restaurant associations
-                    for restaurant in restaurants:
-                        if not db.query(restaurant_tags).filter(
-                            and_(
-                                restaurant_tags.c.restaurant_id == restaurant.id,
-                                restaurant_tags.c.tag_id == main_tag_obj.id
-                            )
-                        ).first():
-                            restaurant.tags.append(main_tag_obj)
-                            logger.info(f"Updated restaurant {restaurant.id} from {subtag} to {main_tag}")
-                    
-                    # Delete old tag association
-                    db.query(restaurant_tags).filter(restaurant_tags.c.tag_id == old_tag.id).delete()
-                    # Delete old tag
-                    db.query(Tag).filter(Tag.id == old_tag.id).delete()
-                    logger.info(f"Deleted old tag: {subtag}")
+        # old tag id -> main tag id, for every subtag present in the table
+        remap = {
+            tag_id: existing_tags[CONSOLIDATION_LOOKUP[name]]
+            for name, tag_id in existing_tags.items()
+            if name not in main_tags
+        }
+        logger.info(f"Remapping {len(remap)} subtags onto {len(main_tags)} main tags")
+
+        # 2. Copy associations onto the main tag, skipping pairs that already exist.
+        # restaurant_tags has no unique key on older databases, so guard explicitly.
+        stats['associations_remapped'] = 0
+        if remap:
+            existing_pair = restaurant_tags.alias('existing_pair')
+            new_tag_id = case(remap, value=restaurant_tags.c.tag_id)
+            remapped_pairs = (
+                select(restaurant_tags.c.restaurant_id, new_tag_id)
+                .where(restaurant_tags.c.tag_id.in_(list(remap)))
+                .where(~exists().where(
+                    existing_pair.c.restaurant_id == restaurant_tags.c.restaurant_id,
+                    existing_pair.c.tag_id == new_tag_id
+                ))
+                .distinct()
+            )
+            result = db.execute(
+                insert_ignore(restaurant_tags).from_select(['restaurant_id', 'tag_id'], remapped_pairs)
+            )
+            stats['associations_remapped'] = result.rowcount
+
+        # 3. Drop associations to every non-main tag (subtags and unconsolidated tags)
+        obsolete_tag_ids = select(Tag.id).where(Tag.name.notin_(main_tags))
+        result = db.execute(delete(restaurant_tags).where(restaurant_tags.c.tag_id.in_(obsolete_tag_ids)))
+        stats['associations_deleted'] = result.rowcount
+
+        # 4. Drop the non-main tags
+        result = db.execute(delete(Tag).where(Tag.name.notin_(main_tags)))
+        stats['tags_deleted'] = result.rowcount
 
+        if dry_run:
+            db.rollback()
+            logger.info(f"Dry run, rolled back. Would have applied: {stats}")
+        else:
             db.commit()
+            clear_tag_cache()
+            logger.info(f"Successfully consolidated tags: {stats}")
+
+        logger.info(f"Tag consolidation took {time.time() - start_time:.2f} seconds")
+        return stats
 
-        # Remove all tags that aren't main consolidated tags
-        for tag_name, tag in existing_tags.items():
-            if tag_name not in main_tags:
-                # Move any remaining restaurants to appropriate consolidated tags
-                restaurants = db.query(Restaurant)\
-                    .join(restaurant_tags)\
-                    .filter(restaurant_tags.c.tag_id == tag.id)\
-                    .all()
-                
-                if restaurants:
-                    logger.info(f"Removing unconsolidated tag: {tag_name} (used by {len(restaurants)} restaurants)")
-                    # Delete tag associations
-                    db.query(restaurant_tags).filter(restaurant_tags.c.tag_id == tag.id).delete()
-                    # Delete tag
-                    db.query(Tag).filter(Tag.id == tag.id).delete()
-                else:
-                    logger.info(f"Removing unused tag: {tag_name}")
-                    db.query(Tag).filter(Tag.id == tag.id).delete()
-
-        db.commit()
-        logger.info("\nSuccessfully consolidated tags")
-        
     except Exception as e:
         logger.error(f"Error in consolidate_tags: {str(e)}")
         db.rollback()
         raise
     finally:
-        db.close()
+        if owns_session:
+            db.close()
 
 def print_tag_statistics():
     db = SessionLocal()
@@ -164,6 +193,10 @@ def print_unconsolidated_tags():
         db.close()
 
 if __name__ == "__main__":
-    consolidate_tags()
+    parser = argparse.ArgumentParser(description="Consolidate restaurant tags into main tags")
+    parser.add_argument('--dry-run', action='store_true', help="Report affected counts without committing")
+    args = parser.parse_args()
+
+    consolidate_tags(dry_run=args.dry_run)
     print_tag_statistics()
     print_unconsolidated_tags()
\ No newline at end of file
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import SessionLocal
+from src.utils.restaurant_dedupe import (
+    MAX_DISTANCE_METERS,
+    NAME_SIMILARITY_THRESHOLD,
+    build_merge_map,
+    choose_canonical,
+    distance_meters,
+    find_duplicate_groups,
+    load_restaurant_points,
+    merge_restaurants,
+)
+import argparse
+import logging
+import time
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def print_report(groups, limit):
+    """Print duplicate groups with the canonical restaurant first"""
+    logger.info(f"\nFound {len(groups)} duplicate groups "
+                f"({sum(len(group) - 1 for group in groups)} restaurants to merge)")
+    for group in sorted(groups, key=len, reverse=True)[:limit]:
+        canonical = choose_canonical(group)
+        logger.info(f"\n{canonical.name} (id={canonical.id}, videos={canonical.video_count})")
+        for point in group:
+            if point.id == canonical.id:
+                continue
+            distance = distance_meters(canonical.latitude, canonical.longitude, point.latitude, point.longitude)
+            logger.info(f"  <- {point.name} (id={point.id}, videos={point.video_count}, {distance:.0f}m)")
+
+def dedupe_restaurants(dry_run=False, max_distance=MAX_DISTANCE_METERS,
+                       min_similarity=NAME_SIMILARITY_THRESHOLD, report_limit=50):
+    db = SessionLocal()
+    try:
+        start_time = time.time()
+        points = load_restaurant_points(db)
+        groups = find_duplicate_groups(points, max_distance, min_similarity)
+        logger.info(f"Duplicate detection took {time.time() - start_time:.2f} seconds")
+
+        print_report(groups, report_limit)
+        merge_map = build_merge_map(groups)
+
+        stats = merge_restaurants(db, merge_map)
+        if dry_run:
+            db.rollback()
+            logger.info(f"Dry run, rolled back. Would have applied: {stats}")
+        else:
+            db.commit()
+            logger.info(f"Successfully merged duplicate restaurants: {stats}")
+
+        return stats
+
+    except Exception as e:
+        logger.error(f"Error in dedupe_restaurants: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find and merge near-duplicate restaurants")
+    parser.add_argument('--dry-run', action='store_true', help="Report duplicates and counts without committing")
+    parser.add_argument('--max-distance', type=float, default=MAX_DISTANCE_METERS, help="Match radius in meters")
+    parser.add_argument('--min-similarity', type=float, default=NAME_SIMILARITY_THRESHOLD,
+                        help="Minimum normalized name similarity (0-1)")
+    parser.add_argument('--report-limit', type=int, default=50, help="Number of groups to print")
+    args = parser.parse_args()
+
+    dedupe_restaurants(args.dry_run, args.max_distance, args.min_similarity, args.report_limit)
@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.video_processing.artifact_store import get_artifact_store, media_present
+from src.services.video_processing.download_manager import DownloadManager
+from src.services.video_processing.download_video import parse_video_id
+import aiohttp
+import argparse
+import asyncio
+import time
+
+def read_urls(paths):
+    for path in paths or ['-']:
+        with (sys.stdin if path == '-' else open(path)) as f:
+            for line in f:
+                url = line.strip()
+                if url and not url.startswith('#'):
+                    yield url
+
+def needs_download(store, url):
+    video_id = parse_video_id(url)
+    return not video_id or not media_present(store.get(video_id, 'download'))
+
+async def prefetch(urls, report_interval, max_concurrent=None, host_rate=None):
+    """
+    Download URLs concurrently and checkpoint them as completed download stages, so a
+    later process_video (or job worker) on this node starts at transcription. All
+    downloads share one pooled client session.
+    """
+    store = get_artifact_store()
+    last_report = time.time()
+    async with aiohttp.ClientSession() as session:
+        manager = DownloadManager(max_concurrent=max_concurrent, host_rate=host_rate, session=session)
+        async for result in manager.download_all(url for url in urls if needs_download(store, url)):
+            if result.ok:
+                store.put(result.video_id, 'download', result.artifact())
+                print(f"{result.video_id}: {result.bytes / 1024 / 1024:.1f} MB in {result.seconds:.1f}s")
+            else:
+                print(f"FAILED {result.url}: {result.error}")
+            if time.time() - last_report >= report_interval:
+                print(manager.report())
+                last_report = time.time()
+        print(manager.report())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download videos concurrently into the artifact store")
+    parser.add_argument('files', nargs='*', help="Files with one video URL per line (default: stdin)")
+    parser.add_argument('--concurrency', type=int, help="Downloads in flight (default DOWNLOAD_CONCURRENCY)")
+    parser.add_argument('--host-rate', type=float,
+                        help="Requests per second per host, 0 for no limit (default DOWNLOAD_HOST_RATE)")
+    parser.add_argument('--report-interval', type=float, default=30, help="Seconds between throughput reports")
+    args = parser.parse_args()
+
+    asyncio.run(prefetch(read_urls(args.files), args.report_interval, args.concurrency, args.host_rate))
@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import session_scope
+from src.models.models import VideoFailure
+from src.utils.failure_ledger import failure_summary, release
+from sqlalchemy import select
+import argparse
+
+def print_summary(db):
+    rows = failure_summary(db)
+    if not rows:
+        print("No failed videos in the ledger")
+        return
+
+    print(f"{'stage':<12} {'error':<28} {'videos':>7} {'attempts':>9} {'wall h':>8} {'cpu h':>8} {'quarantined':>12}")
+    for row in rows:
+        print(f"{row['stage'] or '-':<12} {row['error_class'] or '-':<28} {row['videos']:>7} {row['attempts']:>9} "
+              f"{row['wasted_seconds'] / 3600:>8.2f} {row['wasted_cpu_seconds'] / 3600:>8.2f} {row['quarantined']:>12}")
+    print(f"Total wasted: {sum(row['wasted_seconds'] for row in rows) / 3600:.2f} wall hours, "
+          f"{sum(row['wasted_cpu_seconds'] for row in rows) / 3600:.2f} CPU hours")
+
+def print_quarantined(db):
+    failures = db.execute(
+        select(VideoFailure).where(VideoFailure.quarantined.is_(True)).order_by(VideoFailure.last_failed_at.desc())
+    ).scalars().all()
+    print(f"\n{len(failures)} quarantined videos:")
+    for failure in failures:
+        print(f"  {failure.video_id} {failure.stage} {failure.error_class} x{failure.attempts}: "
+              f"{(failure.error_message or '')[:100]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wasted compute by failure type and quarantined videos")
+    parser.add_argument('--quarantined', action='store_true', help="List quarantined videos")
+    parser.add_argument('--release', metavar='VIDEO_ID', nargs='+', help="Clear these videos from the ledger")
+    args = parser.parse_args()
+
+    with session_scope() as db:
+        if args.release:
+            for video_id in args.release:
+                print(f"{video_id}: {'released' if release(db, video_id) else 'not in the ledger'}")
+        else:
+            print_summary(db)
+            if args.quarantined:
+                print_quarantined(db)
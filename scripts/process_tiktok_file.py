@@ -6,12 +6,8 @@ import logging
 import warnings
 import sys
 import os
-from sqlalchemy import select, text
-import psutil
-import datetime
-# Add garbage collection after each video
-import gc
-import glob 
+from sqlalchemy import func, select, text
+from itertools import islice
 
 # Add project root to path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -36,61 +32,23 @@ logger.addHandler(stream_handler)
 print("Logging system initialized")
 
 from src.tasks.video_tasks import process_video
-from src.database import SessionLocal
-from src.models.models import Video, ProcessedVideo, Tag, Restaurant, restaurant_tags
+from src.services.video_processing.download_video import DownloadConfig
+from src.services.video_processing.media_cache import get_media_cache
+from src.database import session_scope
+from src.models.models import Video, ProcessedVideo
+from src.utils.resource_monitor import RssTracker, YieldTracker, log_system_resources
+from src.utils.video_priority import CandidateQueue, score_video
+from src.utils.tagging import assign
+from src.utils.video_leases import canonical_video_id, video_lease
+from src.utils.failure_ledger import failure_tracking
+from src.utils.job_queue import enqueue
+from decouple import config
 
-def ensure_tag(db_session, tag_name):
-    """Ensure tag exists in database"""
-    try:
-        tag = db_session.query(Tag).filter(Tag.name == tag_name).first()
-        if not tag:
-            logger.info(f"Creating new '{tag_name}' tag")
-            tag = Tag(name=tag_name)
-            db_session.add(tag)
-            db_session.commit()
-            logger.info(f"Successfully created '{tag_name}' tag")
-        return tag
-    except Exception as e:
-        logger.error(f"Error ensuring {tag_name} tag: {e}")
-        db_session.rollback()
-        raise
-
-def add_tags_to_restaurant(db_session, restaurant_id):
-    """Add curated and michelin tags to a restaurant"""
-    try:
-        # Get or create both tags
-        curated_tag = ensure_tag(db_session, "curated")
-        michelin_tag = ensure_tag(db_session, "michelin")
-        
-        # Get restaurant
-        restaurant = db_session.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-        
-        if restaurant:
-            # Add curated tag if not present
-            if curated_tag not in restaurant.tags:
-                logger.info(f"Adding curated tag to restaurant: {restaurant.name}")
-                restaurant.tags.append(curated_tag)
-            
-            # Add michelin tag if not present
-            if michelin_tag not in restaurant.tags:
-                logger.info(f"Adding michelin tag to restaurant: {restaurant.name}")
-                restaurant.tags.append(michelin_tag)
-            
-            db_session.commit()
-            logger.info(f"Successfully added tags to restaurant: {restaurant.name}")
-        else:
-            logger.error(f"Restaurant {restaurant_id} not found")
-            
-    except Exception as e:
-        logger.error(f"Error adding tags to restaurant {restaurant_id}: {e}")
-        db_session.rollback()
-        raise
+# Tags given to every restaurant found through the Michelin crawl
+MICHELIN_TAGS = ["curated", "michelin"]
 
-def video_exists(video_id: str, db_session) -> bool:
-    """Check if video has been processed before"""
-    query = select(ProcessedVideo).where(ProcessedVideo.video_id == video_id)
-    result = db_session.execute(query).first()
-    return result is not None
+# Feed the jobs table for run_job_workers.py instead of processing videos here
+ENQUEUE_ONLY = config('ENQUEUE_ONLY', default=False, cast=bool)
 
 def mark_video_as_processed(video_id: str, url: str, has_restaurants: bool, db_session):
     """Mark a video as processed in the database"""
@@ -108,61 +66,13 @@ def mark_video_as_processed(video_id: str, url: str, has_restaurants: bool, db_s
         print(f"Error marking video as processed: {e}")
         db_session.rollback()
 
-def log_system_resources():
-    """Log current system resource usage"""
-    try:
-        # CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1)
-        
-        # Memory usage
-        memory = psutil.virtual_memory()
-        memory_used_gb = memory.used / (1024 * 1024 * 1024)  # Convert to GB
-        memory_total_gb = memory.total / (1024 * 1024 * 1024)  # Convert to GB
-        memory_percent = memory.percent
-        
-        # Disk usage
-        disk = psutil.disk_usage('/')
-        disk_used_gb = disk.used / (1024 * 1024 * 1024)  # Convert to GB
-        disk_total_gb = disk.total / (1024 * 1024 * 1024)  # Convert to GB
-        
-        print(f"""
-            System Resources:
-            ----------------
-            Time: {datetime.datetime.now()}
-            CPU Usage: {cpu_percent}%
-            Memory: {memory_used_gb:.2f}GB / {memory_total_gb:.2f}GB ({memory_percent}%)
-            Disk: {disk_used_gb:.2f}GB / {disk_total_gb:.2f}GB ({disk.percent}%)
-                    """)
-    except Exception as e:
-        print(f"Error logging system resources: {e}")
-
 def cleanup_files():
-    """Clean up audio and video files"""
+    """Keep the media cache within its disk budget and drop stale partial downloads"""
     try:
-        # Paths to clean
-        audio_path = "/home/ec2-user/maps-server-processing/files/audio/*.wav"
-        video_path = "/home/ec2-user/maps-server-processing/files/video/*.mp4"
-        
-        # Remove audio files
-        audio_files = glob.glob(audio_path)
-        for file in audio_files:
-            try:
-                os.remove(file)
-                print(f"Removed audio file: {file}")
-            except Exception as e:
-                print(f"Error removing audio file {file}: {e}")
-        
-        # Remove video files
-        video_files = glob.glob(video_path)
-        for file in video_files:
-            try:
-                os.remove(file)
-                print(f"Removed video file: {file}")
-            except Exception as e:
-                print(f"Error removing video file {file}: {e}")
-                
-        print(f"Cleanup complete. Removed {len(audio_files)} audio files and {len(video_files)} video files")
-        
+        cache = get_media_cache()
+        cache.evict()
+        staging = DownloadConfig()
+        cache.sweep([staging.video_path, staging.audio_path])
     except Exception as e:
         print(f"Error during cleanup: {e}")
 
@@ -239,8 +149,16 @@ def search_tiktok_videos(restaurant_name, city, max_videos=5):
                             
                             video_info = {
                                 'url': f"https://www.tiktok.com/@{video.author.unique_id}/video/{video.id}",
+                                'video_id': str(video.id),
                                 'views': video.stats.play_count,
                                 'likes': video.stats.digg_count,
+                                'priority': score_video(
+                                    video.stats.play_count,
+                                    video.stats.digg_count,
+                                    created_at=getattr(video, 'create_time', None),
+                                    description=video.desc,
+                                    hashtags=video_hashtags
+                                ),
                                 'creator': video.author.unique_id,
                                 'description': video.desc,
                                 'matched_keywords': matched_keywords,
@@ -263,71 +181,71 @@ def search_tiktok_videos(restaurant_name, city, max_videos=5):
                     logger.error(f"Error processing hashtag {hashtag}: {str(e)}")
                     continue
         
-        # Remove duplicates based on URL
-        unique_videos = {v['url']: v for v in all_videos}.values()
-        
-        # Sort all collected videos by views and return top max_videos
-        sorted_videos = sorted(unique_videos, key=lambda x: x['views'], reverse=True)
-        return sorted_videos[:max_videos]
+        # Deduplicate by video id and return the top max_videos by priority
+        # (views, likes, recency, restaurant likelihood)
+        return list(islice(CandidateQueue(all_videos).drain(), max_videos))
             
     except Exception as e:
         print(f"Error searching TikTok for {restaurant_name}: {str(e)}")
         return []
     
-def process_video_url(video_url, video_id, db):
+def process_video_url(video_url, video_id, tracker=None, yield_tracker=None):
     """
     Process a TikTok video
     """
     print("1. Starting to process video...")
     # Process the video
     print(f"Processing video: {video_url}")
-    process_video(video_url)
-    
-    print("2. Video processed, committing changes...")
-    db.commit()
+    with failure_tracking(video_id, video_url):
+        process_video(video_url)
     
-    print("3. About to execute raw SQL query...")
-    raw_result = db.execute(
-        text("""
-            SELECT id, video_id, restaurant_id FROM videos WHERE video_id = :vid
-        """), 
-        {'vid': str(video_id)}
-    ).first()
-    print('4. Raw SQL result: ', raw_result)
-    
-    has_restaurants = False
-    if raw_result and raw_result.restaurant_id:
-        print("5. Found restaurant_id: ", raw_result.restaurant_id)
-        has_restaurants = True
-        print(f"Restaurant found for video {video_id}, restaurant_id: {raw_result.restaurant_id}")
-        add_tags_to_restaurant(db, raw_result.restaurant_id)
-        print(f"Added tags to restaurant {raw_result.restaurant_id}")
-    else:
-        print("5. No restaurant found")
-        print(f"No restaurant found for video {video_id}")
+    # Fresh session per video so loaded objects never accumulate over the crawl
+    with session_scope() as db:
+        print("3. About to execute raw SQL query...")
+        raw_result = db.execute(
+            text("""
+                SELECT id, video_id, restaurant_id FROM videos WHERE video_id = :vid
+            """), 
+            {'vid': str(video_id)}
+        ).first()
+        print('4. Raw SQL result: ', raw_result)
+        restaurants = db.execute(
+            select(func.count(Video.id)).where(Video.video_id == str(video_id))
+        ).scalar()
+        
+        has_restaurants = False
+        if raw_result and raw_result.restaurant_id:
+            print("5. Found restaurant_id: ", raw_result.restaurant_id)
+            has_restaurants = True
+            print(f"Restaurant found for video {video_id}, restaurant_id: {raw_result.restaurant_id}")
+            assign(db, MICHELIN_TAGS, [raw_result.restaurant_id])
+            print(f"Added tags to restaurant {raw_result.restaurant_id}")
+        else:
+            print("5. No restaurant found")
+            print(f"No restaurant found for video {video_id}")
 
-    print('6. has_restaurants: ', has_restaurants)
-    print('7. raw_result: ', raw_result)
-    
-    mark_video_as_processed(video_id, video_url, has_restaurants, db)
+        print('6. has_restaurants: ', has_restaurants)
+        print('7. raw_result: ', raw_result)
+        
+        mark_video_as_processed(video_id, video_url, has_restaurants, db)
     
-    # Log resources after processing each video
-    log_system_resources()
+    # Log resources, per-video memory growth and yield after processing each video
+    if tracker:
+        tracker.record_video()
+    if yield_tracker:
+        yield_tracker.record(restaurants)
+    log_system_resources(tracker, yield_tracker)
     
     # Clean up files after processing each video
     cleanup_files()
-    
-    # Force garbage collection
-    gc.collect()
-    
-    time.sleep(5)
 
 def process_michelin_file(file_path):
     """
     Process Michelin restaurants JSON file and search for TikTok videos
     """
     global logger  # Use the global logger instance
-    db = SessionLocal()
+    tracker = RssTracker()
+    yield_tracker = YieldTracker()
     
     try:
         # Test log
@@ -367,7 +285,7 @@ def process_michelin_file(file_path):
                 for i, video in enumerate(videos, 1):
 
                     video_url = video['url']
-                    video_id = video_url.split('/')[-1]
+                    video_id = canonical_video_id(video_url)
 
                     print(f"\n{i}. Video URL: {video_url}")
                     print(f"   Video ID: {video_id}")
@@ -378,12 +296,19 @@ def process_michelin_file(file_path):
                     print(f"   Description: {video['description'][:200]}...")
                     print(f"   Matched keywords: {', '.join(video['matched_keywords'])}")
 
+                    if ENQUEUE_ONLY:
+                        with session_scope() as db:
+                            enqueue(db, [{'video_id': video_id, 'url': video_url, 'priority': video['priority']}])
+                        continue
+
                     try:
-                        if video_exists(video_id, db):
-                            logger.info(f"Skipping video {video_id} - already processed")
-                            continue
+                        # Lease the video so concurrent crawlers never process it twice
+                        with video_lease(video_id) as acquired:
+                            if not acquired:
+                                logger.info(f"Skipping video {video_id} - already processed or claimed")
+                                continue
 
-                        process_video_url(video_url, video_id, db)
+                            process_video_url(video_url, video_id, tracker, yield_tracker)
 
                     except Exception as e:
                         print(f"Error processing video {video_url}: {str(e)}")
@@ -1,7 +1,7 @@
 from tiktokapipy.api import TikTokAPI
 from typing import List
-import time
-from sqlalchemy import select
+from sqlalchemy import func, select
+from itertools import islice
 import sys
 import os
 import logging
@@ -19,8 +19,17 @@ project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
 from src.tasks.video_tasks import process_video
-from src.database import SessionLocal
+from src.database import session_scope
 from src.models.models import Video, ProcessedVideo
+from src.utils.resource_monitor import RssTracker, YieldTracker, log_system_resources
+from src.utils.video_priority import CandidateQueue, score_video
+from src.utils.video_leases import canonical_video_id, video_lease
+from src.utils.failure_ledger import failure_tracking
+from src.utils.job_queue import enqueue
+from decouple import config
+
+# Feed the jobs table for run_job_workers.py instead of processing videos here
+ENQUEUE_ONLY = config('ENQUEUE_ONLY', default=False, cast=bool)
 
 # Barcelona-specific restaurant hashtags
 BARCELONA_HASHTAGS = [
@@ -134,34 +143,38 @@ def get_challenge_videos(hashtag: str, max_videos: int = 10) -> List[dict]:
             challenge = api.challenge(hashtag, video_limit=max_videos)
             
             logger.info("Opening database session")
-            db = SessionLocal()
+            with session_scope() as db:
+                logger.info("Starting to process videos")
+                for video in challenge.videos:
+                    video_id = str(video.id)
+                    logger.debug(f"Processing video ID: {video_id}")
+                    
+                    if video_exists(video_id, db):
+                        logger.debug(f"Video {video_id} already exists, skipping")
+                        continue
+                    
+                    try:
+                        views = getattr(video.stats, 'play_count', 0)
+                        likes = getattr(video.stats, 'digg_count', 0)
+                        video_info = {
+                            'url': f"https://www.tiktok.com/@{video.author.unique_id}/video/{video_id}",
+                            'views': views,
+                            'likes': likes,
+                            'video_id': video_id,
+                            'priority': score_video(
+                                views, likes,
+                                created_at=getattr(video, 'create_time', None),
+                                description=getattr(video, 'desc', None),
+                                hashtags=[hashtag] + list(getattr(video, 'hashtags', None) or [])
+                            )
+                        }
+                        video_data.append(video_info)
+                    except AttributeError as e:
+                        logger.error(f"Skipping video due to missing attributes: {e}")
+                        continue
             
-            logger.info("Starting to process videos")
-            for video in challenge.videos:
-                video_id = str(video.id)
-                logger.debug(f"Processing video ID: {video_id}")
-                
-                if video_exists(video_id, db):
-                    logger.debug(f"Video {video_id} already exists, skipping")
-                    continue
-                
-                try:
-                    video_info = {
-                        'url': f"https://www.tiktok.com/@{video.author.unique_id}/video/{video_id}",
-                        'views': getattr(video.stats, 'play_count', 0),
-                        'likes': getattr(video.stats, 'digg_count', 0),
-                        'video_id': video_id
-                    }
-                    video_data.append(video_info)
-                except AttributeError as e:
-                    logger.error(f"Skipping video due to missing attributes: {e}")
-                    continue
-            
-            db.close()
-            
-            # Sort videos by view count (descending)
-            video_data.sort(key=lambda x: x['views'], reverse=True)
-            return video_data[:max_videos]
+            # Highest-value videos first (views, likes, recency, restaurant likelihood)
+            return list(islice(CandidateQueue(video_data).drain(), max_videos))
                 
         except Exception as e:
             logger.error(f"Error fetching challenge videos: {e}", exc_info=True)
@@ -173,47 +186,62 @@ def process_hashtag_videos(hashtag: str, max_videos: int = 100):
     videos = get_challenge_videos(hashtag, max_videos)
     logger.info(f"Found {len(videos)} new videos to process")
     
-    db = SessionLocal()
+    if ENQUEUE_ONLY:
+        with session_scope() as db:
+            enqueue(db, [
+                {'video_id': canonical_video_id(video['video_id']), 'url': video['url'], 'priority': video['priority']}
+                for video in videos
+            ])
+        return
+    
+    tracker = RssTracker()
+    yield_tracker = YieldTracker()
     
     for i, video in enumerate(videos, 1):
         try:
-            video_id = video['video_id']
+            video_id = canonical_video_id(video['video_id'])
             video_url = video['url']
             
-            # Skip if video was already processed
-            if video_exists(video_id, db):
-                logger.info(f"Skipping video {video_id} - already processed")
-                continue
+            # Lease the video so concurrent crawlers never process it twice
+            with video_lease(video_id) as acquired:
+                if not acquired:
+                    logger.info(f"Skipping video {video_id} - already processed or claimed")
+                    continue
+                    
+                logger.info(f"Processing video {i}/{len(videos)}: {video_url}")
+                logger.info(f"Views: {video.get('views', 'N/A')}")
                 
-            logger.info(f"Processing video {i}/{len(videos)}: {video_url}")
-            logger.info(f"Views: {video.get('views', 'N/A')}")
+                try:
+                    # Process the video
+                    with failure_tracking(video_id, video_url):
+                        process_video(video_url)
+                    
+                    # Fresh session per video, opened only after processing so no pooled
+                    # connection is held through download, extraction and the LLM call
+                    with session_scope() as db:
+                        # Check if restaurants were found (video exists in the Video table)
+                        restaurants = db.execute(
+                            select(func.count(Video.id)).where(Video.video_id == video_id)
+                        ).scalar()
+                        has_restaurants = restaurants > 0
+                        yield_tracker.record(restaurants)
+                        
+                        # Mark video as processed
+                        mark_video_as_processed(video_id, video_url, has_restaurants, db)
+                    
+                except Exception as e:
+                    # The failure ledger decides when (or whether) the video is retried
+                    logger.error(f"Failed to process video {video_url}: {str(e)}")
+                    yield_tracker.record(0)
+                    continue
             
-            try:
-                # Process the video
-                process_video(video_url)
-                
-                # Check if restaurants were found (video exists in the Video table)
-                has_restaurants = db.execute(
-                    select(Video).where(Video.video_id == video_id)
-                ).first() is not None
-                
-                # Mark video as processed
-                mark_video_as_processed(video_id, video_url, has_restaurants, db)
-                
-            except Exception as e:
-                # If processing fails, still mark it as processed but with no restaurants
-                logger.error(f"Failed to process video {video_url}: {str(e)}")
-                mark_video_as_processed(video_id, video_url, False, db)
-                continue
-                
-            # Add longer sleep between videos to avoid rate limiting
-            time.sleep(5)
+            # Log per-video memory growth
+            tracker.record_video()
+            log_system_resources(tracker, yield_tracker)
             
         except Exception as e:
             logger.error(f"Error processing video entry: {str(e)}")
             continue
-    
-    db.close()
 
 if __name__ == "__main__":
     total_processed = 0
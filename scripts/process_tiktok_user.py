@@ -1,12 +1,8 @@
 import yt_dlp
 import logging
-from sqlalchemy import select, text
-import time
+from sqlalchemy import func, select, text
 import sys
 import os
-import psutil
-import datetime
-import glob
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -17,53 +13,20 @@ project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
 from src.tasks.video_tasks import process_video
-from src.database import SessionLocal
-from src.models.models import Video, ProcessedVideo, Tag, Restaurant, restaurant_tags
+from src.services.video_processing.download_video import DownloadConfig
+from src.services.video_processing.media_cache import get_media_cache
+from src.database import session_scope
+from src.models.models import Video, ProcessedVideo
+from src.utils.resource_monitor import RssTracker, YieldTracker, log_system_resources
+from src.utils.video_priority import CandidateQueue, score_video
+from src.utils.tagging import assign
+from src.utils.video_leases import canonical_video_id, video_lease
+from src.utils.failure_ledger import failure_tracking
+from src.utils.job_queue import enqueue
+from decouple import config
 
-def ensure_curated_tag(db_session):
-    """Ensure 'curated' tag exists in database"""
-    try:
-        curated_tag = db_session.query(Tag).filter(Tag.name == "curated").first()
-        if not curated_tag:
-            logger.info("Creating new 'curated' tag")
-            curated_tag = Tag(name="curated")
-            db_session.add(curated_tag)
-            db_session.commit()
-            logger.info("Successfully created 'curated' tag")
-        return curated_tag
-    except Exception as e:
-        logger.error(f"Error ensuring curated tag: {e}")
-        db_session.rollback()
-        raise
-
-def add_curated_tag_to_restaurant(db_session, restaurant_id):
-    """Add curated tag to a restaurant"""
-    try:
-        # Get or create curated tag
-        curated_tag = ensure_curated_tag(db_session)
-        
-        # Get restaurant
-        restaurant = db_session.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-        
-        if restaurant and curated_tag:
-            # Check if tag is already assigned
-            if curated_tag not in restaurant.tags:
-                logger.info(f"Adding curated tag to restaurant: {restaurant.name}")
-                restaurant.tags.append(curated_tag)
-                db_session.commit()
-                logger.info(f"Successfully added curated tag to restaurant: {restaurant.name}")
-            else:
-                logger.info(f"Restaurant {restaurant.name} already has curated tag")
-    except Exception as e:
-        logger.error(f"Error adding curated tag to restaurant {restaurant_id}: {e}")
-        db_session.rollback()
-        raise
-
-def video_exists(video_id: str, db_session) -> bool:
-    """Check if video has been processed before"""
-    query = select(ProcessedVideo).where(ProcessedVideo.video_id == video_id)
-    result = db_session.execute(query).first()
-    return result is not None
+# Feed the jobs table for run_job_workers.py instead of processing videos here
+ENQUEUE_ONLY = config('ENQUEUE_ONLY', default=False, cast=bool)
 
 def mark_video_as_processed(video_id: str, url: str, has_restaurants: bool, db_session):
     """Mark a video as processed in the database"""
@@ -81,71 +44,24 @@ def mark_video_as_processed(video_id: str, url: str, has_restaurants: bool, db_s
         logger.error(f"Error marking video as processed: {e}")
         db_session.rollback()
 
-def log_system_resources():
-    """Log current system resource usage"""
-    try:
-        # CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1)
-        
-        # Memory usage
-        memory = psutil.virtual_memory()
-        memory_used_gb = memory.used / (1024 * 1024 * 1024)  # Convert to GB
-        memory_total_gb = memory.total / (1024 * 1024 * 1024)  # Convert to GB
-        memory_percent = memory.percent
-        
-        # Disk usage
-        disk = psutil.disk_usage('/')
-        disk_used_gb = disk.used / (1024 * 1024 * 1024)  # Convert to GB
-        disk_total_gb = disk.total / (1024 * 1024 * 1024)  # Convert to GB
-        
-        logger.info(f"""
-System Resources:
-----------------
-Time: {datetime.datetime.now()}
-CPU Usage: {cpu_percent}%
-Memory: {memory_used_gb:.2f}GB / {memory_total_gb:.2f}GB ({memory_percent}%)
-Disk: {disk_used_gb:.2f}GB / {disk_total_gb:.2f}GB ({disk.percent}%)
-        """)
-    except Exception as e:
-        logger.error(f"Error logging system resources: {e}")
-
 def cleanup_files():
-    """Clean up audio and video files"""
+    """Keep the media cache within its disk budget and drop stale partial downloads"""
     try:
-        # Paths to clean
-        audio_path = "/home/ec2-user/maps-server-processing/files/audio/*.wav"
-        video_path = "/home/ec2-user/maps-server-processing/files/video/*.mp4"
-        
-        # Remove audio files
-        audio_files = glob.glob(audio_path)
-        for file in audio_files:
-            try:
-                os.remove(file)
-                logger.info(f"Removed audio file: {file}")
-            except Exception as e:
-                logger.error(f"Error removing audio file {file}: {e}")
-        
-        # Remove video files
-        video_files = glob.glob(video_path)
-        for file in video_files:
-            try:
-                os.remove(file)
-                logger.info(f"Removed video file: {file}")
-            except Exception as e:
-                logger.error(f"Error removing video file {file}: {e}")
-                
-        logger.info(f"Cleanup complete. Removed {len(audio_files)} audio files and {len(video_files)} video files")
-        
+        cache = get_media_cache()
+        cache.evict()
+        staging = DownloadConfig()
+        cache.sweep([staging.video_path, staging.audio_path])
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
 
 def get_tiktok_videos(username):
     logger.info(f"Starting to process videos for TikTok user: {username}")
-    db = SessionLocal()
+    tracker = RssTracker()
+    yield_tracker = YieldTracker()
     
     try:
         # Log initial resource usage
-        log_system_resources()
+        log_system_resources(tracker)
         
         # Configure yt-dlp options
         ydl_opts = {
@@ -160,73 +76,85 @@ def get_tiktok_videos(username):
             info = ydl.extract_info(url, download=False)
             
             if 'entries' in info:
-                for entry in info['entries']:
-                    # Log resources before processing each video
-                    log_system_resources()
-                    
-                    video_id = entry['id']
-                    video_url = entry['url']
+                # Highest-value videos first, so a cut-short crawl has covered the best ones
+                candidates = CandidateQueue(
+                    {
+                        'video_id': canonical_video_id(entry['id']),
+                        'url': entry['url'],
+                        'priority': score_video(
+                            entry.get('view_count'),
+                            entry.get('like_count'),
+                            created_at=entry.get('timestamp'),
+                            description=entry.get('description') or entry.get('title')
+                        )
+                    }
+                    for entry in info['entries']
+                )
+                for candidate in candidates.drain():
+                    video_id = candidate['video_id']
+                    video_url = candidate['url']
                     
-                    if video_exists(video_id, db):
-                        logger.info(f"Skipping video {video_id} - already processed")
+                    if ENQUEUE_ONLY:
+                        with session_scope() as db:
+                            enqueue(db, [candidate])
                         continue
                     
-                    try:
-                        print("1. Starting to process video...")
-                        # Process the video
-                        logger.info(f"Processing video: {video_url}")
-                        process_video(video_url)
+                    # Lease the video so concurrent crawlers never process it twice
+                    with video_lease(video_id) as acquired:
+                        if not acquired:
+                            logger.info(f"Skipping video {video_id} - already processed or claimed")
+                            continue
                         
-                        print("2. Video processed, committing changes...")
-                        db.commit()
+                        try:
+                            print("1. Starting to process video...")
+                            # Process the video
+                            logger.info(f"Processing video: {video_url}")
+                            with failure_tracking(video_id, video_url):
+                                process_video(video_url)
                         
-                        print("3. About to execute raw SQL query...")
-                        raw_result = db.execute(
-                            text("""
-                                SELECT id, video_id, restaurant_id FROM videos WHERE video_id = :vid
-                            """), 
-                            {'vid': str(video_id)}
-                        ).first()
-                        print('4. Raw SQL result: ', raw_result)
-                        
-                        has_restaurants = False
-                        if raw_result and raw_result.restaurant_id:
-                            print("5. Found restaurant_id: ", raw_result.restaurant_id)
-                            has_restaurants = True
-                            logger.info(f"Restaurant found for video {video_id}, restaurant_id: {raw_result.restaurant_id}")
-                            add_curated_tag_to_restaurant(db, raw_result.restaurant_id)
-                            logger.info(f"Added curated tag to restaurant {raw_result.restaurant_id}")
-                        else:
-                            print("5. No restaurant found")
-                            logger.info(f"No restaurant found for video {video_id}")
+                            # Fresh session per video so loaded objects never accumulate
+                            with session_scope() as db:
+                                print("3. About to execute raw SQL query...")
+                                raw_result = db.execute(
+                                    text("""
+                                        SELECT id, video_id, restaurant_id FROM videos WHERE video_id = :vid
+                                    """), 
+                                    {'vid': str(video_id)}
+                                ).first()
+                                print('4. Raw SQL result: ', raw_result)
+                                restaurants = db.execute(
+                                    select(func.count(Video.id)).where(Video.video_id == str(video_id))
+                                ).scalar()
+                            
+                                has_restaurants = False
+                                if raw_result and raw_result.restaurant_id:
+                                    print("5. Found restaurant_id: ", raw_result.restaurant_id)
+                                    has_restaurants = True
+                                    logger.info(f"Restaurant found for video {video_id}, restaurant_id: {raw_result.restaurant_id}")
+                                    assign(db, ["curated"], [raw_result.restaurant_id])
+                                    logger.info(f"Added curated tag to restaurant {raw_result.restaurant_id}")
+                                else:
+                                    print("5. No restaurant found")
+                                    logger.info(f"No restaurant found for video {video_id}")
 
-                        print('6. has_restaurants: ', has_restaurants)
-                        print('7. raw_result: ', raw_result)
-                        
-                        mark_video_as_processed(video_id, video_url, has_restaurants, db)
-                        
-                        # Log resources after processing each video
-                        log_system_resources()
-                        
-                        # Clean up files after processing each video
-                        cleanup_files()
+                                print('6. has_restaurants: ', has_restaurants)
+                                print('7. raw_result: ', raw_result)
+                            
+                                mark_video_as_processed(video_id, video_url, has_restaurants, db)
                         
-                        # Force garbage collection
-                        gc.collect()
+                            # Log resources and per-video memory growth after processing each video
+                            tracker.record_video()
+                            yield_tracker.record(restaurants)
+                            log_system_resources(tracker, yield_tracker)
                         
-                        time.sleep(5)
+                            # Clean up files after processing each video
+                            cleanup_files()
                         
-                    except Exception as e:
-                        logger.error(f"Failed to process video {video_url}: {str(e)}")
-                        # Still try to clean up even if processing failed
-                        cleanup_files()
-                        continue
-                    
-                    # Add garbage collection after each video
-                    import gc
-                    gc.collect()
-                    
-                    time.sleep(5)
+                        except Exception as e:
+                            logger.error(f"Failed to process video {video_url}: {str(e)}")
+                            # Still try to clean up even if processing failed
+                            cleanup_files()
+                            continue
             
         logger.info(f"Finished processing videos for user: {username}")
         
@@ -235,7 +163,6 @@ def get_tiktok_videos(username):
     finally:
         # Final cleanup
         cleanup_files()
-        db.close()
 
 if __name__ == "__main__":
     try:
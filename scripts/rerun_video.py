@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.video_processing.artifact_store import STAGES, get_artifact_store
+from src.services.video_processing.download_video import parse_video_id
+from src.tasks.video_tasks import process_video_async
+import argparse
+import asyncio
+import logging
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def print_status(video_id):
+    store = get_artifact_store()
+    logger.info(f"Stages for video {video_id}:")
+    for stage, status in store.status(video_id).items():
+        logger.info(f"  {stage}: {status}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Resume a video at its first incomplete stage, or rerun it from a given stage"
+    )
+    parser.add_argument('url', help="TikTok video URL")
+    parser.add_argument('--from-stage', choices=STAGES,
+                        help="Rerun this stage and every later one (e.g. llm after a prompt change)")
+    parser.add_argument('--status', action='store_true', help="Only print stage status")
+    args = parser.parse_args()
+
+    video_id = parse_video_id(args.url)
+    if args.status:
+        if not video_id:
+            parser.error("--status needs a full video URL")
+        print_status(video_id)
+    else:
+        asyncio.run(process_video_async(args.url, args.from_stage))
+        if video_id:
+            print_status(video_id)
@@ -0,0 +1,131 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import engine, session_scope
+from src.models.models import ProcessedVideo, Video
+from src.services.video_processing.errors import VideoQuarantinedError
+from src.utils.failure_ledger import failure_tracking
+from src.utils.resource_monitor import YieldTracker
+from src.utils.job_queue import STATUS_DONE, JobDeferred, LeasedJob, queue_stats, run_worker
+from src.utils.tagging import insert_ignore
+from src.utils.video_leases import next_claim_at, video_lease
+from functools import partial
+from sqlalchemy import exists, func, select
+import argparse
+import logging
+import multiprocessing
+import time
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+# Restaurants per CPU-hour for this worker process
+_yield_tracker = None
+
+def process_job(job: LeasedJob):
+    """Run one queued video through the pipeline and mark it processed"""
+    # Imported here so --simulate runs do not load the processing stack
+    from src.tasks.video_tasks import process_video
+
+    with video_lease(job.video_id) as acquired:
+        if not acquired:
+            with session_scope() as db:
+                processed = db.execute(
+                    select(exists().where(ProcessedVideo.video_id == job.video_id))
+                ).scalar()
+                available_at = None if processed else next_claim_at(db, job.video_id)
+            if processed:
+                logger.info(f"Skipping video {job.video_id} - already processed")
+                return
+            if available_at is None:
+                raise VideoQuarantinedError(job.video_id)
+            # Claimed elsewhere or backing off: come back once that is over instead of
+            # completing a job whose video never went through
+            raise JobDeferred(available_at, f"Video {job.video_id} claimed or backing off")
+
+        with failure_tracking(job.video_id, job.video_url):
+            process_video(job.video_url)
+
+        with session_scope() as db:
+            restaurants = db.execute(
+                select(func.count(Video.id)).where(Video.video_id == job.video_id)
+            ).scalar()
+            has_restaurants = restaurants > 0
+            db.execute(insert_ignore(ProcessedVideo).values(
+                video_id=job.video_id,
+                platform=job.platform,
+                has_restaurants=has_restaurants,
+                video_url=job.video_url
+            ))
+        logger.info(f"Processed video {job.video_id} (has_restaurants={has_restaurants})")
+
+    if _yield_tracker:
+        _yield_tracker.record(restaurants)
+        logger.info(_yield_tracker.report())
+
+def simulate_job(job: LeasedJob, seconds: float):
+    time.sleep(seconds)
+
+def worker_main(simulate: float = None, drain: bool = False, visibility_timeout: int = None):
+    global _yield_tracker
+    # Connections pooled before the fork belong to the parent
+    engine.dispose(close=False)
+    _yield_tracker = YieldTracker()
+    handler = partial(simulate_job, seconds=simulate) if simulate is not None else process_job
+    completed = run_worker(handler, visibility_timeout=visibility_timeout, drain=drain)
+    logger.info(f"Worker finished after {completed} jobs")
+
+def done_count():
+    with session_scope() as db:
+        return queue_stats(db).get(STATUS_DONE, 0)
+
+def run_workers(num_workers: int, simulate: float = None, drain: bool = False,
+                visibility_timeout: int = None, report_interval: float = 30) -> float:
+    """
+    Start num_workers worker processes on this node and log queue throughput.
+
+    Returns:
+        float: Jobs completed per minute over the run
+    """
+    done_at_start = done_count()
+    start_time = time.time()
+    workers = [
+        multiprocessing.Process(
+            target=worker_main,
+            args=(simulate, drain, visibility_timeout),
+            name=f"job-worker-{i}"
+        )
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    last_done, last_time = done_at_start, start_time
+    while any(worker.is_alive() for worker in workers):
+        for worker in workers:
+            worker.join(timeout=report_interval / len(workers))
+        now, done = time.time(), done_count()
+        if now - last_time >= report_interval or not any(worker.is_alive() for worker in workers):
+            logger.info(f"{done - done_at_start} jobs done, "
+                        f"{(done - last_done) / (now - last_time) * 60:.1f} jobs/min over the last interval "
+                        f"({num_workers} workers)")
+            last_done, last_time = done, now
+
+    elapsed = time.time() - start_time
+    throughput = (done_count() - done_at_start) / elapsed * 60
+    logger.info(f"{num_workers} workers: {throughput:.1f} jobs/min "
+                f"({throughput / num_workers:.1f} per worker) over {elapsed:.1f} seconds")
+    return throughput
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain the jobs table with N worker processes on this node")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help="Worker processes")
+    parser.add_argument('--drain', action='store_true', help="Exit once the queue is empty")
+    parser.add_argument('--simulate', type=float, help="Sleep this many seconds per job instead of processing")
+    parser.add_argument('--visibility-timeout', type=int, help="Seconds before an unrenewed lease is reclaimed")
+    parser.add_argument('--report-interval', type=float, default=30, help="Seconds between throughput reports")
+    args = parser.parse_args()
+
+    run_workers(args.workers, args.simulate, args.drain, args.visibility_timeout, args.report_interval)
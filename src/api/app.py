@@ -4,7 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from typing import List
 from datetime import datetime  
 from src.models.models import RestaurantSchema, Restaurant, Video
-from src.database import get_db
+from src.database import get_db, pool_status
 from sqlalchemy.orm import Session
 from sqlalchemy import distinct
 from ..utils.logger_config import setup_cloudwatch_logging
@@ -97,6 +97,10 @@ async def get_cities(db: Session = Depends(get_db)):
         logger.error(f"Error fetching cities: {str(e)}", exc_info=True)
         raise
 
+@app.get("/metrics/db")
+async def get_db_pool_metrics():
+    return pool_status()
+
 
 @app.post("/log")
 async def log_frontend_event(event: dict):
@@ -1,6 +1,9 @@
 from dotenv import load_dotenv
+from contextlib import contextmanager
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.orm import DeclarativeBase
 from src.utils.logger_config import setup_cloudwatch_logging
@@ -12,36 +15,207 @@ logger = setup_cloudwatch_logging()
 load_dotenv()
 
 # Get database URL from individual environment variables
-DB_HOST = config('DB_HOST')
-DB_NAME = config('DB_NAME')
-DB_USER = config('DB_USER')
-DB_PASSWORD = config('DB_PASSWORD')
-DB_PORT = 3306
+DB_HOST = config('DB_HOST', default=None)
+DB_NAME = config('DB_NAME', default=None)
+DB_USER = config('DB_USER', default=None)
+DB_PASSWORD = config('DB_PASSWORD', default=None)
+DB_PORT = config('DB_PORT', default=3306, cast=int)
 
-# Construct the database URL
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Construct the primary (write) database URL. DATABASE_URL overrides the DB_* settings,
+# e.g. DATABASE_URL=sqlite:///primary.db for local testing
+SQLALCHEMY_DATABASE_URL = config(
+    'DATABASE_URL',
+    default=f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}" if DB_HOST else None
+)
 
 if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("Could not construct database URL from environment variables")
 
-# Create SQLAlchemy engine with MariaDB-specific settings
-engine = create_engine(
+# Optional read replica, from DATABASE_REPLICA_URL or DB_REPLICA_HOST (same credentials).
+# Without one, reads share the primary engine.
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default=None)
+SQLALCHEMY_REPLICA_URL = config(
+    'DATABASE_REPLICA_URL',
+    default=f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}:{DB_PORT}/{DB_NAME}" if DB_REPLICA_HOST else None
+)
+
+# Seconds after a write in this process during which reads go to the primary,
+# so callers see their own writes despite replica lag. 0 disables it.
+READ_YOUR_WRITES_WINDOW = config('DB_READ_YOUR_WRITES_WINDOW', default=0, cast=float)
+
+class PoolMetrics:
+    """Connection pool counters for one engine"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+            }
+
+def _create_engine(url: str, name: str, pool_size: int, max_overflow: int):
+    """Create an engine with its own pool and attach pool metrics"""
+    kwargs = dict(
+        pool_recycle=3600,  # Recycle connections after 1 hour
+        echo=config('DB_ECHO', default=True, cast=bool)  # Set to False in production - this logs all SQL queries
+    )
+    if url.startswith('sqlite'):
+        # Local stand-in for MariaDB: let pooled connections move between threads. SQLite
+        # picks its own pool class (SingletonThreadPool for :memory:), which takes no sizing.
+        kwargs['connect_args'] = {'check_same_thread': False}
+    else:
+        kwargs['pool_size'] = pool_size  # Maximum number of database connections in the pool
+        kwargs['max_overflow'] = max_overflow
+
+    new_engine = create_engine(url, **kwargs)
+    if url.startswith('sqlite'):
+        # WAL lets local worker processes read while one of them writes
+        @event.listens_for(new_engine, 'connect')
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA busy_timeout=30000')
+            cursor.close()
+
+    metrics = PoolMetrics(name)
+    metrics.attach(new_engine)
+    pool_metrics[name] = metrics
+    engines[name] = new_engine
+    logger.info(f"Created '{name}' database engine (pool_size={pool_size}, max_overflow={max_overflow})")
+    return new_engine
+
+# Engines and their pool counters, keyed by pool name ('primary', 'replica')
+engines = {}
+pool_metrics = {}
+
+# Create SQLAlchemy engines with MariaDB-specific settings. The primary takes all writes
+# (update_database, scripts); the replica serves API reads.
+engine = _create_engine(
     SQLALCHEMY_DATABASE_URL,
-    pool_size=5,  # Maximum number of database connections in the pool
-    pool_recycle=3600,  # Recycle connections after 1 hour
-    echo=True  # Set to False in production - this logs all SQL queries
+    'primary',
+    pool_size=config('DB_POOL_SIZE', default=5, cast=int),
+    max_overflow=config('DB_MAX_OVERFLOW', default=10, cast=int)
 )
 
-# Create SessionLocal class
+if SQLALCHEMY_REPLICA_URL:
+    replica_engine = _create_engine(
+        SQLALCHEMY_REPLICA_URL,
+        'replica',
+        pool_size=config('DB_REPLICA_POOL_SIZE', default=5, cast=int),
+        max_overflow=config('DB_REPLICA_MAX_OVERFLOW', default=10, cast=int)
+    )
+else:
+    replica_engine = engine
+
+# Create session classes: SessionLocal writes to the primary, ReadSessionLocal reads from the replica
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+_last_write_at = 0.0
+
+@event.listens_for(SessionLocal, 'after_flush')
+def _flag_write(session, flush_context):
+    session.info['has_writes'] = True
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _record_write(session):
+    global _last_write_at
+    if session.info.pop('has_writes', False):
+        _last_write_at = time.monotonic()
+
+def get_read_session(use_primary: bool = False) -> Session:
+    """
+    Return a session for reads.
+
+    Reads go to the replica unless the caller asks for the primary, or this process
+    committed a write within READ_YOUR_WRITES_WINDOW seconds.
+    """
+    recent_write = (
+        READ_YOUR_WRITES_WINDOW > 0
+        and time.monotonic() - _last_write_at < READ_YOUR_WRITES_WINDOW
+    )
+    if use_primary or recent_write or replica_engine is engine:
+        return SessionLocal()
+    return ReadSessionLocal()
+
+def pool_status() -> dict:
+    """Pool sizing and counters for every engine, keyed by pool name"""
+    status = {}
+    for name, metrics in pool_metrics.items():
+        pool = engines[name].pool
+        status[name] = {
+            'size': pool.size() if hasattr(pool, 'size') else None,
+            'checked_in': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+            'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+            **metrics.snapshot(),
+        }
+    return status
 
 # Create Base class using new style
 class Base(DeclarativeBase):
     pass
 
-# Dependency to get DB session
+@contextmanager
+def session_scope(session_factory=None):
+    """
+    Short-lived unit of work for long-running scripts.
+
+    Commits on success, rolls back on error and closes the session, which expunges
+    every object it loaded. Scope one per video or batch so the identity map never
+    grows over a multi-hour crawl.
+    """
+    db = (session_factory or SessionLocal)()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+# Dependency to get DB session for read endpoints (replica)
 def get_db():
-    db = SessionLocal()
+    db = get_read_session()
     try:
         logger.info("Database connection established")
         yield db
@@ -49,11 +223,21 @@ def get_db():
         logger.info("Database connection closed")
         db.close()
 
+# Dependency to get DB session for endpoints that write or must see the latest data (primary)
+def get_write_db():
+    db = SessionLocal()
+    try:
+        logger.info("Primary database connection established")
+        yield db
+    finally:
+        logger.info("Primary database connection closed")
+        db.close()
+
 # Initialize database (create all tables)
 def init_db():
-    from models.models import Base  # Adjust this import path based on your project structure
+    from src.models.models import Base
     Base.metadata.create_all(bind=engine)
 
 # You can call this when starting your application
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -1,5 +1,5 @@
 from src.database import Base
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Table, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Table, Boolean, UniqueConstraint, Index, Text
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel
 from typing import Optional, List
@@ -12,7 +12,9 @@ logger = setup_cloudwatch_logging()
 # Association table for restaurant tags
 restaurant_tags = Table('restaurant_tags', Base.metadata,
     Column('restaurant_id', Integer, ForeignKey('restaurants.id')),
-    Column('tag_id', Integer, ForeignKey('tags.id'))
+    Column('tag_id', Integer, ForeignKey('tags.id'), index=True),
+    # Lets bulk tag writes use INSERT IGNORE instead of checking each pair
+    UniqueConstraint('restaurant_id', 'tag_id', name='uq_restaurant_tag')
 )
 
 class Restaurant(Base):
@@ -159,3 +161,68 @@ class ProcessedVideo(Base):
     processed_at = Column(DateTime, server_default=func.now())
     has_restaurants = Column(Boolean, default=False)
     video_url = Column(String(255))
+
+class VideoLease(Base):
+    # Claim on a video held by one crawler while it processes it
+    __tablename__ = 'video_leases'
+
+    video_id = Column(String(255), primary_key=True)
+    platform = Column(String(50), nullable=False, default='tiktok')
+    owner = Column(String(255), nullable=False)  # host:pid of the claiming process
+    leased_until = Column(DateTime, nullable=False, index=True)
+    claimed_at = Column(DateTime, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=1)
+
+class Job(Base):
+    # Durable work queue entry: one video to run through process_video
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        UniqueConstraint('platform', 'video_id', name='uq_job_video'),
+        Index('ix_jobs_status_priority', 'status', 'priority', 'id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    platform = Column(String(50), nullable=False, default='tiktok')
+    video_id = Column(String(255), nullable=False)
+    video_url = Column(String(500), nullable=False)
+    priority = Column(Float, nullable=False, default=0)  # Higher runs first
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not leased before this
+    leased_by = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)  # Visibility timeout
+    heartbeat_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class VideoFailure(Base):
+    # Failure ledger: why a video keeps failing and when it may be retried
+    __tablename__ = 'video_failures'
+
+    video_id = Column(String(255), primary_key=True)
+    platform = Column(String(50), nullable=False, default='tiktok')
+    video_url = Column(String(500), nullable=True)
+    stage = Column(String(50), nullable=False)  # Pipeline stage of the last failure
+    error_class = Column(String(255), nullable=False)
+    error_message = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    wasted_seconds = Column(Float, nullable=False, default=0)  # Wall time across failed attempts
+    wasted_cpu_seconds = Column(Float, nullable=False, default=0)
+    quarantined = Column(Boolean, nullable=False, default=False, index=True)
+    next_retry_at = Column(DateTime, nullable=True)
+    first_failed_at = Column(DateTime, default=datetime.utcnow)
+    last_failed_at = Column(DateTime, default=datetime.utcnow)
+
+class VideoFingerprint(Base):
+    # Perceptual fingerprints of stored videos, for near-duplicate detection
+    __tablename__ = 'video_fingerprints'
+
+    video_id = Column(String(255), primary_key=True)
+    platform = Column(String(50), nullable=False, default='tiktok')
+    frame_hashes = Column(String(255), nullable=False)  # Comma-separated 64-bit hex keyframe pHashes
+    audio_hash = Column(String(16), nullable=True)  # None for silent videos
+    duration = Column(Float, nullable=False, default=0)
+    duplicate_of = Column(String(255), nullable=True, index=True)  # Original whose results were reused
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
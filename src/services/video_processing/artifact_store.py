@@ -0,0 +1,233 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in execution order
+STAGES = ['download', 'dedup', 'transcribe', 'ocr', 'llm', 'geocode', 'store']
+
+# Bump a stage's version when its logic or prompt changes; stored outputs with an
+# older version are treated as missing and recomputed.
+STAGE_VERSIONS = {
+    'download': 1,
+    'dedup': 1,
+    'transcribe': 1,
+    'ocr': 1,
+    'llm': 1,
+    'geocode': 1,
+    'store': 1,
+}
+
+# Stages whose outputs each stage reads. A stage's entry records the hashes its inputs
+# had when it ran; if an input has since changed or gone stale, so has the stage.
+STAGE_INPUTS = {
+    'download': (),
+    'dedup': ('download',),
+    'transcribe': ('download',),
+    'ocr': ('download',),
+    'llm': ('download', 'transcribe', 'ocr'),
+    'geocode': ('llm',),
+    'store': ('download', 'dedup', 'transcribe', 'ocr', 'llm', 'geocode'),
+}
+
+# Fields left out of the hash dependents compare: signed media URLs change on every
+# extraction without the media changing
+VOLATILE_FIELDS = {'download': ('stream',)}
+
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_STALE = 'stale'
+
+class ArtifactStore:
+    """
+    Local content-addressed store for stage outputs.
+
+    Outputs are JSON blobs under objects/<hash[:2]>/<hash>.json, so identical outputs
+    are stored once. Each video has a manifest under videos/<video_id>.json recording,
+    per stage, the output hash, the stage version it was produced with and its status.
+    Manifest updates are serialized with a file lock so stages running in different
+    processes can record their results for the same video.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or config('ARTIFACT_STORE_PATH', default='/home/ec2-user/maps-server-processing/files/artifacts')
+        self.objects_path = os.path.join(self.root, 'objects')
+        self.manifests_path = os.path.join(self.root, 'videos')
+        os.makedirs(self.objects_path, exist_ok=True)
+        os.makedirs(self.manifests_path, exist_ok=True)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_path, digest[:2], f"{digest}.json")
+
+    def _manifest_path(self, video_id: str) -> str:
+        return os.path.join(self.manifests_path, f"{video_id}.json")
+
+    @contextmanager
+    def _locked(self, video_id: str):
+        with open(f"{self._manifest_path(video_id)}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write_atomic(path: str, payload: bytes):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def manifest(self, video_id: str) -> Dict:
+        try:
+            with open(self._manifest_path(video_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'video_id': video_id, 'stages': {}}
+
+    def _update_stages(self, video_id: str, updates: Union[Dict[str, Dict], Callable[[Dict], Dict[str, Dict]]]):
+        """Apply entry updates under the manifest lock; a callable builds them from the current manifest"""
+        with self._locked(video_id):
+            manifest = self.manifest(video_id)
+            if callable(updates):
+                updates = updates(manifest)
+            now = datetime.utcnow().isoformat()
+            for stage, entry in updates.items():
+                manifest['stages'][stage] = {**manifest['stages'].get(stage, {}), **entry, 'updated_at': now}
+            self._write_atomic(
+                self._manifest_path(video_id),
+                json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+            )
+
+    @staticmethod
+    def _digest(data: Any) -> Tuple[bytes, str]:
+        payload = json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        return payload, hashlib.sha256(payload).hexdigest()
+
+    def _current(self, manifest: Dict) -> Dict[str, Optional[str]]:
+        """
+        Per stage, the hash its dependents compare (None unless the stage is done): the
+        stored output must have the current stage version and the inputs it was computed from.
+        """
+        current = {}
+        # STAGES is in dependency order, so inputs are resolved before their dependents
+        for stage in STAGES:
+            entry = manifest['stages'].get(stage)
+            done = bool(
+                entry
+                and entry.get('status') == STATUS_DONE
+                and entry.get('version') == STAGE_VERSIONS[stage]
+                and os.path.exists(self._object_path(entry['hash']))
+                # Entries written before inputs were recorded have no 'inputs' and are trusted
+                and all(current.get(name) == digest for name, digest in entry.get('inputs', {}).items())
+            )
+            current[stage] = entry.get('input_hash', entry['hash']) if done else None
+        return current
+
+    @staticmethod
+    def _downstream(stage: str) -> List[str]:
+        """Stages that read stage's output, directly or through another stage"""
+        affected = {stage}
+        for later in STAGES[STAGES.index(stage) + 1:]:
+            if affected.intersection(STAGE_INPUTS[later]):
+                affected.add(later)
+        return [later for later in STAGES if later in affected and later != stage]
+
+    def put(self, video_id: str, stage: str, data: Any) -> str:
+        """
+        Store a stage output and mark the stage done; returns the content hash.
+        If the output differs from the one it replaces, every downstream stage is marked stale.
+        """
+        payload, digest = self._digest(data)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_atomic(path, payload)
+        input_hash = digest
+        if stage in VOLATILE_FIELDS and isinstance(data, dict):
+            input_hash = self._digest({key: value for key, value in data.items() if key not in VOLATILE_FIELDS[stage]})[1]
+
+        def updates(manifest: Dict) -> Dict[str, Dict]:
+            current = self._current(manifest)
+            previous = manifest['stages'].get(stage, {})
+            result = {stage: {
+                'status': STATUS_DONE,
+                'version': STAGE_VERSIONS[stage],
+                'hash': digest,
+                'input_hash': input_hash,
+                # None for an input that was not done: the stage reruns once it is
+                'inputs': {name: current[name] for name in STAGE_INPUTS[stage]},
+                'error': None,
+            }}
+            if previous.get('input_hash', previous.get('hash')) != input_hash:
+                result.update({
+                    later: {'status': STATUS_STALE}
+                    for later in self._downstream(stage) if later in manifest['stages']
+                })
+            return result
+
+        self._update_stages(video_id, updates)
+        return digest
+
+    def is_done(self, video_id: str, stage: str) -> bool:
+        return self._current(self.manifest(video_id))[stage] is not None
+
+    def get(self, video_id: str, stage: str, default: Any = None) -> Any:
+        """Output of a completed, current-version stage, otherwise default"""
+        if not self.is_done(video_id, stage):
+            return default
+        entry = self.manifest(video_id)['stages'][stage]
+        with open(self._object_path(entry['hash']), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def mark_failed(self, video_id: str, stage: str, error: Any):
+        self._update_stages(video_id, {stage: {'status': STATUS_FAILED, 'error': str(error)}})
+
+    def invalidate(self, video_id: str, from_stage: str) -> List[str]:
+        """Mark from_stage and every later stage stale so they are recomputed"""
+        stages = STAGES[STAGES.index(from_stage):]
+        self._update_stages(video_id, {stage: {'status': STATUS_STALE} for stage in stages})
+        logger.info(f"Invalidated stages {stages} for video {video_id}")
+        return stages
+
+    def first_incomplete(self, video_id: str) -> Optional[str]:
+        current = self._current(self.manifest(video_id))
+        return next((stage for stage in STAGES if current[stage] is None), None)
+
+    def status(self, video_id: str) -> Dict[str, str]:
+        manifest = self.manifest(video_id)
+        stages = manifest['stages']
+        current = self._current(manifest)
+        result = {}
+        for stage in STAGES:
+            entry = stages.get(stage)
+            if entry is None:
+                result[stage] = 'pending'
+            elif entry.get('status') == STATUS_DONE and current[stage] is None:
+                result[stage] = STATUS_STALE
+            else:
+                result[stage] = entry.get('status')
+        return result
+
+def media_present(download: Dict) -> bool:
+    """
+    Whether the media files recorded by a download stage are still on disk. Streamed
+    downloads have no files, and their signed media URLs expire, so they never count.
+    """
+    files = [download.get(key) for key in ('video_file', 'audio_file')]
+    return any(files) and all(os.path.exists(path) for path in files if path)
+
+_store: Optional[ArtifactStore] = None
+
+def get_artifact_store() -> ArtifactStore:
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
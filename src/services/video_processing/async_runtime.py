@@ -0,0 +1,106 @@
+import asyncio
+import atexit
+import concurrent.futures
+import functools
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Optional
+import aiohttp
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+class AsyncRuntime:
+    """
+    Long-lived event loop for a worker process.
+
+    The loop runs in a daemon thread and is shared by every task the process runs, so
+    the aiohttp session (and its connection pool) survives between videos, and
+    concurrent tasks in a threaded worker keep their network stages in flight on the
+    same loop. Blocking calls (yt-dlp, boto3, the DB) go through a bounded thread pool
+    instead of the loop's default executor.
+
+    Overlapping videos needs a threaded worker (celery worker -P threads -c N). Under
+    the default prefork pool each process runs one task at a time, so the loop only
+    saves the per-task loop and session setup.
+    """
+
+    def __init__(self, blocking_workers: int = None, connection_limit: int = None):
+        self.blocking_workers = blocking_workers or config('ASYNC_BLOCKING_WORKERS', default=8, cast=int)
+        self.connection_limit = connection_limit or config('ASYNC_CONNECTION_LIMIT', default=32, cast=int)
+        self.loop = asyncio.new_event_loop()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.blocking_workers, thread_name_prefix='async-blocking'
+        )
+        self.loop.set_default_executor(self.executor)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._thread = threading.Thread(target=self._run_loop, name='async-runtime', daemon=True)
+        self._thread.start()
+        logger.info(f"Started async runtime (pid={os.getpid()}, blocking_workers={self.blocking_workers})")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Shared client session; only use it from coroutines running on this loop"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit)
+            )
+        return self._session
+
+    def run(self, coro: Awaitable, timeout: float = None) -> Any:
+        """Run a coroutine on the loop from synchronous code and wait for its result"""
+        if self.is_current():
+            raise RuntimeError("AsyncRuntime.run() called from its own event loop; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def is_current(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    async def _close_session(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def shutdown(self):
+        if not self.loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_session(), self.loop).result(5)
+        except Exception as e:
+            logger.warning(f"Error closing shared session: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+        self.executor.shutdown(wait=False)
+        logger.info("Stopped async runtime")
+
+_runtime: Optional[AsyncRuntime] = None
+_runtime_pid: Optional[int] = None
+_runtime_lock = threading.Lock()
+
+def get_runtime() -> AsyncRuntime:
+    """Process-wide AsyncRuntime, created on first use (so after any fork)"""
+    global _runtime, _runtime_pid
+    with _runtime_lock:
+        if _runtime is None or _runtime_pid != os.getpid():
+            _runtime = AsyncRuntime()
+            _runtime_pid = os.getpid()
+            atexit.register(_runtime.shutdown)
+        return _runtime
+
+def current_session() -> Optional[aiohttp.ClientSession]:
+    """The shared session when called on the runtime loop, otherwise None"""
+    if _runtime is not None and _runtime_pid == os.getpid() and _runtime.is_current():
+        return _runtime.session
+    return None
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call in the bounded executor without stalling the loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Union
+from urllib.parse import urlparse
+import aiohttp
+from decouple import config
+from .async_runtime import run_blocking
+from .download_video import DownloadConfig, VideoDownloader
+from .media_cache import MediaCache, get_media_cache
+from .media_probe import probe_media
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `capacity`; a rate of 0 or less means unlimited"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token if one is available, otherwise return the seconds until one is"""
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+@dataclass
+class DownloadResult:
+    url: str
+    video_id: Optional[str] = None
+    video_file: Optional[str] = None
+    audio_file: Optional[str] = None
+    description: Optional[str] = None
+    creator_info: Dict = field(default_factory=dict)
+    bytes: int = 0
+    seconds: float = 0
+    error: Optional[BaseException] = None
+    # Streaming mode: media_decode kwargs in place of local files
+    stream: Optional[Dict] = None
+    # MediaInfo.to_dict() of the media, probed once here for every later stage
+    probe: Optional[Dict] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def artifact(self) -> Dict:
+        """The download stage's artifact store record"""
+        return {
+            'url': self.url,
+            'video_file': self.video_file,
+            'audio_file': self.audio_file,
+            'description': self.description,
+            'creator_info': self.creator_info,
+            'stream': self.stream,
+            'probe': self.probe,
+        }
+
+class DownloadManager:
+    """
+    Downloads videos with a bounded number in flight and a token-bucket rate limit per
+    host, shared by the page extraction and the media fetch.
+
+    One manager is meant to live for the whole process (see get_download_manager) so the
+    limits hold across every task running on the async runtime. Downloads reuse the
+    runtime's pooled aiohttp session and the process-wide SSL context, and finished
+    media is moved into the node's media cache.
+    """
+
+    def __init__(self, max_concurrent: int = None, host_rate: float = None, host_burst: int = None,
+                 download_config: DownloadConfig = None, session: Optional[aiohttp.ClientSession] = None,
+                 cache: MediaCache = None):
+        self.max_concurrent = max_concurrent or config('DOWNLOAD_CONCURRENCY', default=4, cast=int)
+        # 0 disables the per-host limit
+        self.host_rate = host_rate if host_rate is not None else config('DOWNLOAD_HOST_RATE', default=0.5, cast=float)
+        self.host_burst = host_burst or config('DOWNLOAD_HOST_BURST', default=3, cast=int)
+        self.download_config = download_config or DownloadConfig()
+        self.session = session
+        self.cache = cache or get_media_cache()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        # One semaphore per event loop: a semaphore belongs to the loop it is first awaited
+        # on, and the process-wide manager may outlive a loop (e.g. successive asyncio.run)
+        self._slots: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = weakref.WeakKeyDictionary()
+        self._slots_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.started_at = time.time()
+        self.completed = 0
+        self.failed = 0
+        self.bytes_downloaded = 0
+
+    def _bucket(self, host: str) -> TokenBucket:
+        with self._buckets_lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+            return self._buckets[host]
+
+    async def throttle(self, url: str):
+        """Wait for a request slot on the URL's host"""
+        await self._bucket(urlparse(url).hostname or '').acquire()
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._slots_lock:
+            if loop not in self._slots:
+                self._slots[loop] = asyncio.Semaphore(self.max_concurrent)
+            return self._slots[loop]
+
+    def _cache_media(self, video_id: str, video_file: Optional[str], audio_file: Optional[str]):
+        return tuple(
+            path and self.cache.add(video_id, kind, path)
+            for kind, path in (('video', video_file), ('audio', audio_file))
+        )
+
+    @staticmethod
+    def _probe(video_file: Optional[str], stream: Optional[Dict]) -> Optional[Dict]:
+        try:
+            if stream:
+                return probe_media(**stream).to_dict()
+            return probe_media(video_file).to_dict() if video_file else None
+        except Exception as e:
+            # Stages probe for themselves when the record has no probe
+            logger.warning(f"Could not probe media: {str(e)}")
+            return None
+
+    async def download(self, url: str) -> DownloadResult:
+        """Download one video within the manager's limits. Raises on failure"""
+        async with self._loop_slots():
+            start_time = time.time()
+            try:
+                downloader = VideoDownloader(self.download_config, self.session, throttle=self.throttle)
+                video_id, video_file, audio_file, description, creator_info = await downloader.process(url)
+            except Exception:
+                with self._stats_lock:
+                    self.failed += 1
+                raise
+
+            # Only the media file crosses the network; the audio track is extracted locally
+            size = os.path.getsize(video_file) if video_file and os.path.exists(video_file) else 0
+            video_file, audio_file = await run_blocking(self._cache_media, video_id, video_file, audio_file)
+            if downloader.media_info is not None:
+                # Already probed while verifying the download
+                probe = downloader.media_info.to_dict()
+            else:
+                probe = await run_blocking(self._probe, video_file, downloader.stream_source)
+            with self._stats_lock:
+                self.completed += 1
+                self.bytes_downloaded += size
+            return DownloadResult(url, video_id, video_file, audio_file, description, creator_info or {},
+                                  size, time.time() - start_time, stream=downloader.stream_source, probe=probe)
+
+    async def download_all(self, urls: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[DownloadResult]:
+        """
+        Download a stream of URLs, keeping max_concurrent in flight, and yield results
+        as they complete. Failures are yielded with `error` set instead of raising.
+        """
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrent)
+        pending = asyncio.Queue(maxsize=self.max_concurrent)
+
+        async def stop_workers():
+            for _ in range(self.max_concurrent):
+                await pending.put(None)
+
+        async def feed():
+            try:
+                if hasattr(urls, '__aiter__'):
+                    async for url in urls:
+                        await pending.put(url)
+                else:
+                    for url in urls:
+                        await pending.put(url)
+            except Exception:
+                # Let the workers finish so the consumer gets to the source's error below
+                await stop_workers()
+                raise
+            await stop_workers()
+
+        async def work():
+            while (url := await pending.get()) is not None:
+                try:
+                    result = await self.download(url)
+                except Exception as e:
+                    logger.error(f"Download failed for {url}: {str(e)}")
+                    result = DownloadResult(url, error=e)
+                await results.put(result)
+            await results.put(None)
+
+        tasks = [asyncio.create_task(feed())] + [asyncio.create_task(work()) for _ in range(self.max_concurrent)]
+        try:
+            finished = 0
+            while finished < self.max_concurrent:
+                result = await results.get()
+                if result is None:
+                    finished += 1
+                else:
+                    yield result
+            # Re-raises an error from the URL source
+            await tasks[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        with self._stats_lock:
+            return {
+                'completed': self.completed,
+                'failed': self.failed,
+                'bytes': self.bytes_downloaded,
+                'elapsed_seconds': elapsed,
+                'videos_per_minute': self.completed / elapsed * 60,
+                'bytes_per_second': self.bytes_downloaded / elapsed,
+            }
+
+    def report(self) -> str:
+        stats = self.stats()
+        return (f"Downloads: {stats['completed']} done, {stats['failed']} failed, "
+                f"{stats['videos_per_minute']:.1f} videos/min, "
+                f"{stats['bytes_per_second'] / 1024 / 1024:.2f} MB/s over {stats['elapsed_seconds']:.0f}s")
+
+_manager: Optional[DownloadManager] = None
+_manager_pid: Optional[int] = None
+_manager_lock = threading.Lock()
+
+def get_download_manager() -> DownloadManager:
+    """Process-wide DownloadManager, so rate limits cover every concurrent pipeline"""
+    global _manager, _manager_pid
+    with _manager_lock:
+        if _manager is None or _manager_pid != os.getpid():
+            _manager = DownloadManager()
+            _manager_pid = os.getpid()
+        return _manager
@@ -1,6 +1,5 @@
 import yt_dlp
 import aiohttp
-from bs4 import BeautifulSoup
 import json
 from functools import lru_cache, wraps
 import asyncio
@@ -11,15 +10,23 @@ import os
 import ffmpeg
 import time
 from dataclasses import dataclass, field
-from typing import Dict, Tuple, Optional
+from typing import Awaitable, Callable, Dict, Tuple, Optional
 from pathlib import Path
 from ...utils.logger_config import setup_cloudwatch_logging
+from .async_runtime import current_session, run_blocking
+from .errors import DownloadIntegrityError
+from .media_probe import MediaInfo, demuxed_duration, probe_media
+from decouple import config
 import re
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+# Which rendition to download: the highest quality, the smallest one OCR can still read
+# on-screen text from, or audio for transcription-only runs
+FORMAT_POLICIES = ('best', 'ocr', 'audio_only')
+
 # Configuration
 @dataclass
 class DownloadConfig:
@@ -27,12 +34,41 @@ class DownloadConfig:
     video_path: str = field(init=False)
     audio_path: str = field(init=False)
     ydl_opts: Dict = field(default_factory=lambda: {'quiet': True})
+    format_policy: str = field(default_factory=lambda: config('DOWNLOAD_FORMAT_POLICY', default='ocr'))
+    min_ocr_height: int = field(default_factory=lambda: config('DOWNLOAD_MIN_OCR_HEIGHT', default=540, cast=int))
+    # Skip the file download; the extraction stages decode the media URL through ffmpeg
+    # straight into memory (see media_decode)
+    stream: bool = field(default_factory=lambda: config('STREAM_MEDIA', default=False, cast=bool))
+    # Retries yt-dlp makes per request and per HLS/DASH fragment before giving up
+    retries: int = field(default_factory=lambda: config('DOWNLOAD_RETRIES', default=10, cast=int))
+    # Fraction of the reported duration a download may fall short by before it counts as truncated
+    duration_tolerance: float = field(default_factory=lambda: config('DOWNLOAD_DURATION_TOLERANCE', default=0.05, cast=float))
 
     def __post_init__(self):
+        if self.format_policy not in FORMAT_POLICIES:
+            raise ValueError(f"Unknown format policy {self.format_policy!r}, expected one of {FORMAT_POLICIES}")
         self.video_path = f"{self.base_path}/video"
         self.audio_path = f"{self.base_path}/audio"
         self._ensure_directories()
 
+    @property
+    def audio_only(self) -> bool:
+        return self.format_policy == 'audio_only'
+
+    def format_options(self) -> Dict:
+        """yt-dlp format selection for the policy"""
+        if self.format_policy == 'best':
+            return {'format': 'best[ext=mp4]/best'}
+        if self.format_policy == 'ocr':
+            # Ascending sort: "best" is the lowest resolution, then the smallest file, that
+            # still meets the OCR floor; without one, "worst" is the largest available
+            return {
+                'format': f'best[height>={self.min_ocr_height}][vcodec!=none]/worst',
+                'format_sort': ['+res', '+size', '+br'],
+            }
+        # TikTok rarely lists audio-only formats; fall back to the smallest muxed file
+        return {'format': 'bestaudio/best', 'format_sort': ['+size', '+br']}
+
     def _ensure_directories(self):
         """Ensure necessary directories exist"""
         for path in [self.video_path, self.audio_path]:
@@ -60,6 +96,33 @@ def retry_with_backoff(max_retries=3, initial_delay=1):
         return wrapper
     return decorator
 
+def verify_download(path: str, info: Dict, duration_tolerance: float = 0.05) -> MediaInfo:
+    """
+    Check a downloaded file against its info dict: expected size, a readable container,
+    the expected tracks and, by demuxing every packet, the reported duration.
+    Raises DownloadIntegrityError; returns the file's MediaInfo.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        raise DownloadIntegrityError(info['id'], "empty file")
+    # Only a single-format download has an exact expected size
+    expected_size = None if info.get('requested_formats') else info.get('filesize')
+    if expected_size and size < expected_size:
+        raise DownloadIntegrityError(info['id'], f"{size} of {expected_size} bytes")
+
+    try:
+        media_info = probe_media(path)
+        seconds = demuxed_duration(path)
+    except RuntimeError as e:
+        raise DownloadIntegrityError(info['id'], str(e)) from e
+    if info.get('vcodec') not in (None, 'none') and not media_info.has_video:
+        raise DownloadIntegrityError(info['id'], "no video track")
+
+    expected_seconds = info.get('duration')
+    if expected_seconds and seconds < expected_seconds - max(1.0, expected_seconds * duration_tolerance):
+        raise DownloadIntegrityError(info['id'], f"{seconds:.1f}s of {expected_seconds:.1f}s")
+    return media_info
+
 def measure_time(func):
     @wraps(func)
     async def wrapper(*args, **kwargs):
@@ -70,29 +133,80 @@ def measure_time(func):
         return result
     return wrapper
 
+def parse_video_id(url: str) -> Optional[str]:
+    """TikTok video id from a full video URL; None for short links"""
+    match = re.search(r'/video/(\d+)', url)
+    return match.group(1) if match else None
+
+# TikTok embeds the page state as a single JSON script; older pages use SIGI_STATE
+_REHYDRATION_SCRIPTS = {
+    script_id: re.compile(r'<script[^>]*\bid=["\']%s["\'][^>]*>' % script_id)
+    for script_id in ('__UNIVERSAL_DATA_FOR_REHYDRATION__', 'SIGI_STATE')
+}
+
+def _script_json(html: str, script_id: str) -> Optional[Dict]:
+    """Parse the JSON body of the script tag with the given id, without parsing the rest of the page"""
+    match = _REHYDRATION_SCRIPTS[script_id].search(html)
+    if not match:
+        return None
+    end = html.find('</script>', match.end())
+    if end == -1:
+        return None
+    try:
+        return json.loads(html[match.end():end])
+    except json.JSONDecodeError:
+        return None
+
+def description_from_html(html: str, video_id: Optional[str] = None) -> Optional[str]:
+    """Video description from a TikTok video page; None if the page carries no video data"""
+    data = _script_json(html, '__UNIVERSAL_DATA_FOR_REHYDRATION__')
+    if data:
+        scope = data.get('__DEFAULT_SCOPE__', {})
+        for item in scope if isinstance(scope, list) else [scope]:
+            try:
+                return item['webapp.video-detail']['itemInfo']['itemStruct']['desc']
+            except (KeyError, TypeError):
+                continue
+
+    data = _script_json(html, 'SIGI_STATE')
+    if data:
+        items = data.get('ItemModule') or {}
+        item = items.get(video_id) if video_id else next(iter(items.values()), None)
+        if item and 'desc' in item:
+            return item['desc']
+    return None
+
+@lru_cache(maxsize=1)
+def get_ssl_context() -> ssl.SSLContext:
+    """Built once per process; loading the CA bundle is not free"""
+    return ssl.create_default_context(cafile=certifi.where())
+
 class VideoDownloader:
-    def __init__(self, config: DownloadConfig = DownloadConfig()):
+    def __init__(self, config: DownloadConfig = DownloadConfig(), session: Optional[aiohttp.ClientSession] = None,
+                 throttle: Optional[Callable[[str], Awaitable]] = None):
         logger.info("Initializing VideoDownloader")
         self.config = config
-        self.ssl_context = ssl.create_default_context(cafile=certifi.where())
+        self.ssl_context = get_ssl_context()
+        # Falls back to the runtime's shared session, then to a per-call session
+        self.session = session
+        # Awaited with each URL before it is requested (per-host rate limiting)
+        self.throttle = throttle
+        # Set by process() in streaming mode: kwargs for media_decode
+        self.stream_source: Optional[Dict] = None
+        # Set by download_video(): the verified file's probe
+        self.media_info: Optional[MediaInfo] = None
 
-    @retry_with_backoff(max_retries=3)
-    async def extract_video_id(self, url: str) -> str:
-        logger.info(f"Extracting video ID from URL: {url}")
-        try:
-            with yt_dlp.YoutubeDL(self.config.ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                logger.info(f"Successfully extracted video ID: {info['id']}")
-                return info['id']
-        except Exception as e:
-            logger.error(f"Failed to extract video ID: {str(e)}", exc_info=True)
-            raise
+    async def _wait_for(self, url: Optional[str]):
+        if self.throttle and url:
+            await self.throttle(url)
 
     @retry_with_backoff(max_retries=3)
-    async def download_video(self, url: str, video_id: str) -> str:
-        logger.info(f"Starting video download for ID: {video_id}")
+    async def download_video(self, info: Dict) -> str:
+        """Download the media for an already extracted info dict; no second page fetch"""
+        logger.info(f"Starting video download for ID: {info['id']}")
         try:
-            output_file = await self._download_implementation(url, video_id)
+            await self._wait_for(info.get('url') or (info.get('requested_formats') or [{}])[0].get('url'))
+            output_file = await self._download_implementation(info)
             logger.info(f"Successfully downloaded video to: {output_file}")
             return output_file
         except Exception as e:
@@ -101,65 +215,24 @@ class VideoDownloader:
 
     @retry_with_backoff(max_retries=3)
     async def extract_description(self, url: str) -> str:
+        """Fallback for when yt-dlp returns no description: fetch the page and read its rehydration data"""
         print("Extracting video description...")
-        async with aiohttp.ClientSession() as session:
+        await self._wait_for(url)
+        session = self.session or current_session()
+        if session is not None:
             async with session.get(url, ssl=self.ssl_context) as response:
                 content = await response.text()
+        else:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, ssl=self.ssl_context) as response:
+                    content = await response.text()
 
-        soup = BeautifulSoup(content, 'html.parser')
-        for script in soup.find_all('script'):
-            if script.string:
-                try:
-                    json_data = json.loads(script.string)
-                    if '__DEFAULT_SCOPE__' in json_data:
-                        scope = json_data['__DEFAULT_SCOPE__']
-                        if isinstance(scope, list):
-                            for item in scope:
-                                if 'webapp.video-detail' in item:
-                                    desc = item['webapp.video-detail']['itemInfo']['itemStruct']['desc']
-                                    print(f"Description extracted: {desc[:100]}...")  # Print first 100 chars
-                                    return desc
-                        elif isinstance(scope, dict):
-                            desc = scope['webapp.video-detail']['itemInfo']['itemStruct']['desc']
-                            print(f"Description extracted: {desc[:100]}...")  # Print first 100 chars
-                            return desc
-                except (json.JSONDecodeError, KeyError, TypeError):
-                    continue
-        print("No description found")
-        return ""
-
-    async def extract_audio(self, video_file: str) -> str:
-        print(f"Starting audio extraction from: {video_file}")
-        video_id = os.path.splitext(os.path.basename(video_file))[0]
-        output_file = f"{self.config.audio_path}/{video_id}.wav"
-        
-        try:
-            cmd = [
-                'ffmpeg', '-i', video_file,
-                '-vn',  # No video
-                '-acodec', 'pcm_s16le',
-                '-ar', '44100',
-                '-y',  # Overwrite output file
-                output_file
-            ]
-            print(f"Running FFmpeg command: {' '.join(cmd)}")
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                print(f"FFmpeg error: {stderr.decode()}")
-                raise Exception(f"FFmpeg failed: {stderr.decode()}")
-            
-            print(f"Audio extracted successfully to: {output_file}")
-            return output_file
-        except Exception as e:
-            print(f"Error during audio extraction: {str(e)}")
-            logger.error(f"Error extracting audio: {str(e)}")
-            raise
+        desc = description_from_html(content, parse_video_id(url))
+        if desc is None:
+            print("No description found")
+            return ""
+        print(f"Description extracted: {desc[:100]}...")  # Print first 100 chars
+        return desc
 
     @measure_time
     async def process(self, url: str) -> tuple:
@@ -167,26 +240,34 @@ class VideoDownloader:
         try:
             print(f"\n=== Starting video processing for URL: {url} ===")
             
-            # First extract all video info to get creator details
-            with yt_dlp.YoutubeDL(self.config.ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                video_id = info['id']
-                creator_name = f"@{info['uploader']}" if info.get('uploader') else None
-                creator_id = info.get('uploader_id')
-            
-            print("Starting concurrent video download and description extraction...")
-            video_file, description = await asyncio.gather(
-                self.download_video(url, video_id),
-                self.extract_description(url)
-            )
+            # The only page fetch: everything below reads from this info dict
+            await self._wait_for(url)
+            info = await run_blocking(self._extract_info, url)
+            video_id = info['id']
+            creator_name = f"@{info['uploader']}" if info.get('uploader') else None
+            creator_id = info.get('uploader_id')
+            description = info.get('description')
             
-            print("Starting audio extraction...")
-            audio_file = await self.extract_audio(video_file)
+            if self.config.stream:
+                # Nothing touches disk; the stream source is read back by the caller
+                video_file = audio_file = None
+                if description is None:
+                    description = await self.extract_description(url)
+            else:
+                if description is None:
+                    print("Starting concurrent video download and description extraction...")
+                    video_file, description = await asyncio.gather(
+                        self.download_video(info),
+                        self.extract_description(url)
+                    )
+                else:
+                    video_file = await self.download_video(info)
+                # The transcription stage decodes audio from the video file itself
+                audio_file = None
             
             print("\n=== Video processing completed ===")
             print(f"Video ID: {video_id}")
             print(f"Video file: {video_file}")
-            print(f"Audio file: {audio_file}")
             print(f"Description length: {len(description)} characters")
             
             try:
@@ -206,42 +287,72 @@ class VideoDownloader:
             logger.error(f"Video processing failed: {str(e)}", exc_info=True)
             raise
 
-    async def _download_implementation(self, url: str, video_id: str) -> str:
-        """Implementation of the video download using yt-dlp"""
-        output_file = os.path.join(self.config.video_path, f"{video_id}.mp4")
-        
-        ydl_opts = {
-            'format': 'best[ext=mp4]',
-            'outtmpl': output_file,
-            'quiet': True,
+    def _ydl_opts(self) -> Dict:
+        """Options shared by extraction and download so the extracted format is the one downloaded"""
+        return {
+            **self.config.ydl_opts,
+            **self.config.format_options(),
+            'outtmpl': os.path.join(self.config.video_path, '%(id)s.%(ext)s'),
             'no_warnings': True,
+            'noprogress': True,
             'extract_flat': False,
-            'concurrent_fragment_downloads': 1
+            'concurrent_fragment_downloads': 1,
+            # A failed attempt leaves a .part file (and a .ytdl fragment index for HLS/DASH);
+            # the next attempt resumes it with a range request instead of starting over
+            'continuedl': True,
+            'retries': self.config.retries,
+            'fragment_retries': self.config.retries,
+            # A skipped fragment would leave a gap in the video that no check downstream sees
+            'skip_unavailable_fragments': False,
         }
 
+    def _extract_info(self, url: str) -> Dict:
+        with yt_dlp.YoutubeDL(self._ydl_opts()) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if self.config.stream:
+                self.stream_source = self._stream_source(ydl, info)
+            return info
+
+    @staticmethod
+    def _stream_source(ydl: yt_dlp.YoutubeDL, info: Dict) -> Dict:
+        """ffmpeg input for the selected format: URL, request headers and cookies (as yt-dlp's FFmpegFD passes them)"""
+        cookies = ydl.cookiejar.get_cookies_for_url(info['url'])
+        return {
+            'source': info['url'],
+            'http_headers': info.get('http_headers') or {},
+            'cookies': ''.join(
+                f"{cookie.name}={cookie.value}; path={cookie.path}; domain={cookie.domain};\r\n"
+                for cookie in cookies
+            ) or None,
+        }
+
+    async def _download_implementation(self, info: Dict) -> str:
+        """Download the selected format of an extracted info dict using yt-dlp"""
+        def download():
+            with yt_dlp.YoutubeDL(self._ydl_opts()) as ydl:
+                # Reuses the formats in the info dict instead of re-extracting the page
+                result = ydl.process_ie_result(info, download=True)
+                downloads = result.get('requested_downloads') or [{}]
+                return downloads[0].get('filepath') or ydl.prepare_filename(result)
+
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                logger.info(f"Downloading video from {url}")
-                ydl.download([url])
-                logger.info(f"Video downloaded successfully to {output_file}")
-                return output_file
+            logger.info(f"Downloading video {info['id']} ({self.config.format_policy} policy)")
+            output_file = await run_blocking(download)
+            try:
+                self.media_info = await run_blocking(verify_download, output_file, info, self.config.duration_tolerance)
+            except DownloadIntegrityError:
+                # Removed so a retry downloads it again instead of reusing the bad file
+                os.remove(output_file)
+                raise
+            size = os.path.getsize(output_file)
+            height = f"{info['height']}p" if info.get('height') else "audio"
+            logger.info(f"Downloaded {info['id']}: format {info.get('format_id')} ({height}), "
+                        f"{size / 1024 / 1024:.2f} MB to {output_file}")
+            return output_file
         except Exception as e:
             logger.error(f"Error downloading video: {str(e)}", exc_info=True)
             raise
 
-    def extract_video_id(self, url: str) -> Optional[str]:
-        """Extract video ID from TikTok URL"""
-        try:
-            # Match video ID pattern in TikTok URL
-            match = re.search(r'video/(\d+)', url)
-            if match:
-                return match.group(1)
-            logger.error(f"Failed to extract video ID: Invalid URL format")
-            return None
-        except Exception as e:
-            logger.error(f"Failed to extract video ID: {str(e)}", exc_info=True)
-            return None
-
 async def extract_data(url: str) -> tuple:
     """Convenience function for external use"""
     downloader = VideoDownloader()
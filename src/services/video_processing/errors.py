@@ -0,0 +1,36 @@
+class PipelineStageError(Exception):
+    """A video failed in a specific pipeline stage; wraps the original exception"""
+
+    def __init__(self, stage: str, cause: BaseException):
+        super().__init__(f"{stage} stage failed: {type(cause).__name__}: {cause}")
+        self.stage = stage
+        self.cause = cause
+        self.error_class = type(cause).__name__
+
+    def __reduce__(self):
+        # Keep the exception picklable across Celery and process pool boundaries
+        return (self.__class__, (self.stage, self.cause))
+
+class StageFailedError(Exception):
+    """A stage that failed without stopping the run, as recorded in the artifact store"""
+
+class VideoQuarantinedError(Exception):
+    """The failure ledger has quarantined the video; it is not retried until released by hand"""
+
+    def __init__(self, video_id: str):
+        super().__init__(f"Video {video_id} is quarantined after repeated failures")
+        self.video_id = video_id
+
+    def __reduce__(self):
+        return (self.__class__, (self.video_id,))
+
+class DownloadIntegrityError(Exception):
+    """A downloaded file is truncated or unreadable; raised before any stage reads it"""
+
+    def __init__(self, video_id: str, reason: str):
+        super().__init__(f"Download of video {video_id} failed integrity check: {reason}")
+        self.video_id = video_id
+        self.reason = reason
+
+    def __reduce__(self):
+        return (self.__class__, (self.video_id, self.reason))
@@ -1,9 +1,11 @@
-import whisper
 import os
 import sys
 import warnings 
 import time
 from ...utils.logger_config import setup_cloudwatch_logging
+from .media_decode import SAMPLE_RATE, decode_audio
+from .model_registry import WHISPER_MODEL_NAME, get_whisper_model
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,26 +14,32 @@ logger = logging.getLogger(__name__)
 warnings.filterwarnings("ignore")
 
 class AudioExtractor:
-    def __init__(self, model_name='small'):
+    def __init__(self, model_name=WHISPER_MODEL_NAME):
         logger.info(f"Initializing AudioExtractor with model: {model_name}")
         self.model_name = model_name
 
-    def transcribe_audio(self, audio_path):
-        logger.info(f"Starting audio transcription for: {audio_path}")
+    def transcribe_audio(self, audio):
+        """
+        Transcribe a media file (video or audio) or a 16 kHz mono float32 array. Files are
+        decoded straight to Whisper's input format through one ffmpeg pipe, with no WAV
+        in between and no second resampling pass inside whisper.load_audio.
+        """
         try:
-            if not os.path.isfile(audio_path):
-                logger.error(f"Audio file not found: {audio_path}")
+            if not isinstance(audio, np.ndarray):
+                logger.info(f"Starting audio transcription for: {audio}")
+                if not os.path.isfile(audio):
+                    raise FileNotFoundError(f"Media file not found: {audio}")
+                audio = decode_audio(audio)
+            logger.info(f"Transcribing {len(audio) / SAMPLE_RATE:.1f}s of audio ({audio.nbytes / (1024 * 1024):.2f} MB)")
+            if not len(audio):
+                logger.info("No audio to transcribe")
                 return ""
 
-            file_size = os.path.getsize(audio_path) / (1024 * 1024)
-            logger.info(f"Audio file size: {file_size:.2f} MB")
-
-            start_time = time.time()
-            model = whisper.load_model(self.model_name)
-            logger.info(f"Model loaded in {time.time() - start_time:.2f} seconds")
+            # Loaded once per process and shared between calls
+            model = get_whisper_model(self.model_name)
 
             transcription_start = time.time()
-            result = model.transcribe(audio_path, verbose=True)
+            result = model.transcribe(audio, verbose=True)
             transcription_time = time.time() - transcription_start
             logger.info(f"Transcription completed in {transcription_time:.2f} seconds")
 
@@ -40,8 +48,9 @@ class AudioExtractor:
             return text
 
         except Exception as e:
+            # Raised so the stage is recorded as failed rather than as an empty transcript
             logger.error(f"Transcription failed: {str(e)}", exc_info=True)
-            return ""
+            raise
 
 def main(audio_path):
     extractor = AudioExtractor()
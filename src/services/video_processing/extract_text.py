@@ -4,10 +4,10 @@ import time
 import botocore.exceptions
 import os
 import uuid
-from moviepy.editor import VideoFileClip
 import asyncio
 import aioboto3
 from ...utils.logger_config import setup_cloudwatch_logging
+from .media_probe import probe_media
 import logging
 
 logger = logging.getLogger(__name__)
@@ -139,10 +139,7 @@ class TextExtractor:
             raise
 
     def get_video_length(self, video_path):
-        clip = VideoFileClip(video_path)
-        duration = clip.duration
-        clip.close()
-        return duration
+        return probe_media(video_path).duration
 
     def delete_from_s3(self, object_name):
         try:
@@ -4,34 +4,37 @@ import cv2
 import uuid
 import logging
 from pathlib import Path
-from paddleocr import PaddleOCR
-from moviepy.editor import VideoFileClip
 from ...utils.logger_config import setup_cloudwatch_logging
+from .media_probe import probe_media
+from .model_registry import get_paddle_ocr
 
 logger = logging.getLogger(__name__)
 
+# Assumed frame rate when neither ffprobe nor OpenCV reports one
+DEFAULT_FPS = 30
+
 class TextExtractor:
     def __init__(self):
         logger.info("Initializing PaddleOCR TextExtractor")
-        self.ocr = PaddleOCR(
-            use_angle_cls=True,
-            lang='en',
-            show_log=False
-        )
+        # Shared per process, so building a TextExtractor per video is cheap
+        self.ocr = get_paddle_ocr()
 
     def get_video_length(self, video_path):
-        clip = VideoFileClip(video_path)
-        duration = clip.duration
-        clip.close()
-        return duration
+        return probe_media(video_path).duration
 
-    def extract_frames(self, video_path, sample_rate=1):
-        """Extract frames from video at given sample rate (frames per second)"""
+    def extract_frames(self, video_path, sample_rate=1, fps=None):
+        """Extract frames from video at given sample rate (frames per second); fps from the media probe"""
         logger.info(f"Extracting frames from video: {video_path}")
         try:
             cap = cv2.VideoCapture(video_path)
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_interval = int(fps / sample_rate)
+            fps = fps or probe_media(video_path).fps
+            if not fps or fps <= 0:
+                # VFR streams and odd containers probe without a rate; an interval of 1
+                # would OCR every frame
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                if not fps or fps <= 0:
+                    fps = DEFAULT_FPS
+            frame_interval = max(int(fps / sample_rate), 1)
             frames = []
             count = 0
 
@@ -52,23 +55,29 @@ class TextExtractor:
             logger.error(f"Frame extraction failed: {str(e)}", exc_info=True)
             raise
 
-    def extract_text(self, video_file_path, video_id):
-        """Main method to extract text from video, maintaining same interface"""
+    def extract_text(self, video, video_id, media_info=None):
+        """
+        Main method to extract text from video, maintaining same interface. video is a
+        file path or a list of already decoded frames (see media_decode); media_info is
+        the download's probe, so the file is not probed again.
+        """
         logger.info(f"Starting text extraction for video ID: {video_id}")
         try:
             start_time = time.time()
             
-            # Verify file exists
-            if not os.path.exists(video_file_path):
-                logger.error(f"Video file not found: {video_file_path}")
-                return ""
-            
-            # Get video length
-            video_length = self.get_video_length(video_file_path)
-            logger.info(f"Video length: {video_length:.2f} seconds")
-            
-            # Extract frames
-            frames = self.extract_frames(video_file_path)
+            if isinstance(video, list):
+                frames = video
+            else:
+                # Verify file exists
+                if not os.path.exists(video):
+                    raise FileNotFoundError(f"Video file not found: {video}")
+                
+                # Get video length
+                media_info = media_info or probe_media(video)
+                logger.info(f"Video length: {media_info.duration:.2f} seconds")
+                
+                # Extract frames
+                frames = self.extract_frames(video, fps=media_info.fps)
             logger.info(f"Processing {len(frames)} frames")
             
             # Process frames and extract text
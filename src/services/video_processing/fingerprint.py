@@ -0,0 +1,146 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+import imagehash
+import numpy as np
+from PIL import Image
+from decouple import config
+from .media_decode import decode_audio, decode_frames
+from .media_probe import MediaInfo, probe_media
+
+logger = logging.getLogger(__name__)
+
+# Keyframes hashed per video, spread evenly over its length
+KEYFRAMES = config('DEDUP_KEYFRAMES', default=5, cast=int)
+# Largest mean Hamming distance (of 64 bits) between aligned keyframe hashes of near-duplicates
+FRAME_DISTANCE = config('DEDUP_FRAME_DISTANCE', default=8, cast=int)
+# Largest Hamming distance between the audio fingerprints of near-duplicates
+AUDIO_DISTANCE = config('DEDUP_AUDIO_DISTANCE', default=12, cast=int)
+# Largest length difference, as a fraction of the longer video
+DURATION_TOLERANCE = config('DEDUP_DURATION_TOLERANCE', default=0.05, cast=float)
+
+# The audio fingerprint only needs the loudness envelope
+AUDIO_SAMPLE_RATE = 4000
+HASH_BITS = 64
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+@dataclass
+class Fingerprint:
+    # 64-bit pHashes of the keyframes, in time order
+    frames: List[int] = field(default_factory=list)
+    # 64-bit loudness-envelope hash; None for silent videos
+    audio: Optional[int] = None
+    duration: float = 0
+
+    def to_dict(self) -> Dict:
+        # Hex strings: JSON and MariaDB's signed BIGINT both mangle 64-bit unsigned ints
+        return {
+            'frames': [f"{value:016x}" for value in self.frames],
+            'audio': None if self.audio is None else f"{self.audio:016x}",
+            'duration': self.duration,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Fingerprint':
+        return cls(
+            frames=[int(value, 16) for value in data['frames']],
+            audio=None if data.get('audio') is None else int(data['audio'], 16),
+            duration=data.get('duration', 0),
+        )
+
+    def distance(self, other: 'Fingerprint') -> Optional[float]:
+        """Mean Hamming distance of aligned keyframes, or None if the two cannot be near-duplicates"""
+        if not self.frames or len(self.frames) != len(other.frames):
+            return None
+        if abs(self.duration - other.duration) > max(1.0, DURATION_TOLERANCE * max(self.duration, other.duration)):
+            return None
+        # Re-uploads keep the soundtrack; a different one means a different video over similar shots
+        if self.audio is not None and other.audio is not None and hamming(self.audio, other.audio) > AUDIO_DISTANCE:
+            return None
+        return sum(hamming(a, b) for a, b in zip(self.frames, other.frames)) / len(self.frames)
+
+    def is_near_duplicate(self, other: 'Fingerprint') -> bool:
+        distance = self.distance(other)
+        return distance is not None and distance <= FRAME_DISTANCE
+
+def _frame_hash(frame: np.ndarray) -> int:
+    # Frames are BGR (OpenCV's layout); PIL expects RGB
+    return int(str(imagehash.phash(Image.fromarray(np.ascontiguousarray(frame[:, :, ::-1])))), 16)
+
+def _audio_hash(audio: np.ndarray) -> Optional[int]:
+    """
+    Difference hash of the loudness envelope: bit i is set when window i+1 is louder
+    than window i. Survives re-encoding, resampling and volume changes.
+    """
+    if len(audio) < (HASH_BITS + 1) * 16:
+        return None
+    windows = np.array_split(audio, HASH_BITS + 1)
+    rms = np.array([np.sqrt(np.mean(window ** 2)) for window in windows])
+    if rms.max() < 1e-4:
+        return None
+    bits = rms[1:] > rms[:-1]
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+def compute_fingerprint(source: str, http_headers: Optional[Dict] = None, cookies: Optional[str] = None,
+                        media_info: Optional[MediaInfo] = None) -> Fingerprint:
+    """Keyframe pHashes and a coarse audio fingerprint of a file or media URL"""
+    media_info = media_info or probe_media(source, http_headers, cookies)
+    frames = []
+    if media_info.has_video:
+        # Only keyframes are decoded; the fps filter repeats them to fill the sampling grid
+        frame_rate = KEYFRAMES / media_info.duration if media_info.duration else 1
+        decoded = decode_frames(source, http_headers, cookies, frame_rate=frame_rate,
+                                media_info=media_info, keyframes_only=True)
+        count = min(KEYFRAMES, len(decoded))
+        frames = [_frame_hash(decoded[int((i + 0.5) * len(decoded) / count)]) for i in range(count)]
+    audio = None
+    if media_info.has_audio:
+        audio = _audio_hash(decode_audio(source, http_headers, cookies, sample_rate=AUDIO_SAMPLE_RATE))
+    return Fingerprint(frames, audio, media_info.duration)
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes under Hamming distance. A radius query only
+    descends into children whose edge distance is within radius of the query's distance
+    to the node (triangle inequality), so it touches a small part of a large index.
+    """
+
+    def __init__(self):
+        # Node: [hash, values, {distance: child}]
+        self.root: Optional[list] = None
+        self.size = 0
+
+    def add(self, key: int, value):
+        self.size += 1
+        if self.root is None:
+            self.root = [key, [value], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> Iterator[Tuple[int, object]]:
+        """(distance, value) of every stored hash within radius of key"""
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= radius:
+                for value in node[1]:
+                    yield distance, value
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+
+    def __len__(self) -> int:
+        return self.size
@@ -0,0 +1,182 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+class MediaCache:
+    """
+    Size-bounded local cache for downloaded media, shared by every process on the node.
+
+    Files are stored by content hash under objects/<hash[:2]>/<hash><ext>, and
+    videos/<video_id>.json maps a video's media kinds ('video', 'audio') to them, so
+    re-runs and backfills on this node reuse media instead of downloading it again.
+    When the cache grows past its budget the least recently used objects are evicted,
+    except those of pinned videos. A pin is a file under pins/ that expires after
+    pin_ttl seconds, so a crashed worker cannot hold media forever.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None, pin_ttl: int = None):
+        self.root = root or config('MEDIA_CACHE_PATH', default='/home/ec2-user/maps-server-processing/files/media')
+        self.max_bytes = max_bytes or int(config('MEDIA_CACHE_MAX_GB', default=10, cast=float) * 1024 ** 3)
+        self.pin_ttl = pin_ttl or config('MEDIA_CACHE_PIN_SECONDS', default=7200, cast=int)
+        self.objects_path = os.path.join(self.root, 'objects')
+        self.index_path = os.path.join(self.root, 'videos')
+        self.pins_path = os.path.join(self.root, 'pins')
+        for path in (self.objects_path, self.index_path, self.pins_path):
+            os.makedirs(path, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.root, 'cache.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _entries(self, video_id: str) -> Dict[str, str]:
+        try:
+            with open(os.path.join(self.index_path, f"{video_id}.json"), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_entries(self, video_id: str, entries: Dict[str, str]):
+        path = os.path.join(self.index_path, f"{video_id}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def add(self, video_id: str, kind: str, path: str) -> str:
+        """Move a downloaded file into the cache and return its cached path"""
+        digest = self._hash_file(path)
+        cached_path = os.path.join(self.objects_path, digest[:2], f"{digest}{os.path.splitext(path)[1]}")
+        with self._locked():
+            if os.path.exists(cached_path):
+                os.remove(path)
+                os.utime(cached_path)
+            else:
+                os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+                shutil.move(path, cached_path)
+            self._write_entries(video_id, {**self._entries(video_id), kind: cached_path})
+        self.evict()
+        return cached_path
+
+    def get(self, video_id: str, kind: str) -> Optional[str]:
+        """Cached path of a video's media, marking it recently used; None if absent or evicted"""
+        path = self._entries(video_id).get(kind)
+        if not path:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    @contextmanager
+    def pin(self, video_id: str):
+        """Protect a video's media from eviction for the duration of the block"""
+        token = self.pin_video(video_id)
+        try:
+            yield
+        finally:
+            self.unpin(token)
+
+    def pin_video(self, video_id: str) -> str:
+        """Pin without a block (e.g. across pipeline stages); returns the token for unpin"""
+        token = os.path.join(self.pins_path, f"{video_id}.{os.getpid()}.{time.monotonic_ns()}")
+        open(token, 'w').close()
+        return token
+
+    def unpin(self, token: str):
+        try:
+            os.remove(token)
+        except FileNotFoundError:
+            pass
+
+    def _pinned_objects(self) -> Set[str]:
+        pinned = set()
+        now = time.time()
+        for name in os.listdir(self.pins_path):
+            path = os.path.join(self.pins_path, name)
+            try:
+                if now - os.path.getmtime(path) > self.pin_ttl:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            pinned.update(self._entries(name.split('.', 1)[0]).values())
+        return pinned
+
+    def _objects(self) -> List[os.DirEntry]:
+        return [
+            entry
+            for shard in os.scandir(self.objects_path) if shard.is_dir()
+            for entry in os.scandir(shard.path) if entry.is_file()
+        ]
+
+    def usage(self) -> int:
+        return sum(entry.stat().st_size for entry in self._objects())
+
+    def evict(self, max_bytes: int = None) -> int:
+        """Delete least recently used, unpinned objects until the cache fits. Returns bytes freed"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._locked():
+            objects = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._objects()]
+            total = sum(size for _, size, _ in objects)
+            if total <= max_bytes:
+                return 0
+
+            pinned = self._pinned_objects()
+            freed = 0
+            for _, size, path in sorted(objects):
+                if total - freed <= max_bytes:
+                    break
+                if path in pinned:
+                    continue
+                os.remove(path)
+                freed += size
+
+        logger.info(f"Evicted {freed / 1024 / 1024:.1f} MB from the media cache "
+                    f"({(total - freed) / 1024 / 1024:.1f} MB used)")
+        return freed
+
+    def sweep(self, directories: Iterable[str], max_age: float = 3600) -> int:
+        """Remove leftovers (partial downloads, orphaned extractions) older than max_age from staging directories"""
+        removed = 0
+        cutoff = time.time() - max_age
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+        if removed:
+            logger.info(f"Removed {removed} stale staging files")
+        return removed
+
+_cache: Optional[MediaCache] = None
+
+def get_media_cache() -> MediaCache:
+    global _cache
+    if _cache is None:
+        _cache = MediaCache()
+    return _cache
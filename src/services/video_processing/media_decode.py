@@ -0,0 +1,118 @@
+import logging
+import os
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .media_probe import MediaInfo, ffmpeg_input_args, probe_media
+
+logger = logging.getLogger(__name__)
+
+# Whisper's input rate
+SAMPLE_RATE = 16000
+# Frames sampled per second of video for OCR, as TextExtractor.extract_frames did
+FRAME_RATE = 1
+
+@dataclass
+class DecodedMedia:
+    # Mono float32 PCM in [-1, 1] at SAMPLE_RATE; empty for silent videos
+    audio: np.ndarray
+    # BGR uint8 frames (OpenCV's layout, which PaddleOCR expects), one per sampled interval
+    frames: List[np.ndarray] = field(default_factory=list)
+
+    @property
+    def audio_seconds(self) -> float:
+        return len(self.audio) / SAMPLE_RATE
+
+def _pcm_to_float(data: bytes) -> np.ndarray:
+    # Same conversion as whisper.load_audio
+    return np.frombuffer(data, np.int16).flatten().astype(np.float32) / 32768.0
+
+def _audio_output(sample_rate: int, target: str) -> List[str]:
+    return ['-map', '0:a:0', '-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', target]
+
+def _frames_output(frame_rate: float, target: str) -> List[str]:
+    return ['-map', '0:v:0', '-an', '-vf', f"fps={frame_rate}", '-f', 'rawvideo', '-pix_fmt', 'bgr24', target]
+
+def _split_frames(data: bytes, size: Tuple[int, int]) -> List[np.ndarray]:
+    width, height = size
+    frame_bytes = width * height * 3
+    count = len(data) // frame_bytes
+    # Writable like OpenCV's frames, which OCR preprocessing may modify in place
+    frames = np.frombuffer(bytearray(data[:count * frame_bytes]), np.uint8).reshape(count, height, width, 3)
+    return list(frames)
+
+def _run(cmd: List[str]) -> bytes:
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace')[-2000:]}")
+    return result.stdout
+
+def decode_audio(source: str, http_headers: Optional[Dict] = None, cookies: Optional[str] = None,
+                 sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode the audio track of a file or URL to mono float32 PCM through an ffmpeg pipe"""
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error'] + ffmpeg_input_args(source, http_headers, cookies)
+    return _pcm_to_float(_run(cmd + _audio_output(sample_rate, '-')))
+
+def decode_frames(source: str, http_headers: Optional[Dict] = None, cookies: Optional[str] = None,
+                  frame_rate: float = FRAME_RATE, media_info: Optional[MediaInfo] = None,
+                  keyframes_only: bool = False) -> List[np.ndarray]:
+    """
+    Decode frames sampled at frame_rate per second from a file or URL through an ffmpeg pipe.
+    keyframes_only skips decoding every other frame, for a fraction of the CPU.
+    """
+    media_info = media_info or probe_media(source, http_headers, cookies)
+    if not media_info.has_video:
+        return []
+    size = (media_info.width, media_info.height)
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+    if keyframes_only:
+        cmd += ['-skip_frame', 'nokey']
+    cmd += ffmpeg_input_args(source, http_headers, cookies)
+    return _split_frames(_run(cmd + _frames_output(frame_rate, '-')), size)
+
+def decode_media(source: str, http_headers: Optional[Dict] = None, cookies: Optional[str] = None,
+                 sample_rate: int = SAMPLE_RATE, frame_rate: float = FRAME_RATE,
+                 media_info: Optional[MediaInfo] = None) -> DecodedMedia:
+    """
+    Decode audio and sampled frames in one ffmpeg pass, without touching disk.
+
+    For a URL the media is fetched once and both outputs are read from pipes: audio on
+    an extra pipe, frames on stdout.
+    """
+    media_info = media_info or probe_media(source, http_headers, cookies)
+    if not media_info.has_video:
+        return DecodedMedia(decode_audio(source, http_headers, cookies, sample_rate) if media_info.has_audio else np.zeros(0, np.float32))
+    if not media_info.has_audio:
+        return DecodedMedia(np.zeros(0, np.float32), decode_frames(source, http_headers, cookies, frame_rate, media_info))
+    size = (media_info.width, media_info.height)
+
+    audio_read, audio_write = os.pipe()
+    cmd = (['ffmpeg', '-nostdin', '-loglevel', 'error'] + ffmpeg_input_args(source, http_headers, cookies)
+           + _audio_output(sample_rate, f"pipe:{audio_write}") + _frames_output(frame_rate, 'pipe:1'))
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=(audio_write,))
+    os.close(audio_write)
+
+    # Both pipes must be drained at once or ffmpeg blocks on whichever fills first
+    chunks = {}
+    def drain(name, stream):
+        with stream:
+            chunks[name] = stream.read()
+    readers = [
+        threading.Thread(target=drain, args=('audio', os.fdopen(audio_read, 'rb'))),
+        threading.Thread(target=drain, args=('stderr', process.stderr)),
+    ]
+    for reader in readers:
+        reader.start()
+    frames_data = process.stdout.read()
+    process.stdout.close()
+    for reader in readers:
+        reader.join()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed: {chunks['stderr'].decode(errors='replace')[-2000:]}")
+
+    media = DecodedMedia(_pcm_to_float(chunks['audio']), _split_frames(frames_data, size))
+    logger.info(f"Decoded {media.audio_seconds:.1f}s of audio and {len(media.frames)} frames "
+                f"({size[0]}x{size[1]}) without writing to disk")
+    return media
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import subprocess
+from dataclasses import asdict, dataclass
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, List, Optional
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Videos shorter than this carry no useful speech or on-screen text
+MIN_VIDEO_SECONDS = config('MIN_VIDEO_SECONDS', default=2.0, cast=float)
+
+@dataclass
+class MediaInfo:
+    duration: float = 0
+    fps: float = 0
+    # Displayed size, after applying rotation
+    width: int = 0
+    height: int = 0
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    rotation: int = 0
+    size_bytes: int = 0
+
+    @property
+    def has_video(self) -> bool:
+        return self.video_codec is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio_codec is not None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> Optional['MediaInfo']:
+        return cls(**data) if data else None
+
+def ffmpeg_input_args(source: str, http_headers: Optional[Dict] = None, cookies: Optional[str] = None) -> List[str]:
+    """ffmpeg/ffprobe input options for a local path or a media URL"""
+    args = []
+    if http_headers:
+        args += ['-headers', ''.join(f"{key}: {value}\r\n" for key, value in http_headers.items())]
+    if cookies:
+        args += ['-cookies', cookies]
+    return args + ['-i', source]
+
+def _frame_rate(stream: Dict) -> float:
+    for key in ('avg_frame_rate', 'r_frame_rate'):
+        try:
+            rate = float(Fraction(stream.get(key) or '0/0'))
+        except (ValueError, ZeroDivisionError):
+            continue
+        if rate > 0:
+            return rate
+    return 0
+
+def _parse_probe(data: Dict) -> MediaInfo:
+    streams = data.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    fmt = data.get('format', {})
+    info = MediaInfo(
+        duration=float(fmt.get('duration') or (video or audio or {}).get('duration') or 0),
+        size_bytes=int(fmt.get('size') or 0),
+        audio_codec=audio.get('codec_name') if audio else None,
+    )
+    if video is not None:
+        info.video_codec = video.get('codec_name')
+        info.fps = _frame_rate(video)
+        info.width, info.height = int(video.get('width', 0)), int(video.get('height', 0))
+        info.rotation = int(video.get('tags', {}).get('rotate', 0))
+        for side_data in video.get('side_data_list', []):
+            info.rotation = int(side_data.get('rotation', info.rotation))
+        # ffmpeg auto-rotates while decoding, so portrait phone videos come out transposed
+        if abs(info.rotation) % 180 == 90:
+            info.width, info.height = info.height, info.width
+    return info
+
+def _run_ffprobe(args: List[str]) -> MediaInfo:
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams'] + args,
+        capture_output=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.decode(errors='replace')[-2000:]}")
+    return _parse_probe(json.loads(result.stdout))
+
+@lru_cache(maxsize=256)
+def _probe_file(path: str, mtime_ns: int, size: int) -> MediaInfo:
+    # mtime and size are part of the key so a replaced file is probed again
+    return _run_ffprobe(ffmpeg_input_args(path))
+
+def probe_media(source: str, http_headers: Optional[Dict] = None, cookies: Optional[str] = None) -> MediaInfo:
+    """
+    Duration, fps, size, codecs, audio presence and rotation from a single ffprobe run.
+    Local files are probed once per process; store the result (to_dict) with the media
+    so other stages and processes do not probe again.
+    """
+    if http_headers is None and cookies is None and os.path.exists(source):
+        stat = os.stat(source)
+        return _probe_file(source, stat.st_mtime_ns, stat.st_size)
+    return _run_ffprobe(ffmpeg_input_args(source, http_headers, cookies))
+
+def demuxed_duration(path: str) -> float:
+    """
+    Seconds of media actually present in a file, found by demuxing every packet without
+    decoding (ffmpeg stream copy to the null muxer). Unlike the container's declared
+    duration this catches truncated files. Raises RuntimeError on demux errors.
+    """
+    result = subprocess.run(
+        ['ffmpeg', '-nostdin', '-v', 'error', '-nostats', '-progress', 'pipe:1',
+         '-i', path, '-map', '0', '-c', 'copy', '-f', 'null', '-'],
+        capture_output=True
+    )
+    errors = result.stderr.decode(errors='replace').strip()
+    # A truncated mp4 is logged as an error, but ffmpeg still exits with 0
+    if result.returncode != 0 or errors:
+        raise RuntimeError(f"ffmpeg could not read the file: {errors[-2000:]}")
+    out_times = [
+        line.split('=', 1)[1] for line in result.stdout.decode(errors='replace').splitlines()
+        if line.startswith('out_time_us=')
+    ]
+    try:
+        return int(out_times[-1]) / 1e6 if out_times else 0
+    except ValueError:
+        # N/A when nothing was written
+        return 0
+
+def skip_reasons(info: Optional[MediaInfo], audio_only: bool = False) -> Dict[str, str]:
+    """Extraction stages ('transcribe', 'ocr') not worth running on this media, with the reason"""
+    reasons = {'ocr': "audio-only download"} if audio_only else {}
+    if info is None:
+        return reasons
+    # A zero duration means the container did not report one, not an empty video
+    if 0 < info.duration < MIN_VIDEO_SECONDS:
+        reason = f"only {info.duration:.1f}s long"
+        return {'transcribe': reason, 'ocr': reason}
+    if not info.has_audio:
+        reasons['transcribe'] = "no audio track"
+    if not info.has_video:
+        reasons['ocr'] = "no video track"
+    return reasons
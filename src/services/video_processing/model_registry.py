@@ -0,0 +1,134 @@
+import gc
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+import psutil
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+WHISPER_MODEL_NAME = 'small'
+
+@dataclass
+class LoadedModel:
+    key: str
+    model: Any
+    load_seconds: float
+    memory_bytes: int
+    last_used: float
+
+def _estimate_memory(model: Any, rss_delta: int) -> int:
+    """Parameter memory for torch models, otherwise the RSS growth seen while loading"""
+    parameters = getattr(model, 'parameters', None)
+    if callable(parameters):
+        try:
+            total = sum(p.numel() * p.element_size() for p in model.parameters())
+            total += sum(b.numel() * b.element_size() for b in model.buffers())
+            return total
+        except Exception:
+            pass
+    return max(rss_delta, 0)
+
+class ModelRegistry:
+    """
+    Process-wide cache of heavy models (Whisper, PaddleOCR).
+
+    Each model is loaded once per process, on first use or eagerly through preload(),
+    and the same instance is handed to every caller afterwards. With idle_timeout set,
+    models unused for that many seconds are dropped by a background reaper.
+    """
+
+    def __init__(self, idle_timeout: float = 0):
+        self.idle_timeout = idle_timeout
+        self._models: Dict[str, LoadedModel] = {}
+        self._lock = threading.RLock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            loaded = self._models.get(key)
+            if loaded is None:
+                process = psutil.Process(os.getpid())
+                rss_before = process.memory_info().rss
+                start_time = time.time()
+
+                model = loader()
+
+                load_seconds = time.time() - start_time
+                memory_bytes = _estimate_memory(model, process.memory_info().rss - rss_before)
+                loaded = LoadedModel(key, model, load_seconds, memory_bytes, time.monotonic())
+                self._models[key] = loaded
+                logger.info(f"Model {key} loaded in {load_seconds:.2f} seconds "
+                            f"({memory_bytes / (1024 * 1024):.1f}MB, pid={os.getpid()})")
+                self._start_reaper()
+
+            loaded.last_used = time.monotonic()
+            return loaded.model
+
+    def evict(self, key: str) -> bool:
+        with self._lock:
+            loaded = self._models.pop(key, None)
+        if loaded is None:
+            return False
+        del loaded
+        gc.collect()
+        logger.info(f"Evicted model {key}")
+        return True
+
+    def evict_idle(self, max_idle: float = None) -> int:
+        """Drop models unused for max_idle seconds (defaults to idle_timeout)"""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        if not max_idle:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            idle_keys = [key for key, loaded in self._models.items() if now - loaded.last_used > max_idle]
+        return sum(self.evict(key) for key in idle_keys)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held per loaded model"""
+        with self._lock:
+            return {key: loaded.memory_bytes for key, loaded in self._models.items()}
+
+    def _start_reaper(self):
+        if not self.idle_timeout or (self._reaper and self._reaper.is_alive()):
+            return
+
+        def reap():
+            while True:
+                time.sleep(self.idle_timeout / 2)
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name='model-reaper', daemon=True)
+        self._reaper.start()
+
+registry = ModelRegistry(idle_timeout=config('MODEL_IDLE_TIMEOUT', default=0, cast=float))
+
+def get_whisper_model(model_name: str = WHISPER_MODEL_NAME):
+    """Shared Whisper model for this process"""
+    def load():
+        import whisper
+        return whisper.load_model(model_name)
+    return registry.get(f"whisper:{model_name}", load)
+
+def get_paddle_ocr():
+    """Shared PaddleOCR instance for this process"""
+    def load():
+        from paddleocr import PaddleOCR
+        return PaddleOCR(
+            use_angle_cls=True,
+            lang='en',
+            show_log=False
+        )
+    return registry.get("paddleocr:en", load)
+
+def preload_models(stages: Iterable[str] = ('audio', 'ocr')):
+    """Eagerly load the models used by the given stages"""
+    for stage in stages:
+        if stage == 'audio':
+            get_whisper_model()
+        elif stage == 'ocr':
+            get_paddle_ocr()
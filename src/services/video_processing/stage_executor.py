@@ -0,0 +1,171 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set, Tuple
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+AUDIO_STAGE = 'audio'
+OCR_STAGE = 'ocr'
+
+def parse_cpu_list(cpus: Optional[str]) -> Optional[Set[int]]:
+    """Parse a CPU list like '0-3,6' into a set of CPU ids"""
+    if not cpus:
+        return None
+    result = set()
+    for part in cpus.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-')
+            result.update(range(int(first), int(last) + 1))
+        elif part:
+            result.add(int(part))
+    return result or None
+
+# Configuration
+@dataclass
+class StageConfig:
+    audio_workers: int = field(default_factory=lambda: config('AUDIO_STAGE_WORKERS', default=1, cast=int))
+    ocr_workers: int = field(default_factory=lambda: config('OCR_STAGE_WORKERS', default=1, cast=int))
+    # CPU affinity per stage, e.g. AUDIO_STAGE_CPUS=0-1 OCR_STAGE_CPUS=2-3
+    audio_cpus: Optional[Set[int]] = field(default_factory=lambda: parse_cpu_list(config('AUDIO_STAGE_CPUS', default=None)))
+    ocr_cpus: Optional[Set[int]] = field(default_factory=lambda: parse_cpu_list(config('OCR_STAGE_CPUS', default=None)))
+    start_method: str = field(default_factory=lambda: config('STAGE_START_METHOD', default='spawn'))
+
+def _init_stage_worker(stage: str, cpus: Optional[Set[int]]):
+    """Runs once in every stage worker process"""
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning(f"Could not pin {stage} worker to CPUs {sorted(cpus)}: {str(e)}")
+    logger.info(f"Started {stage} stage worker (pid={os.getpid()}, cpus={sorted(cpus) if cpus else 'all'})")
+
+    if config('PRELOAD_MODELS', default=False, cast=bool):
+        from src.services.video_processing.model_registry import preload_models
+        preload_models([stage])
+
+def _run_transcription(audio) -> Tuple[str, float]:
+    from src.services.video_processing.extract_audio import AudioExtractor
+    start_time = time.time()
+    result = AudioExtractor().transcribe_audio(audio)
+    return result, time.time() - start_time
+
+def _run_ocr(video, video_id: str, media_info=None) -> Tuple[str, float]:
+    from src.services.video_processing.extract_text_paddleocr import TextExtractor
+    start_time = time.time()
+    result = TextExtractor().extract_text(video, video_id, media_info)
+    return result, time.time() - start_time
+
+def runs_in_threads() -> bool:
+    """True where the stage pools fall back to threads, so the models load in this process"""
+    # Daemonic processes (e.g. Celery prefork children) may not start child processes
+    return multiprocessing.current_process().daemon
+
+class StageExecutor:
+    """
+    Runs the audio transcription and OCR stages concurrently in separate worker pools.
+
+    Each stage gets its own process pool (sized and pinned per StageConfig) so the two
+    CPU-bound stages are not serialized by the GIL. Pools are created lazily and kept
+    for the life of the process so workers are reused across videos.
+
+    Daemonic processes (e.g. Celery prefork children) may not start child processes,
+    so there each stage falls back to a thread pool.
+    """
+
+    def __init__(self, stage_config: StageConfig = None):
+        self.config = stage_config or StageConfig()
+        self._pools: Dict[str, concurrent.futures.Executor] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, stage: str) -> concurrent.futures.Executor:
+        with self._lock:
+            if stage not in self._pools:
+                workers = self.config.audio_workers if stage == AUDIO_STAGE else self.config.ocr_workers
+                cpus = self.config.audio_cpus if stage == AUDIO_STAGE else self.config.ocr_cpus
+
+                if runs_in_threads():
+                    logger.warning(f"Daemonic process, running {stage} stage in threads")
+                    self._pools[stage] = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=workers, thread_name_prefix=f"{stage}-stage"
+                    )
+                else:
+                    self._pools[stage] = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context(self.config.start_method),
+                        initializer=_init_stage_worker,
+                        initargs=(stage, cpus)
+                    )
+                logger.info(f"Created {stage} stage pool with {workers} workers")
+            return self._pools[stage]
+
+    def run_extraction(self, audio_file, video_file, video_id: str,
+                       stages: Tuple[str, ...] = (AUDIO_STAGE, OCR_STAGE),
+                       media_info=None) -> Tuple[str, str, Dict[str, float]]:
+        """
+        Transcribe audio and OCR the video concurrently. Takes file paths, or in
+        streaming mode the decoded audio array and frame list, plus the media probe.
+
+        A failing stage is logged and yields an empty string, as before, and is left
+        out of the timings. Stages not listed in stages are skipped and yield None.
+
+        Returns:
+            Tuple[str, str, Dict[str, float]]: audio text, OCR text and per-stage wall times
+        """
+        start_time = time.time()
+        audio_future = self._pool(AUDIO_STAGE).submit(_run_transcription, audio_file) if AUDIO_STAGE in stages else None
+        text_future = self._pool(OCR_STAGE).submit(_run_ocr, video_file, video_id, media_info) if OCR_STAGE in stages else None
+
+        timings = {}
+        audio_data = text_data = None
+
+        # Get audio data
+        if audio_future is not None:
+            try:
+                audio_data, timings[AUDIO_STAGE] = audio_future.result()
+                logger.info(f"Audio extraction completed. Length: {len(audio_data)}")
+                logger.debug(f"Audio data: {audio_data[:100]}...")  # First 100 chars
+            except Exception as e:
+                logger.error(f"Audio extraction failed: {str(e)}", exc_info=True)
+                audio_data = ""
+
+        # Get text data
+        if text_future is not None:
+            try:
+                text_data, timings[OCR_STAGE] = text_future.result()
+                logger.info(f"Text extraction completed. Length: {len(text_data)}")
+                logger.debug(f"Extracted text: {text_data[:100]}...")  # First 100 chars
+            except Exception as e:
+                logger.error(f"Text extraction failed: {str(e)}", exc_info=True)
+                text_data = ""
+
+        timings['wall'] = time.time() - start_time
+        logger.info(
+            f"Extraction stages: audio {timings.get(AUDIO_STAGE, 0):.2f}s, "
+            f"ocr {timings.get(OCR_STAGE, 0):.2f}s, wall {timings['wall']:.2f}s "
+            f"(sequential would be {timings.get(AUDIO_STAGE, 0) + timings.get(OCR_STAGE, 0):.2f}s)"
+        )
+        return audio_data, text_data, timings
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=wait)
+            self._pools.clear()
+
+_executor: Optional[StageExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_stage_executor() -> StageExecutor:
+    """Process-wide StageExecutor, so stage workers survive between videos"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = StageExecutor()
+        return _executor
@@ -191,7 +191,8 @@ def search_location(recommendations: str) -> Dict[str, Dict]:
     return google_map_dict
 
 def store_video_data(video_id: str, url: str, creator_info: dict, description: str, 
-                     text_data: str, audio_data: str, recommendations: str, places_data: dict) -> None:
+                     text_data: str, audio_data: str, recommendations: str, places_data: dict,
+                     raise_errors: bool = False) -> None:
     """
     Store video processing results in both S3 and database.
     
@@ -204,6 +205,7 @@ def store_video_data(video_id: str, url: str, creator_info: dict, description: s
         audio_data: Transcribed audio data
         recommendations: Processed recommendations from ChatGPT
         places_data: Dictionary containing place details
+        raise_errors: Re-raise database errors instead of only logging them
     """
     # Prepare data structure
     extracted_data = {
@@ -250,4 +252,6 @@ def store_video_data(video_id: str, url: str, creator_info: dict, description: s
         print("Successfully updated database")
     except Exception as e:
         print(f"Error updating database: {str(e)}")
+        if raise_errors:
+            raise
 
@@ -0,0 +1,223 @@
+"""
+process_video split into a Celery stage graph:
+
+    download -> dedup -> {transcribe, ocr} -> llm -> geocode -> store
+
+A video the dedup stage finds to be a near-duplicate of a stored one passes through
+the analysis stages untouched and is stored by linking it to the original's restaurants.
+
+Each stage is routed to its own queue so network-bound and CPU-bound stages can be
+sized separately on the same box, e.g.:
+
+    celery worker -Q pipeline.download,pipeline.llm,pipeline.geocode,pipeline.store -P threads -c 16
+    celery worker -Q pipeline.dedup -c 2
+    celery worker -Q pipeline.transcribe -c 1
+    celery worker -Q pipeline.ocr -c 1
+
+Stages hand each other only the url, video id and media cache pin; media stays in
+the local media cache and stage outputs go to the artifact store, never through the
+broker. A stage whose output is already stored is skipped, so a retried graph
+resumes where it failed. The chord after the {transcribe, ocr} group needs a result backend.
+"""
+from celery import chain, group, shared_task
+from src.services.video_processing.async_runtime import get_runtime
+from src.services.video_processing.artifact_store import get_artifact_store, media_present
+from src.services.video_processing.download_manager import get_download_manager
+from src.services.video_processing.download_video import parse_video_id
+from src.services.video_processing.errors import PipelineStageError
+from src.services.video_processing.extract_audio import AudioExtractor
+from src.services.video_processing.extract_text_paddleocr import TextExtractor
+from src.services.video_processing.media_cache import get_media_cache
+from src.services.video_processing.media_decode import decode_audio, decode_frames
+from src.services.video_processing.media_probe import MediaInfo, skip_reasons
+from src.services.video_processing.utils import query_chatgpt, search_location, store_video_data
+from src.utils.database_utils import link_duplicate_video
+from src.utils.fingerprint_index import check_duplicate, record_fingerprint
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Queue per stage
+PIPELINE_QUEUES = {
+    'download': 'pipeline.download',
+    # Decodes keyframes and audio: CPU-bound, kept off the network-bound download queue
+    'dedup': 'pipeline.dedup',
+    'transcribe': 'pipeline.transcribe',
+    'ocr': 'pipeline.ocr',
+    'llm': 'pipeline.llm',
+    'geocode': 'pipeline.geocode',
+    'store': 'pipeline.store',
+}
+
+def _checkpointed(context: dict, stage: str, compute, carry_on: bool = False):
+    """
+    Skip a stage whose output is already in the artifact store, otherwise run and store it.
+    With carry_on a failure only marks the stage failed and the graph continues without
+    its output, as process_video does for the extraction stages.
+    """
+    store = get_artifact_store()
+    video_id = context['video_id']
+    if store.is_done(video_id, stage):
+        logger.info(f"Skipping {stage} for video {video_id}, already done")
+        return context
+
+    start_time = time.time()
+    try:
+        store.put(video_id, stage, compute())
+    except Exception as e:
+        store.mark_failed(video_id, stage, e)
+        if carry_on:
+            logger.error(f"{stage} stage for {video_id} failed, continuing without it: {str(e)}", exc_info=True)
+            return context
+        raise PipelineStageError(stage, e) from e
+    logger.info(f"{stage} stage for {video_id} took {time.time() - start_time:.2f} seconds")
+    return context
+
+@shared_task(name='pipeline.download')
+def download_stage(url: str, from_stage: str = None) -> dict:
+    store = get_artifact_store()
+    video_id = parse_video_id(url)
+    if video_id and from_stage:
+        store.invalidate(video_id, from_stage)
+
+    download = store.get(video_id, 'download') if video_id else None
+    needs_media = not video_id or not (store.is_done(video_id, 'transcribe') and store.is_done(video_id, 'ocr'))
+    if download is None or (needs_media and not media_present(download)):
+        start_time = time.time()
+        try:
+            result = get_runtime().run(get_download_manager().download(url))
+        except Exception as e:
+            raise PipelineStageError('download', e) from e
+        video_id = result.video_id
+        if from_stage and from_stage != 'download' and not parse_video_id(url):
+            # Short links only resolve to a video id once downloaded
+            store.invalidate(video_id, from_stage)
+        store.put(video_id, 'download', result.artifact())
+        logger.info(f"Download stage for {video_id} took {time.time() - start_time:.2f} seconds")
+    # Released by the store stage; expires on its own if the graph dies midway
+    return {'url': url, 'video_id': video_id, 'pin': get_media_cache().pin_video(video_id)}
+
+@shared_task(name='pipeline.dedup')
+def dedup_stage(context: dict) -> dict:
+    store = get_artifact_store()
+    video_id = context['video_id']
+    return _checkpointed(context, 'dedup', lambda: check_duplicate(video_id, store.get(video_id, 'download')))
+
+def _duplicate_of(video_id: str):
+    return (get_artifact_store().get(video_id, 'dedup') or {}).get('duplicate_of')
+
+def _skip_reason(download: dict, stage: str):
+    media_info = MediaInfo.from_dict(download.get('probe'))
+    return skip_reasons(media_info, get_download_manager().download_config.audio_only).get(stage)
+
+@shared_task(name='pipeline.transcribe')
+def transcribe_stage(context: dict) -> dict:
+    if _duplicate_of(context['video_id']):
+        return context
+    download = get_artifact_store().get(context['video_id'], 'download')
+    reason = _skip_reason(download, 'transcribe')
+    if reason:
+        logger.info(f"Skipping transcribe for video {context['video_id']}: {reason}")
+        return _checkpointed(context, 'transcribe', lambda: "")
+    if download.get('stream'):
+        audio = lambda: decode_audio(**download['stream'])
+    else:
+        path = download['audio_file'] or download['video_file']
+        audio = lambda: path
+    return _checkpointed(context, 'transcribe', lambda: AudioExtractor().transcribe_audio(audio()), carry_on=True)
+
+@shared_task(name='pipeline.ocr')
+def ocr_stage(context: dict) -> dict:
+    if _duplicate_of(context['video_id']):
+        return context
+    download = get_artifact_store().get(context['video_id'], 'download')
+    reason = _skip_reason(download, 'ocr')
+    if reason:
+        logger.info(f"Skipping ocr for video {context['video_id']}: {reason}")
+        return _checkpointed(context, 'ocr', lambda: "")
+    media_info = MediaInfo.from_dict(download.get('probe'))
+    if download.get('stream'):
+        video = lambda: decode_frames(**download['stream'], media_info=media_info)
+    else:
+        video = lambda: download['video_file']
+    return _checkpointed(context, 'ocr', lambda: TextExtractor().extract_text(video(), context['video_id'], media_info),
+                         carry_on=True)
+
+@shared_task(name='pipeline.llm')
+def llm_stage(contexts: list) -> dict:
+    # Both branches of the chord carry the same context
+    context = contexts[0]
+    store = get_artifact_store()
+    video_id = context['video_id']
+    if _duplicate_of(video_id):
+        return context
+    return _checkpointed(context, 'llm', lambda: query_chatgpt(
+        store.get(video_id, 'download')['description'],
+        store.get(video_id, 'ocr', ""),
+        store.get(video_id, 'transcribe', "")
+    ))
+
+@shared_task(name='pipeline.geocode')
+def geocode_stage(context: dict) -> dict:
+    if _duplicate_of(context['video_id']):
+        return context
+    store = get_artifact_store()
+    return _checkpointed(context, 'geocode', lambda: search_location(store.get(context['video_id'], 'llm')))
+
+@shared_task(name='pipeline.store')
+def store_stage(context: dict) -> str:
+    store = get_artifact_store()
+    video_id = context['video_id']
+    download = store.get(video_id, 'download')
+    duplicate_of = _duplicate_of(video_id)
+    if duplicate_of:
+        _checkpointed(context, 'store', lambda: link_duplicate_video(
+            video_id=video_id,
+            platform='tiktok',
+            video_url=context['url'],
+            creator_info=download['creator_info'],
+            original_video_id=duplicate_of
+        ))
+    else:
+        _checkpointed(context, 'store', lambda: store_video_data(
+            video_id=video_id,
+            url=context['url'],
+            creator_info=download['creator_info'],
+            description=download['description'],
+            text_data=store.get(video_id, 'ocr', ""),
+            audio_data=store.get(video_id, 'transcribe', ""),
+            recommendations=store.get(video_id, 'llm'),
+            places_data=store.get(video_id, 'geocode')
+        ))
+    # Only stored videos are indexed, so a duplicate never points at unfinished results
+    record_fingerprint(video_id, store.get(video_id, 'dedup'))
+
+    # Media stays in the media cache for reruns; let it be evicted again
+    get_media_cache().unpin(context['pin'])
+    return video_id
+
+def _on_queue(signature, stage: str):
+    return signature.set(queue=PIPELINE_QUEUES[stage])
+
+# For the Celery app config: app.conf.task_routes = TASK_ROUTES
+TASK_ROUTES = {f"pipeline.{stage}": {'queue': queue} for stage, queue in PIPELINE_QUEUES.items()}
+
+def build_video_pipeline(url: str, from_stage: str = None):
+    """Celery canvas for one video: download -> dedup -> {transcribe, ocr} -> llm -> geocode -> store"""
+    return chain(
+        _on_queue(download_stage.s(url, from_stage), 'download'),
+        _on_queue(dedup_stage.s(), 'dedup'),
+        group(
+            _on_queue(transcribe_stage.s(), 'transcribe'),
+            _on_queue(ocr_stage.s(), 'ocr'),
+        ),
+        _on_queue(llm_stage.s(), 'llm'),
+        _on_queue(geocode_stage.s(), 'geocode'),
+        _on_queue(store_stage.s(), 'store'),
+    )
+
+def enqueue_video(url: str, from_stage: str = None):
+    """Start the stage graph for a video and return its AsyncResult"""
+    logger.info(f"Enqueuing video pipeline for {url}")
+    return build_video_pipeline(url, from_stage).apply_async()
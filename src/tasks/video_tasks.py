@@ -1,100 +1,208 @@
 from celery import shared_task
-from src.services.video_processing.download_video import VideoDownloader
-from src.services.video_processing.extract_audio import AudioExtractor
-from src.services.video_processing.extract_text_paddleocr import TextExtractor
+from celery.signals import celeryd_after_setup, worker_process_init
+from decouple import config
+from src.services.video_processing.async_runtime import get_runtime, run_blocking
+from src.services.video_processing.artifact_store import ArtifactStore, get_artifact_store, media_present
+from src.services.video_processing.download_manager import get_download_manager
+from src.services.video_processing.download_video import parse_video_id
+from src.services.video_processing.media_cache import get_media_cache
+from src.services.video_processing.media_decode import decode_audio, decode_frames, decode_media
+from src.services.video_processing.media_probe import MediaInfo, skip_reasons
+from src.services.video_processing.errors import PipelineStageError
+from src.services.video_processing.model_registry import preload_models
+from src.services.video_processing.stage_executor import AUDIO_STAGE, OCR_STAGE, get_stage_executor, runs_in_threads
 from src.services.video_processing.utils import query_chatgpt, search_location, store_video_data
-import asyncio
-import concurrent.futures
-import os
+from src.utils.database_utils import link_duplicate_video
+from src.utils.fingerprint_index import check_duplicate, record_fingerprint
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
-@shared_task
-def process_video(url: str):
+# Artifact store stage -> stage executor pool
+EXTRACTION_STAGES = {'transcribe': AUDIO_STAGE, 'ocr': OCR_STAGE}
+
+# Stage graph queues whose tasks run a model in the Celery worker process itself
+# (pipeline_tasks.PIPELINE_QUEUES); the other pipeline queues never load one
+MODEL_QUEUES = {'pipeline.transcribe': AUDIO_STAGE, 'pipeline.ocr': OCR_STAGE}
+
+# Queues this worker consumes, recorded before the pool starts its processes
+_worker_queues = None
+
+@celeryd_after_setup.connect
+def remember_worker_queues(sender, instance, **kwargs):
+    global _worker_queues
+    _worker_queues = set(instance.app.amqp.queues.consume_from or instance.app.amqp.queues)
+
+def models_to_preload(queues, extraction_in_process: bool) -> list:
+    """
+    Model stages a worker process consuming queues runs itself: transcribe and ocr stage
+    tasks, and process_video (any queue outside the stage graph) when its extraction runs
+    in threads. Otherwise the stage executor's process pools load their own copies.
+    """
+    stages = {MODEL_QUEUES[queue] for queue in queues if queue in MODEL_QUEUES}
+    runs_process_video = any(not queue.startswith('pipeline.') for queue in queues)
+    if runs_process_video and extraction_in_process:
+        stages.update((AUDIO_STAGE, OCR_STAGE))
+    return sorted(stages)
+
+@worker_process_init.connect
+def preload_worker_models(**kwargs):
+    """Load the Whisper and PaddleOCR models this Celery worker process uses once, at start"""
+    if config('PRELOAD_MODELS', default=False, cast=bool):
+        stages = models_to_preload(_worker_queues or {'celery'}, runs_in_threads())
+        if stages:
+            logger.info(f"Preloading {stages} models for worker process")
+            preload_models(stages)
+
+def decode_stream(stream: dict, stages: list, media_info: MediaInfo = None):
+    """Decode a streamed download into the in-memory inputs of the pending extraction stages"""
+    if stages == ['transcribe']:
+        return decode_audio(**stream), None
+    if stages == ['ocr']:
+        return None, decode_frames(**stream, media_info=media_info)
+    media = decode_media(**stream, media_info=media_info)
+    return media.audio, media.frames
+
+async def run_stage(store: ArtifactStore, video_id: str, stage: str, func, /, *args, **kwargs):
+    """Return the stored output of a completed stage, otherwise run it and store the result"""
+    if store.is_done(video_id, stage):
+        logger.info(f"Skipping {stage} for video {video_id}, already done")
+        return store.get(video_id, stage)
+
+    stage_start = time.time()
+    try:
+        result = await run_blocking(func, *args, **kwargs)
+    except Exception as e:
+        store.mark_failed(video_id, stage, e)
+        raise PipelineStageError(stage, e) from e
+    store.put(video_id, stage, result)
+    logger.info(f"Stage {stage} for video {video_id} took {time.time() - stage_start:.2f} seconds")
+    return result
+
+async def process_video_async(url: str, from_stage: str = None):
+    """
+    Async-native pipeline for one video. Network stages are awaited; blocking work
+    (extraction, ChatGPT, Maps, S3 and DB writes) runs in the runtime's bounded executor.
+
+    Every stage output is checkpointed in the artifact store, so a retry resumes at the
+    first incomplete stage. from_stage forces that stage and all later ones to rerun.
+    """
     start_time = time.time()
+    store = get_artifact_store()
+    cache = get_media_cache()
+    pin = None
     try:
-        # 1. Download video and get metadata
-        logger.info("Starting video download...")
-        video_id, video_file, audio_file, description, creator_info = asyncio.run(VideoDownloader().process(url))
-        logger.info(f"Download completed. Video ID: {video_id}")
-        
-        # 2. Extract audio and text in parallel using ThreadPoolExecutor
-        logger.info("Starting parallel audio and text extraction...")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            # Submit both tasks
-            audio_future = executor.submit(
-                AudioExtractor().transcribe_audio, 
-                audio_file
-            )
-            text_future = executor.submit(
-                TextExtractor().extract_text,
-                video_file,
-                video_id
-            )
-            
-            # Wait for both tasks to complete
-            completed_tasks = concurrent.futures.wait(
-                [audio_future, text_future],
-                return_when=concurrent.futures.ALL_COMPLETED
-            )
+        video_id = parse_video_id(url)
+        if video_id:
+            # Keep this video's media out of eviction until the run ends
+            pin = cache.pin_video(video_id)
+            if from_stage:
+                store.invalidate(video_id, from_stage)
+            completed = [stage for stage, status in store.status(video_id).items() if status == 'done']
+            if completed:
+                logger.info(f"Video {video_id} has completed stages {completed}, "
+                            f"resuming at stage: {store.first_incomplete(video_id)}")
 
-            # Get audio data
+        # 1. Download video and get metadata. Media is only needed again if an
+        # extraction stage still has to run.
+        download = store.get(video_id, 'download') if video_id else None
+        needs_media = not video_id or not (store.is_done(video_id, 'transcribe') and store.is_done(video_id, 'ocr'))
+        if download is None or (needs_media and not media_present(download)):
+            logger.info("Starting video download...")
             try:
-                audio_data = audio_future.result()
-                logger.info(f"Audio extraction completed. Length: {len(audio_data)}")
-                logger.debug(f"Audio data: {audio_data[:100]}...")  # First 100 chars
+                result = await get_download_manager().download(url)
             except Exception as e:
-                logger.error(f"Audio extraction failed: {str(e)}", exc_info=True)
-                audio_data = ""
-            
-            # Get text data
+                raise PipelineStageError('download', e) from e
+            video_id = result.video_id
+            pin = pin or cache.pin_video(video_id)
+            download = result.artifact()
+            if from_stage and from_stage != 'download' and not parse_video_id(url):
+                store.invalidate(video_id, from_stage)
+            store.put(video_id, 'download', download)
+            logger.info(f"Download completed. Video ID: {video_id}")
+
+        # 2. A near-duplicate of a stored video reuses its restaurants instead of being analysed again
+        dedup = await run_stage(store, video_id, 'dedup', check_duplicate, video_id, download)
+        if dedup['duplicate_of']:
+            await run_stage(
+                store, video_id, 'store',
+                link_duplicate_video,
+                video_id=video_id,
+                platform='tiktok',
+                video_url=url,
+                creator_info=download['creator_info'],
+                original_video_id=dedup['duplicate_of']
+            )
+            await run_blocking(record_fingerprint, video_id, dedup)
+            logger.info(f"Stored video {video_id} as a duplicate of {dedup['duplicate_of']} "
+                        f"in {time.time() - start_time:.2f} seconds")
+            return
+        
+        # 3. Extract audio and text concurrently in separate worker processes
+        media_info = MediaInfo.from_dict(download.get('probe'))
+        for stage, reason in skip_reasons(media_info, get_download_manager().download_config.audio_only).items():
+            if not store.is_done(video_id, stage):
+                logger.info(f"Skipping {stage} for video {video_id}: {reason}")
+                store.put(video_id, stage, "")
+        pending = [stage for stage in ('transcribe', 'ocr') if not store.is_done(video_id, stage)]
+        if pending:
+            logger.info(f"Starting parallel extraction for stages: {pending}")
+            executor_stages = tuple(EXTRACTION_STAGES[stage] for stage in pending)
             try:
-                text_data = text_future.result()
-                logger.info(f"Text extraction completed. Length: {len(text_data)}")
-                logger.debug(f"Extracted text: {text_data[:100]}...")  # First 100 chars
+                # Older records carry a WAV; otherwise audio is decoded from the video file
+                audio_input, video_input = download['audio_file'] or download['video_file'], download['video_file']
+                if download.get('stream'):
+                    audio_input, video_input = await run_blocking(decode_stream, download['stream'], pending, media_info)
+                audio_data, text_data, stage_timings = await run_blocking(
+                    get_stage_executor().run_extraction,
+                    audio_input,
+                    video_input,
+                    video_id,
+                    executor_stages,
+                    media_info
+                )
             except Exception as e:
-                logger.error(f"Text extraction failed: {str(e)}", exc_info=True)
-                text_data = ""
+                raise PipelineStageError(pending[0], e) from e
+            for stage, data in (('transcribe', audio_data), ('ocr', text_data)):
+                if stage not in pending:
+                    continue
+                if EXTRACTION_STAGES[stage] in stage_timings:
+                    store.put(video_id, stage, data)
+                else:
+                    # The run carries on without this stage's text. The LLM and store stages
+                    # record that it was missing and rerun once a retry produces it.
+                    store.mark_failed(video_id, stage, "extraction failed")
+        audio_data = store.get(video_id, 'transcribe', "")
+        text_data = store.get(video_id, 'ocr', "")
         
-        # 3. Extract location from text
-        logger.info("Starting ChatGPT query...")
-        recommendations = query_chatgpt(description, text_data, audio_data)
+        # 4. Extract location from text
+        recommendations = await run_stage(
+            store, video_id, 'llm', query_chatgpt, download['description'], text_data, audio_data
+        )
         logger.info(f"ChatGPT query completed: {recommendations}")
         
-        # 4. Get coordinates and place details
-        places_data = search_location(recommendations)
+        # 5. Get coordinates and place details
+        places_data = await run_stage(store, video_id, 'geocode', search_location, recommendations)
         logger.info(f"Location search completed: {places_data}")
         
-        # 5. Store all data
-        store_video_data(
+        # 6. Store all data
+        await run_stage(
+            store, video_id, 'store',
+            store_video_data,
             video_id=video_id,
             url=url,
-            creator_info=creator_info,
-            description=description,
+            creator_info=download['creator_info'],
+            description=download['description'],
             text_data=text_data,
             audio_data=audio_data,
             recommendations=recommendations,
             places_data=places_data
         )
+        # Only stored videos are indexed, so a duplicate never points at unfinished results
+        await run_blocking(record_fingerprint, video_id, dedup)
 
-        # 6. Cleanup files
-        logger.info(f"Cleaning up temporary files for video {video_id}")
-        
-        # Define file paths
-        video_file = f"/home/ec2-user/maps-server/files/video/{video_id}.mp4"
-        audio_file = f"/home/ec2-user/maps-server/files/audio/{video_id}.wav"
-        
-        # Remove video file
-        if os.path.exists(video_file):
-            os.remove(video_file)
-            logger.info(f"Removed video file: {video_file}")
-            
-        # Remove audio file
-        if os.path.exists(audio_file):
-            os.remove(audio_file)
-            logger.info(f"Removed audio file: {audio_file}")
+        # 7. No cleanup: media stays in the media cache, which evicts by LRU within its disk budget
 
         # Calculate and log total execution time
         end_time = time.time()
@@ -102,6 +210,16 @@ def process_video(url: str):
         logger.info(f"Total task execution time: {execution_time:.2f} seconds")
 
     except Exception as e:
-        logger.error(f"Major error in process_video: {str(e)}", exc_info=True)
+        logger.error(f"Major error in process_video_async: {str(e)}", exc_info=True)
         logger.error(f"Error type: {type(e)}")
         raise
+    finally:
+        if pin:
+            cache.unpin(pin)
+
+@shared_task
+def process_video(url: str, from_stage: str = None):
+    # Runs on the worker's long-lived loop instead of a fresh asyncio.run() per task.
+    # Start the worker with -P threads so several videos share that loop; prefork
+    # children run one video each.
+    return get_runtime().run(process_video_async(url, from_stage))
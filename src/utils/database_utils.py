@@ -3,7 +3,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from typing import Dict, Optional
 from datetime import datetime
 from src.models.models import Restaurant, Video
-from src.database import get_db
+from src.database import SessionLocal
 
 def extract_city_from_address(address: str) -> str:
     """Extract city from address string."""
@@ -36,7 +36,8 @@ def update_database(
         creator_info: Dictionary containing creator information
         places_data: Dictionary containing restaurant information from Google Maps
     """
-    db = next(get_db())
+    # Writes always go to the primary
+    db = SessionLocal()
     
     try:
         # First, create restaurant entries
@@ -118,4 +119,54 @@ def update_database(
         print(f"Error updating database: {str(e)}")
         raise
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
+
+def link_duplicate_video(
+    video_id: str,
+    platform: str,
+    video_url: str,
+    creator_info: Dict[str, str],
+    original_video_id: str
+) -> int:
+    """
+    Store a near-duplicate video by linking it to the restaurants of the video it copies,
+    instead of analysing it again. Returns the number of restaurants linked.
+    """
+    db = SessionLocal()
+
+    try:
+        restaurant_ids = [
+            restaurant_id for (restaurant_id,) in db.query(Video.restaurant_id).filter(
+                Video.video_id == original_video_id,
+                Video.platform == platform,
+                Video.restaurant_id.isnot(None)
+            ).distinct()
+        ]
+        linked = {
+            restaurant_id for (restaurant_id,) in db.query(Video.restaurant_id).filter(
+                Video.video_id == video_id,
+                Video.platform == platform
+            )
+        }
+        for restaurant_id in restaurant_ids:
+            if restaurant_id not in linked:
+                db.add(Video(
+                    platform=platform,
+                    video_id=video_id,
+                    video_url=video_url,
+                    creator_name=creator_info.get('creator_name'),
+                    creator_id=creator_info.get('creator_id'),
+                    view_count=creator_info.get('view_count'),
+                    restaurant_id=restaurant_id
+                ))
+
+        db.commit()
+        print(f"Linked duplicate video {video_id} to {len(restaurant_ids)} restaurants of {original_video_id}")
+        return len(restaurant_ids)
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Error linking duplicate video: {str(e)}")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,135 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+from decouple import config
+from sqlalchemy import Integer, cast, delete, func, or_, select
+from sqlalchemy.orm import Session
+from src.database import session_scope
+from src.models.models import VideoFailure
+from src.services.video_processing.artifact_store import STATUS_FAILED, get_artifact_store
+from src.services.video_processing.errors import PipelineStageError, StageFailedError
+from src.utils.resource_monitor import cpu_seconds
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# A video that failed this many times is quarantined until released by hand
+QUARANTINE_ATTEMPTS = config('FAILURE_QUARANTINE_ATTEMPTS', default=3, cast=int)
+# Wait before the first retry; doubles with every further failure
+FAILURE_BACKOFF_SECONDS = config('FAILURE_BACKOFF_SECONDS', default=3600, cast=int)
+
+def record_failure(db: Session, video_id: str, error: BaseException, elapsed_seconds: float = 0,
+                   cpu_used: float = 0, video_url: str = None, platform: str = 'tiktok') -> VideoFailure:
+    """Add a failed attempt to the ledger, scheduling the next retry or quarantining the video"""
+    if isinstance(error, PipelineStageError):
+        stage, error_class, message = error.stage, error.error_class, str(error.cause)
+    else:
+        stage, error_class, message = 'unknown', type(error).__name__, str(error)
+
+    now = datetime.utcnow()
+    failure = db.get(VideoFailure, video_id)
+    if failure is None:
+        failure = VideoFailure(video_id=video_id, platform=platform, attempts=0,
+                               wasted_seconds=0, wasted_cpu_seconds=0, first_failed_at=now)
+        db.add(failure)
+
+    failure.video_url = video_url or failure.video_url
+    failure.stage = stage
+    failure.error_class = error_class
+    failure.error_message = message[:2000]
+    failure.attempts += 1
+    failure.wasted_seconds += elapsed_seconds
+    failure.wasted_cpu_seconds += cpu_used
+    failure.last_failed_at = now
+    failure.next_retry_at = now + timedelta(seconds=FAILURE_BACKOFF_SECONDS * 2 ** (failure.attempts - 1))
+    failure.quarantined = failure.attempts >= QUARANTINE_ATTEMPTS
+    db.flush()
+
+    if failure.quarantined:
+        logger.warning(f"Quarantined video {video_id} after {failure.attempts} failures "
+                       f"(last: {stage} {error_class})")
+    else:
+        logger.info(f"Video {video_id} failed in {stage} ({error_class}), "
+                    f"attempt {failure.attempts}, retry after {failure.next_retry_at}")
+    return failure
+
+def record_success(db: Session, video_id: str) -> None:
+    """Forget earlier failures once a video has gone through"""
+    db.execute(delete(VideoFailure).where(VideoFailure.video_id == video_id))
+
+def _blocked(now: datetime):
+    return or_(VideoFailure.quarantined.is_(True), VideoFailure.next_retry_at > now)
+
+def is_blocked(db: Session, video_id: str) -> bool:
+    """True if the video is quarantined or still backing off after a failure"""
+    return db.execute(
+        select(VideoFailure.video_id).where(VideoFailure.video_id == video_id, _blocked(datetime.utcnow()))
+    ).first() is not None
+
+def blocked_video_ids(db: Session, video_ids: Iterable[str]) -> Set[str]:
+    """The subset of video_ids that should not be scheduled right now"""
+    video_ids = list(video_ids)
+    if not video_ids:
+        return set()
+    return set(db.execute(
+        select(VideoFailure.video_id).where(VideoFailure.video_id.in_(video_ids), _blocked(datetime.utcnow()))
+    ).scalars())
+
+def release(db: Session, video_id: str) -> bool:
+    """Take a video out of quarantine so it is retried on the next run"""
+    return db.execute(delete(VideoFailure).where(VideoFailure.video_id == video_id)).rowcount == 1
+
+def failed_stage(video_id: str) -> Optional[PipelineStageError]:
+    """
+    The first stage the artifact store has marked failed for a video. Extraction stages
+    fail without stopping the run, which carries on with empty text.
+    """
+    stages = get_artifact_store().manifest(video_id)['stages']
+    for stage, entry in stages.items():
+        if entry.get('status') == STATUS_FAILED:
+            return PipelineStageError(stage, StageFailedError(entry.get('error') or "failed"))
+    return None
+
+@contextmanager
+def failure_tracking(video_id: str, video_url: str = None):
+    """
+    Record the block's outcome in the ledger: a failure (with the wall and CPU time it
+    wasted) if it raises or leaves a stage failed, otherwise clear earlier failures.
+    A stage left failed is raised as PipelineStageError, like any other failure, so the
+    caller does not mark the video processed and it is retried after the backoff.
+    """
+    start_time = time.time()
+    start_cpu = cpu_seconds()
+    try:
+        yield
+        error = failed_stage(video_id)
+        if error is not None:
+            raise error
+    except Exception as e:
+        try:
+            with session_scope() as db:
+                record_failure(db, video_id, e, time.time() - start_time, cpu_seconds() - start_cpu, video_url)
+        except Exception as ledger_error:
+            logger.error(f"Could not record failure for video {video_id}: {str(ledger_error)}")
+        raise
+    else:
+        with session_scope() as db:
+            record_success(db, video_id)
+
+def failure_summary(db: Session) -> List[Dict]:
+    """Failed videos and wasted compute grouped by stage and error class, costliest first"""
+    rows = db.execute(
+        select(
+            VideoFailure.stage,
+            VideoFailure.error_class,
+            func.count().label('videos'),
+            func.sum(VideoFailure.attempts).label('attempts'),
+            func.sum(VideoFailure.wasted_seconds).label('wasted_seconds'),
+            func.sum(VideoFailure.wasted_cpu_seconds).label('wasted_cpu_seconds'),
+            func.sum(cast(VideoFailure.quarantined, Integer)).label('quarantined'),
+        )
+        .group_by(VideoFailure.stage, VideoFailure.error_class)
+        .order_by(func.sum(VideoFailure.wasted_cpu_seconds).desc())
+    ).all()
+    return [dict(row._mapping) for row in rows]
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from decouple import config
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from src.database import session_scope
+from src.models.models import VideoFingerprint
+from src.services.video_processing.artifact_store import media_present
+from src.services.video_processing.fingerprint import FRAME_DISTANCE, BKTree, Fingerprint, compute_fingerprint
+from src.services.video_processing.media_probe import MediaInfo
+from src.utils.tagging import insert_ignore
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# A fingerprint can commit after a refresh yet carry an earlier created_at (a long
+# transaction, or another node's clock running behind), so every refresh re-reads
+# this far back. Keep it above the worst clock skew plus the longest write transaction.
+REFRESH_OVERLAP_SECONDS = config('DEDUP_REFRESH_OVERLAP_SECONDS', default=600, cast=int)
+
+def _from_row(row: VideoFingerprint) -> Fingerprint:
+    return Fingerprint.from_dict({
+        'frames': row.frame_hashes.split(',') if row.frame_hashes else [],
+        'audio': row.audio_hash,
+        'duration': row.duration,
+    })
+
+class FingerprintIndex:
+    """
+    BK-tree over the keyframe hashes of every fingerprinted video, loaded from the
+    video_fingerprints table and topped up incrementally, so a lookup costs a tree
+    query instead of a comparison with every stored video.
+
+    Each keyframe hash is indexed on its own: if the mean distance over aligned
+    keyframes is within FRAME_DISTANCE, at least one keyframe pair is too, so querying
+    every keyframe at that radius finds every near-duplicate candidate.
+    """
+
+    def __init__(self):
+        self.tree = BKTree()
+        # video_id -> (fingerprint, original it duplicates)
+        self.fingerprints: Dict[str, Tuple[Fingerprint, Optional[str]]] = {}
+        self.loaded_until: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def _add(self, video_id: str, fingerprint: Fingerprint, duplicate_of: Optional[str]):
+        if video_id in self.fingerprints:
+            return
+        self.fingerprints[video_id] = (fingerprint, duplicate_of)
+        for frame_hash in fingerprint.frames:
+            self.tree.add(frame_hash, video_id)
+
+    def refresh(self, db: Session) -> int:
+        """Load fingerprints stored (by any process) since the last refresh"""
+        query = select(VideoFingerprint)
+        if self.loaded_until is not None:
+            # Overlaps the last refresh (see REFRESH_OVERLAP_SECONDS); known ids are skipped
+            query = query.where(
+                VideoFingerprint.created_at >= self.loaded_until - timedelta(seconds=REFRESH_OVERLAP_SECONDS)
+            )
+        rows = db.execute(query).scalars().all()
+        with self._lock:
+            before = len(self.fingerprints)
+            for row in rows:
+                self._add(row.video_id, _from_row(row), row.duplicate_of)
+                if row.created_at and (self.loaded_until is None or row.created_at > self.loaded_until):
+                    self.loaded_until = row.created_at
+            return len(self.fingerprints) - before
+
+    def nearest(self, fingerprint: Fingerprint, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Closest near-duplicate in the index as (video_id, mean keyframe distance)"""
+        with self._lock:
+            candidates = {
+                video_id
+                for frame_hash in fingerprint.frames
+                for _, video_id in self.tree.search(frame_hash, FRAME_DISTANCE)
+                if video_id != exclude
+            }
+            best = None
+            for video_id in candidates:
+                distance = fingerprint.distance(self.fingerprints[video_id][0])
+                if distance is not None and distance <= FRAME_DISTANCE and (best is None or distance < best[1]):
+                    best = (video_id, distance)
+            return best
+
+    def find_duplicate(self, db: Session, video_id: str, fingerprint: Fingerprint) -> Optional[str]:
+        """Video whose stored results a near-duplicate of fingerprint should reuse, if any"""
+        self.refresh(db)
+        match = self.nearest(fingerprint, exclude=video_id)
+        if match is None:
+            return None
+        # Point at the first upload, not at another copy of it
+        original = self.fingerprints[match[0]][1] or match[0]
+        logger.info(f"Video {video_id} is a near-duplicate of {match[0]} "
+                    f"(mean keyframe distance {match[1]:.1f}), reusing results of {original}")
+        return original
+
+    def record(self, db: Session, video_id: str, fingerprint: Fingerprint, duplicate_of: Optional[str] = None,
+               platform: str = 'tiktok'):
+        """Persist a stored video's fingerprint so later copies of it are recognized"""
+        data = fingerprint.to_dict()
+        db.execute(insert_ignore(VideoFingerprint).values(
+            video_id=video_id,
+            platform=platform,
+            frame_hashes=','.join(data['frames']),
+            audio_hash=data['audio'],
+            duration=data['duration'],
+            duplicate_of=duplicate_of,
+            created_at=datetime.utcnow(),
+        ))
+        with self._lock:
+            self._add(video_id, fingerprint, duplicate_of)
+
+_index: Optional[FingerprintIndex] = None
+_index_lock = threading.Lock()
+
+def get_fingerprint_index() -> FingerprintIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex()
+        return _index
+
+def check_duplicate(video_id: str, download: Dict) -> Dict:
+    """
+    The dedup stage: fingerprint the downloaded media and look it up in the index.
+    Fingerprinting problems never fail the video; it is then analysed as usual.
+    """
+    if not download.get('stream') and not media_present(download):
+        return {'fingerprint': None, 'duplicate_of': None}
+    media_info = MediaInfo.from_dict(download.get('probe'))
+    try:
+        if download.get('stream'):
+            fingerprint = compute_fingerprint(**download['stream'], media_info=media_info)
+        else:
+            fingerprint = compute_fingerprint(download['video_file'], media_info=media_info)
+    except Exception as e:
+        logger.warning(f"Could not fingerprint video {video_id}: {str(e)}")
+        return {'fingerprint': None, 'duplicate_of': None}
+
+    with session_scope() as db:
+        duplicate_of = get_fingerprint_index().find_duplicate(db, video_id, fingerprint)
+    return {'fingerprint': fingerprint.to_dict(), 'duplicate_of': duplicate_of}
+
+def record_fingerprint(video_id: str, dedup: Dict):
+    """Add a video to the index once its results are stored, so copies can reuse them"""
+    if not dedup or not dedup.get('fingerprint'):
+        return
+    with session_scope() as db:
+        get_fingerprint_index().record(db, video_id, Fingerprint.from_dict(dedup['fingerprint']), dedup['duplicate_of'])
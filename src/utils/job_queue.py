@@ -0,0 +1,283 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+from decouple import config
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+from src.database import session_scope
+from src.models.models import Job
+from src.utils.tagging import insert_ignore
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+VISIBILITY_TIMEOUT = config('JOB_VISIBILITY_TIMEOUT', default=1800, cast=int)
+RETRY_BACKOFF_SECONDS = config('JOB_RETRY_BACKOFF_SECONDS', default=300, cast=int)
+MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# Lost races on backends without SKIP LOCKED (SQLite) before giving up on a lease call
+_LEASE_RETRIES = 5
+
+class JobDeferred(Exception):
+    """
+    Raised by a handler when its job cannot run yet (the video is leased elsewhere or
+    backing off). The job is requeued for available_at without using up an attempt.
+    """
+
+    def __init__(self, available_at: datetime, reason: str):
+        super().__init__(reason)
+        self.available_at = available_at
+
+@dataclass
+class LeasedJob:
+    id: int
+    platform: str
+    video_id: str
+    video_url: str
+    attempts: int
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _leasable(now: datetime):
+    """Queued jobs that are due, plus running jobs whose worker stopped heartbeating"""
+    return and_(
+        Job.available_at <= now,
+        Job.attempts < Job.max_attempts,
+        or_(
+            Job.status == STATUS_QUEUED,
+            and_(Job.status == STATUS_RUNNING, Job.lease_expires_at < now)
+        )
+    )
+
+def enqueue(db: Session, videos: Iterable[Dict], max_attempts: int = None) -> int:
+    """
+    Add videos to the queue; videos already queued (or done) are skipped. Commits.
+
+    Args:
+        db: Session on the primary
+        videos: Dicts with video_id, url and optionally priority and platform
+
+    Returns:
+        int: Number of new jobs
+    """
+    rows = [
+        {
+            'platform': video.get('platform', 'tiktok'),
+            'video_id': str(video['video_id']),
+            'video_url': video['url'],
+            'priority': video.get('priority', 0),
+            'status': STATUS_QUEUED,
+            'attempts': 0,
+            'max_attempts': max_attempts or MAX_ATTEMPTS,
+            'available_at': datetime.utcnow(),
+        }
+        for video in videos
+    ]
+    if not rows:
+        return 0
+    count = db.execute(insert_ignore(Job.__table__), rows).rowcount
+    db.commit()
+    logger.info(f"Enqueued {count} of {len(rows)} videos")
+    return count
+
+def lease(db: Session, worker_id: str = None, visibility_timeout: int = None) -> Optional[LeasedJob]:
+    """
+    Lease the highest-priority available job. Commits.
+
+    The candidate row is locked with SELECT ... FOR UPDATE SKIP LOCKED so concurrent
+    workers on MariaDB pass over each other's rows instead of queueing on them; the
+    claiming UPDATE re-checks the row so backends without SKIP LOCKED stay correct.
+    The lease expires after visibility_timeout unless renewed with heartbeat().
+    """
+    worker_id = worker_id or worker_name()
+    visibility_timeout = visibility_timeout or VISIBILITY_TIMEOUT
+
+    for _ in range(_LEASE_RETRIES):
+        now = datetime.utcnow()
+        candidate = db.execute(
+            select(Job.id)
+            .where(_leasable(now))
+            .order_by(Job.priority.desc(), Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if candidate is None:
+            db.commit()
+            return None
+
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == candidate, _leasable(now))
+            .values(
+                status=STATUS_RUNNING,
+                leased_by=worker_id,
+                lease_expires_at=now + timedelta(seconds=visibility_timeout),
+                heartbeat_at=now,
+                attempts=Job.attempts + 1
+            )
+        ).rowcount == 1
+        db.commit()
+
+        if claimed:
+            row = db.execute(
+                select(Job.id, Job.platform, Job.video_id, Job.video_url, Job.attempts).where(Job.id == candidate)
+            ).one()
+            db.commit()
+            return LeasedJob(*row)
+    return None
+
+def heartbeat(db: Session, job_id: int, worker_id: str = None, visibility_timeout: int = None) -> bool:
+    """Extend a job's lease. Commits. False if the lease expired and another worker took it"""
+    now = datetime.utcnow()
+    renewed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.leased_by == (worker_id or worker_name()), Job.status == STATUS_RUNNING)
+        .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=visibility_timeout or VISIBILITY_TIMEOUT))
+    ).rowcount == 1
+    db.commit()
+    return renewed
+
+def complete(db: Session, job_id: int, worker_id: str = None) -> bool:
+    """Mark a leased job done. Commits"""
+    done = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.leased_by == (worker_id or worker_name()))
+        .values(status=STATUS_DONE, lease_expires_at=None, last_error=None)
+    ).rowcount == 1
+    db.commit()
+    return done
+
+def defer(db: Session, job_id: int, available_at: datetime, reason: str, worker_id: str = None) -> bool:
+    """Requeue a leased job for available_at; the attempt does not count. Commits"""
+    deferred = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.leased_by == (worker_id or worker_name()))
+        .values(
+            status=STATUS_QUEUED,
+            available_at=available_at,
+            lease_expires_at=None,
+            attempts=Job.attempts - 1,  # Leasing counted it
+            last_error=reason[:2000]
+        )
+    ).rowcount == 1
+    db.commit()
+    logger.info(f"Job {job_id} deferred until {available_at}: {reason}")
+    return deferred
+
+def fail(db: Session, job_id: int, error: str, worker_id: str = None, backoff_seconds: int = None) -> str:
+    """
+    Record a failed attempt. Commits.
+
+    The job is requeued with exponential backoff until it reaches max_attempts,
+    after which it is marked failed.
+
+    Returns:
+        str: The job's new status
+    """
+    job = db.get(Job, job_id)
+    if job is None or job.leased_by != (worker_id or worker_name()):
+        db.rollback()
+        return None
+
+    backoff = (backoff_seconds or RETRY_BACKOFF_SECONDS) * 2 ** max(job.attempts - 1, 0)
+    job.status = STATUS_FAILED if job.attempts >= job.max_attempts else STATUS_QUEUED
+    job.available_at = datetime.utcnow() + timedelta(seconds=backoff)
+    job.lease_expires_at = None
+    job.last_error = str(error)[:2000]
+    status = job.status
+    db.commit()
+    logger.warning(f"Job {job_id} attempt failed ({status}): {error}")
+    return status
+
+def fail_expired(db: Session) -> int:
+    """Mark failed any job whose worker died on its last allowed attempt. Commits"""
+    count = db.execute(
+        update(Job)
+        .where(
+            Job.status == STATUS_RUNNING,
+            Job.lease_expires_at < datetime.utcnow(),
+            Job.attempts >= Job.max_attempts
+        )
+        .values(status=STATUS_FAILED, last_error='Lease expired on final attempt')
+    ).rowcount
+    db.commit()
+    return count
+
+def queue_stats(db: Session) -> Dict[str, int]:
+    rows = db.execute(select(Job.status, func.count()).group_by(Job.status)).all()
+    return {status: count for status, count in rows}
+
+def run_worker(handler: Callable[[LeasedJob], None], worker_id: str = None, visibility_timeout: int = None,
+               drain: bool = False, poll_interval: float = 5, max_jobs: int = None) -> int:
+    """
+    Lease and run jobs until the queue is empty (drain) or forever.
+
+    The lease is renewed in the background every visibility_timeout / 3 seconds while
+    handler runs; an exception from handler records a failed attempt, except JobDeferred,
+    which requeues the job without counting one.
+
+    Returns:
+        int: Number of jobs completed
+    """
+    worker_id = worker_id or worker_name()
+    visibility_timeout = visibility_timeout or VISIBILITY_TIMEOUT
+    completed = 0
+
+    while max_jobs is None or completed < max_jobs:
+        with session_scope() as db:
+            job = lease(db, worker_id, visibility_timeout)
+            if job is None:
+                fail_expired(db)
+        if job is None:
+            if drain:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(visibility_timeout / 3):
+                try:
+                    with session_scope() as db:
+                        if not heartbeat(db, job.id, worker_id, visibility_timeout):
+                            logger.warning(f"Lost lease on job {job.id}")
+                            return
+                except Exception as e:
+                    logger.error(f"Error sending heartbeat for job {job.id}: {str(e)}")
+
+        thread = threading.Thread(target=beat, name=f"job-{job.id}-heartbeat", daemon=True)
+        thread.start()
+        try:
+            handler(job)
+        except JobDeferred as e:
+            stop.set()
+            thread.join()
+            with session_scope() as db:
+                defer(db, job.id, e.available_at, str(e), worker_id)
+            continue
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.video_url}) failed: {str(e)}", exc_info=True)
+            stop.set()
+            thread.join()
+            with session_scope() as db:
+                fail(db, job.id, f"{type(e).__name__}: {str(e)}", worker_id)
+            continue
+
+        stop.set()
+        thread.join()
+        with session_scope() as db:
+            complete(db, job.id, worker_id)
+        completed += 1
+
+    return completed
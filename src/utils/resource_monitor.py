@@ -0,0 +1,104 @@
+import datetime
+import logging
+import os
+import psutil
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_MB = 1024 * 1024
+BYTES_PER_GB = 1024 * 1024 * 1024
+
+class RssTracker:
+    """Tracks this process's resident memory (RSS) growth across processed videos"""
+
+    def __init__(self):
+        self.process = psutil.Process(os.getpid())
+        self.baseline_rss = self.process.memory_info().rss
+        self.last_rss = self.baseline_rss
+        self.last_delta = 0
+        self.videos_processed = 0
+
+    def record_video(self) -> None:
+        """Record that one more video has been processed"""
+        rss = self.process.memory_info().rss
+        self.last_delta = rss - self.last_rss
+        self.last_rss = rss
+        self.videos_processed += 1
+
+    def report(self) -> str:
+        growth = (self.last_rss - self.baseline_rss) / BYTES_PER_MB
+        per_video = growth / self.videos_processed if self.videos_processed else 0.0
+        return (f"Process RSS: {self.last_rss / BYTES_PER_MB:.1f}MB "
+                f"(+{growth:.1f}MB over {self.videos_processed} videos, {per_video:.2f}MB/video, "
+                f"last video {self.last_delta / BYTES_PER_MB:+.1f}MB)")
+
+def cpu_seconds(process: psutil.Process = None) -> float:
+    """CPU time used by a process and its children, including live stage worker processes"""
+    process = process or psutil.Process(os.getpid())
+    times = process.cpu_times()
+    total = times.user + times.system + times.children_user + times.children_system
+    for child in process.children(recursive=True):
+        try:
+            child_times = child.cpu_times()
+            total += child_times.user + child_times.system
+        except psutil.Error:
+            continue
+    return total
+
+class YieldTracker:
+    """Tracks restaurants discovered per CPU-hour spent by this crawl"""
+
+    def __init__(self):
+        self.process = psutil.Process(os.getpid())
+        self.baseline_cpu = cpu_seconds(self.process)
+        self.videos_processed = 0
+        self.restaurants_found = 0
+
+    def record(self, restaurants: int) -> None:
+        """Record one processed video and the number of restaurants it yielded"""
+        self.videos_processed += 1
+        self.restaurants_found += restaurants
+
+    def cpu_hours(self) -> float:
+        return (cpu_seconds(self.process) - self.baseline_cpu) / 3600
+
+    def restaurants_per_cpu_hour(self) -> float:
+        cpu_hours = self.cpu_hours()
+        return self.restaurants_found / cpu_hours if cpu_hours else 0.0
+
+    def report(self) -> str:
+        return (f"Yield: {self.restaurants_found} restaurants from {self.videos_processed} videos "
+                f"in {self.cpu_hours():.3f} CPU-hours ({self.restaurants_per_cpu_hour():.1f} restaurants/CPU-hour)")
+
+def log_system_resources(tracker: RssTracker = None, yield_tracker: YieldTracker = None):
+    """Log current system resource usage, plus per-video RSS growth and yield when trackers are given"""
+    try:
+        # CPU usage
+        cpu_percent = psutil.cpu_percent(interval=1)
+        
+        # Memory usage
+        memory = psutil.virtual_memory()
+        memory_used_gb = memory.used / BYTES_PER_GB
+        memory_total_gb = memory.total / BYTES_PER_GB
+        memory_percent = memory.percent
+        
+        # Disk usage
+        disk = psutil.disk_usage('/')
+        disk_used_gb = disk.used / BYTES_PER_GB
+        disk_total_gb = disk.total / BYTES_PER_GB
+
+        process_line = tracker.report() if tracker else ""
+        yield_line = yield_tracker.report() if yield_tracker else ""
+        
+        logger.info(f"""
+System Resources:
+----------------
+Time: {datetime.datetime.now()}
+CPU Usage: {cpu_percent}%
+Memory: {memory_used_gb:.2f}GB / {memory_total_gb:.2f}GB ({memory_percent}%)
+Disk: {disk_used_gb:.2f}GB / {disk_total_gb:.2f}GB ({disk.percent}%)
+{process_line}
+{yield_line}
+        """)
+    except Exception as e:
+        logger.error(f"Error logging system resources: {e}")
@@ -0,0 +1,285 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, delete, exists, func, select, update
+from src.models.models import Restaurant, Video, restaurant_tags
+from src.utils.tagging import insert_ignore
+import logging
+import math
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_METERS = 6371000
+
+# Two restaurants are candidates when they are this close and their names this similar
+MAX_DISTANCE_METERS = 150
+NAME_SIMILARITY_THRESHOLD = 0.85
+
+# Words that differ between Google and ChatGPT spellings without changing the place
+NAME_STOPWORDS = {'the', 'restaurant', 'restaurante', 'ristorante', 'restaurang'}
+
+# Number of duplicates merged per set of UPDATE/DELETE statements
+MERGE_BATCH_SIZE = 1000
+
+@dataclass
+class RestaurantPoint:
+    id: int
+    name: str
+    normalized_name: str
+    latitude: float
+    longitude: float
+    video_count: int = 0
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents, punctuation and generic words from a restaurant name"""
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(c for c in name if not unicodedata.combining(c)).lower()
+    name = name.replace('&', ' and ')
+    words = re.sub(r'[^a-z0-9]+', ' ', name).split()
+    return ' '.join(word for word in words if word not in NAME_STOPWORDS)
+
+def parse_coordinates(coordinates: str) -> Optional[Tuple[float, float]]:
+    """Parse the 'lat,lng' string stored on restaurants"""
+    try:
+        latitude, longitude = (float(part) for part in coordinates.split(','))
+        return latitude, longitude
+    except (AttributeError, ValueError):
+        return None
+
+def distance_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Haversine distance between two coordinates in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+METERS_PER_DEGREE = math.radians(1) * EARTH_RADIUS_METERS
+
+def _row_height(cell_meters: float) -> float:
+    return cell_meters / METERS_PER_DEGREE
+
+def _column_width(row: int, cell_meters: float) -> float:
+    """
+    Longitude width in degrees of the cells in a latitude row. Sized at the poleward
+    edge of the row and its two neighbours, where a degree of longitude is shortest,
+    so two points within cell_meters in those rows are at most one cell apart.
+    """
+    height = _row_height(cell_meters)
+    edge = min(90.0, max(abs((row - 1) * height), abs((row + 2) * height)))
+    meters_per_degree = METERS_PER_DEGREE * math.cos(math.radians(edge))
+    if meters_per_degree * 360 <= cell_meters:
+        # At the poles a single cell covers the whole row
+        return 360.0
+    return cell_meters / meters_per_degree
+
+def grid_cell(latitude: float, longitude: float, cell_meters: float) -> Tuple[int, int]:
+    """
+    Grid cell (column, row) of a coordinate. Rows are cell_meters of latitude; columns
+    are degrees of longitude scaled per row by the cosine of its latitude, so cells stay
+    about cell_meters wide at every latitude and longitude.
+    """
+    row = int(math.floor(latitude / _row_height(cell_meters)))
+    return int(math.floor(longitude / _column_width(row, cell_meters))), row
+
+def neighbour_cells(cell: Tuple[int, int], cell_meters: float) -> List[Tuple[int, int]]:
+    """
+    The cell itself and every cell that can hold a point within cell_meters of a point in
+    it. Rows have different column widths, so the adjacent rows' columns are found from
+    the cell's longitude span rather than its column index.
+    """
+    column, row = cell
+    width = _column_width(row, cell_meters)
+    west, east = column * width, (column + 1) * width
+    cells = []
+    for neighbour_row in (row - 1, row, row + 1):
+        neighbour_width = _column_width(neighbour_row, cell_meters)
+        first = int(math.floor(west / neighbour_width)) - 1
+        last = int(math.floor(east / neighbour_width)) + 1
+        cells.extend((neighbour_column, neighbour_row) for neighbour_column in range(first, last + 1))
+    return cells
+
+def name_similarity(a: str, b: str) -> float:
+    """Similarity of two normalized names in [0, 1]"""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    # "Bar Leo" vs "Bar Leo Amsterdam": one name fully contains the other
+    shorter, longer = sorted((a, b), key=len)
+    if len(shorter) >= 4 and f" {shorter} " in f" {longer} ":
+        return max(NAME_SIMILARITY_THRESHOLD, SequenceMatcher(None, a, b).ratio())
+    return SequenceMatcher(None, a, b).ratio()
+
+def find_duplicate_groups(
+    points: Iterable[RestaurantPoint],
+    max_distance: float = MAX_DISTANCE_METERS,
+    min_similarity: float = NAME_SIMILARITY_THRESHOLD
+) -> List[List[RestaurantPoint]]:
+    """
+    Group restaurants that are near-duplicates of each other.
+
+    Restaurants are bucketed into a grid of max_distance-sized cells and only
+    compared with restaurants in neighbouring cells, so the cost grows with the
+    number of restaurants rather than its square. Matches are merged transitively.
+
+    Returns:
+        List[List[RestaurantPoint]]: Groups of two or more duplicates
+    """
+    grid: Dict[Tuple[int, int], List[RestaurantPoint]] = defaultdict(list)
+    points = list(points)
+    for point in points:
+        grid[grid_cell(point.latitude, point.longitude, max_distance)].append(point)
+
+    parent = {point.id: point.id for point in points}
+
+    def find(restaurant_id):
+        while parent[restaurant_id] != restaurant_id:
+            parent[restaurant_id] = parent[parent[restaurant_id]]
+            restaurant_id = parent[restaurant_id]
+        return restaurant_id
+
+    comparisons = 0
+    for cell, cell_points in grid.items():
+        candidates = [p for neighbour in neighbour_cells(cell, max_distance) for p in grid.get(neighbour, ())]
+        for point in cell_points:
+            for other in candidates:
+                # Compare each pair once
+                if other.id <= point.id:
+                    continue
+                comparisons += 1
+                if distance_meters(point.latitude, point.longitude, other.latitude, other.longitude) > max_distance:
+                    continue
+                if name_similarity(point.normalized_name, other.normalized_name) < min_similarity:
+                    continue
+                parent[find(other.id)] = find(point.id)
+
+    groups: Dict[int, List[RestaurantPoint]] = defaultdict(list)
+    for point in points:
+        groups[find(point.id)].append(point)
+
+    duplicate_groups = [group for group in groups.values() if len(group) > 1]
+    logger.info(f"Compared {comparisons} candidate pairs across {len(grid)} grid cells, "
+                f"found {len(duplicate_groups)} duplicate groups")
+    return duplicate_groups
+
+def choose_canonical(group: List[RestaurantPoint]) -> RestaurantPoint:
+    """Keep the restaurant with the most videos, then the oldest one"""
+    return min(group, key=lambda point: (-point.video_count, point.id))
+
+def build_merge_map(groups: List[List[RestaurantPoint]]) -> Dict[int, int]:
+    """Map every duplicate restaurant id to its canonical restaurant id"""
+    merge_map = {}
+    for group in groups:
+        canonical = choose_canonical(group)
+        for point in group:
+            if point.id != canonical.id:
+                merge_map[point.id] = canonical.id
+    return merge_map
+
+def load_restaurant_points(db) -> List[RestaurantPoint]:
+    """Load id, name, coordinates and video count for every restaurant in one query"""
+    rows = db.execute(
+        select(Restaurant.id, Restaurant.name, Restaurant.coordinates, func.count(Video.id))
+        .outerjoin(Video, Video.restaurant_id == Restaurant.id)
+        .group_by(Restaurant.id, Restaurant.name, Restaurant.coordinates)
+    )
+
+    points = []
+    skipped = 0
+    for restaurant_id, name, coordinates, video_count in rows:
+        parsed = parse_coordinates(coordinates)
+        if not parsed:
+            skipped += 1
+            continue
+        points.append(RestaurantPoint(
+            id=restaurant_id,
+            name=name,
+            normalized_name=normalize_name(name),
+            latitude=parsed[0],
+            longitude=parsed[1],
+            video_count=video_count
+        ))
+
+    logger.info(f"Loaded {len(points)} restaurants ({skipped} without usable coordinates)")
+    return points
+
+def merge_restaurants(db, merge_map: Dict[int, int]) -> Dict[str, int]:
+    """
+    Merge duplicate restaurants into their canonical restaurant.
+
+    Per batch of duplicates: repoint videos, copy tags with INSERT IGNORE ... SELECT,
+    drop video rows that became exact duplicates, then delete the duplicate restaurants
+    and their tag rows. The caller owns the transaction.
+
+    Args:
+        db: Session to run in
+        merge_map: Duplicate restaurant id -> canonical restaurant id
+
+    Returns:
+        Dict[str, int]: Affected row counts
+    """
+    stats = defaultdict(int)
+    items = list(merge_map.items())
+
+    for start in range(0, len(items), MERGE_BATCH_SIZE):
+        batch = dict(items[start:start + MERGE_BATCH_SIZE])
+        duplicate_ids = list(batch)
+        canonical_ids = sorted(set(batch.values()))
+
+        # Videos: point at the canonical restaurant
+        result = db.execute(
+            update(Video)
+            .where(Video.restaurant_id.in_(duplicate_ids))
+            .values(restaurant_id=case(batch, value=Video.restaurant_id))
+            .execution_options(synchronize_session=False)
+        )
+        stats['videos_repointed'] += result.rowcount
+
+        # Videos already linked to the canonical restaurant are now listed twice
+        seen = set()
+        redundant_video_ids = []
+        for video_row_id, video_id, platform, restaurant_id in db.execute(
+            select(Video.id, Video.video_id, Video.platform, Video.restaurant_id)
+            .where(Video.restaurant_id.in_(canonical_ids))
+            .order_by(Video.id)
+        ):
+            key = (video_id, platform, restaurant_id)
+            if key in seen:
+                redundant_video_ids.append(video_row_id)
+            seen.add(key)
+        if redundant_video_ids:
+            result = db.execute(delete(Video).where(Video.id.in_(redundant_video_ids)))
+            stats['duplicate_videos_deleted'] += result.rowcount
+
+        # Tags: copy onto the canonical restaurant, skipping pairs it already has
+        existing_pair = restaurant_tags.alias('existing_pair')
+        canonical_id = case(batch, value=restaurant_tags.c.restaurant_id)
+        tag_pairs = (
+            select(canonical_id, restaurant_tags.c.tag_id)
+            .where(restaurant_tags.c.restaurant_id.in_(duplicate_ids))
+            .where(~exists().where(
+                existing_pair.c.restaurant_id == canonical_id,
+                existing_pair.c.tag_id == restaurant_tags.c.tag_id
+            ))
+            .distinct()
+        )
+        result = db.execute(insert_ignore(restaurant_tags).from_select(['restaurant_id', 'tag_id'], tag_pairs))
+        stats['tags_copied'] += result.rowcount
+
+        result = db.execute(delete(restaurant_tags).where(restaurant_tags.c.restaurant_id.in_(duplicate_ids)))
+        stats['tag_rows_deleted'] += result.rowcount
+
+        result = db.execute(
+            delete(Restaurant)
+            .where(Restaurant.id.in_(duplicate_ids))
+            .execution_options(synchronize_session=False)
+        )
+        stats['restaurants_deleted'] += result.rowcount
+
+        logger.info(f"Merged {start + len(batch)}/{len(items)} duplicate restaurants")
+
+    return dict(stats)
@@ -0,0 +1,134 @@
+from typing import Dict, Iterable, Tuple, Union
+from decouple import config
+from sqlalchemy import event, insert, select, exists, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from src.models.models import Restaurant, Tag, restaurant_tags
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Process-wide tag name -> (id, cached at) cache. Ids only enter it once the session
+# that read or created them commits, so it never hands out an id another session
+# cannot see yet. Entries expire so ids deleted by consolidate_tags in another process
+# do not outlive it for long; in this process clear_tag_cache drops them straight away.
+TAG_CACHE_TTL_SECONDS = config('TAG_CACHE_TTL_SECONDS', default=600, cast=int)
+_tag_id_cache: Dict[str, Tuple[int, float]] = {}
+_tag_id_cache_lock = threading.Lock()
+
+# Session.info key for tag ids resolved in the session's open transaction
+_PENDING_TAG_IDS = 'pending_tag_ids'
+
+def insert_ignore(table):
+    """INSERT that skips duplicate rows on MariaDB/MySQL and SQLite"""
+    return insert(table).prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+
+def clear_tag_cache() -> None:
+    """Forget cached tag ids, e.g. after tags have been consolidated or deleted"""
+    with _tag_id_cache_lock:
+        _tag_id_cache.clear()
+
+@event.listens_for(Session, 'after_commit')
+def _publish_tag_ids(session):
+    pending = session.info.pop(_PENDING_TAG_IDS, None)
+    if pending:
+        now = time.monotonic()
+        with _tag_id_cache_lock:
+            _tag_id_cache.update((name, (tag_id, now)) for name, tag_id in pending.items())
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_tag_ids(session):
+    # Tags created in the rolled back transaction are gone with it
+    session.info.pop(_PENDING_TAG_IDS, None)
+
+def get_tag_ids(db: Session, tag_names: Iterable[str]) -> Dict[str, int]:
+    """
+    Resolve tag names to ids, creating missing tags.
+
+    Lookups and inserts run in the caller's transaction, so created tags roll back
+    with it. The ids are cached for the whole process once that transaction commits.
+
+    Args:
+        db: Session to look up and create tags in
+        tag_names: Tag names to resolve
+
+    Returns:
+        Dict[str, int]: Tag name -> tag id
+    """
+    names = {name.strip() for name in tag_names if name and name.strip()}
+    pending = db.info.setdefault(_PENDING_TAG_IDS, {})
+
+    expired_before = time.monotonic() - TAG_CACHE_TTL_SECONDS
+    with _tag_id_cache_lock:
+        cached = {name: _tag_id_cache.get(name) for name in names}
+    ids = {name: entry[0] for name, entry in cached.items() if entry and entry[1] >= expired_before}
+    ids.update({name: pending[name] for name in names if name not in ids and name in pending})
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        found = dict(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(missing))).all())
+        to_create = [name for name in missing if name not in found]
+
+        if to_create:
+            logger.info(f"Creating tags: {to_create}")
+            # INSERT IGNORE waits on a concurrent insert of the same name; the locking read
+            # then sees the committed row, which a plain snapshot read could miss
+            db.execute(insert_ignore(Tag.__table__), [{'name': name} for name in to_create])
+            found.update(db.execute(
+                select(Tag.name, Tag.id).where(Tag.name.in_(to_create)).with_for_update(read=True)
+            ).all())
+
+        pending.update(found)
+        ids.update(found)
+
+    return ids
+
+def assign(db: Session, tag_names: Iterable[str], restaurant_ids: Union[Iterable[int], Select]) -> int:
+    """
+    Attach tags to restaurants with a single INSERT IGNORE ... SELECT.
+
+    Pairs that already exist are skipped, so this is safe to call repeatedly.
+    The caller owns the transaction and is responsible for committing.
+
+    Args:
+        db: Session to run the insert in
+        tag_names: Tags to attach (created if missing)
+        restaurant_ids: Restaurant ids, or a SELECT producing them
+
+    Returns:
+        int: Number of new restaurant/tag associations
+    """
+    tag_names = list(tag_names)
+    if not isinstance(restaurant_ids, Select):
+        restaurant_ids = list(restaurant_ids)
+        if not restaurant_ids:
+            return 0
+
+    tag_ids = list(get_tag_ids(db, tag_names).values())
+    if not tag_ids:
+        return 0
+
+    # Older databases lack the unique key on restaurant_tags, so also guard explicitly
+    existing_pair = restaurant_tags.alias('existing_pair')
+    pairs = (
+        select(Restaurant.id, Tag.id)
+        .select_from(Restaurant)
+        .join(Tag, true())
+        .where(Restaurant.id.in_(restaurant_ids))
+        .where(Tag.id.in_(tag_ids))
+        .where(~exists().where(
+            existing_pair.c.restaurant_id == Restaurant.id,
+            existing_pair.c.tag_id == Tag.id
+        ))
+    )
+    try:
+        result = db.execute(insert_ignore(restaurant_tags).from_select(['restaurant_id', 'tag_id'], pairs))
+    except IntegrityError:
+        # A cached tag was deleted under us (e.g. by consolidate_tags in another process)
+        clear_tag_cache()
+        raise
+    logger.info(f"Assigned tags {sorted(tag_names)}: {result.rowcount} new associations")
+    return result.rowcount
@@ -0,0 +1,189 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+from decouple import config
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.orm import Session
+from src.database import session_scope
+from src.models.models import ProcessedVideo, VideoFailure, VideoLease
+from src.utils.failure_ledger import is_blocked
+from src.utils.tagging import insert_ignore
+import logging
+import os
+import re
+import requests
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = config('VIDEO_LEASE_SECONDS', default=1800, cast=int)
+
+_VIDEO_ID_PATTERN = re.compile(r'/video/(\d+)')
+_SHORT_LINK_PATTERN = re.compile(r'^https?://(vm|vt)\.tiktok\.com/|^https?://(www\.)?tiktok\.com/t/')
+
+@lru_cache(maxsize=4096)
+def _resolve_short_link(url: str) -> Optional[str]:
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=10)
+        return response.url
+    except requests.RequestException as e:
+        logger.warning(f"Could not resolve short link {url}: {str(e)}")
+        return None
+
+def canonical_video_id(url_or_id: str) -> Optional[str]:
+    """
+    TikTok video id for a video id, full video URL or short link (vm./vt.tiktok.com, tiktok.com/t/).
+
+    Short links are resolved by following their redirect, so two crawlers that found the
+    same video through different links end up with the same id.
+    """
+    value = str(url_or_id).strip()
+    if value.isdigit():
+        return value
+
+    match = _VIDEO_ID_PATTERN.search(value)
+    if match:
+        return match.group(1)
+
+    if _SHORT_LINK_PATTERN.match(value):
+        resolved = _resolve_short_link(value)
+        match = _VIDEO_ID_PATTERN.search(resolved or '')
+        if match:
+            return match.group(1)
+
+    logger.warning(f"Could not find a video id in {value}")
+    return None
+
+def lease_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def claim(db: Session, video_id: str, owner: str = None, ttl: int = None, platform: str = 'tiktok') -> bool:
+    """
+    Atomically claim a video for processing. Commits.
+
+    Succeeds when nobody holds a lease on the video or the existing lease has expired
+    (a crashed crawler), the video has not been processed yet and the failure ledger
+    does not have it quarantined or backing off. The processed check runs after the
+    lease is taken: a finishing crawler marks the video processed before releasing its
+    lease, so a claim that wins the row always sees that mark.
+
+    Returns:
+        bool: True if this owner now holds the lease
+    """
+    owner = owner or lease_owner()
+    now = datetime.utcnow()
+    leased_until = now + timedelta(seconds=ttl or LEASE_SECONDS)
+
+    acquired = db.execute(
+        insert_ignore(VideoLease).values(
+            video_id=video_id,
+            platform=platform,
+            owner=owner,
+            leased_until=leased_until,
+            claimed_at=now,
+            attempts=1
+        )
+    ).rowcount == 1
+
+    if not acquired:
+        # Take over an expired lease; only one claimant can match the old expiry
+        acquired = db.execute(
+            update(VideoLease)
+            .where(VideoLease.video_id == video_id, VideoLease.leased_until < now)
+            .values(owner=owner, leased_until=leased_until, claimed_at=now, attempts=VideoLease.attempts + 1)
+        ).rowcount == 1
+        if acquired:
+            logger.warning(f"Reclaimed stale lease on video {video_id}")
+    db.commit()
+
+    if not acquired:
+        return False
+
+    already_processed = db.execute(
+        select(exists().where(ProcessedVideo.video_id == video_id))
+    ).scalar()
+    if already_processed or is_blocked(db, video_id):
+        release(db, video_id, owner)
+        return False
+    return True
+
+def next_claim_at(db: Session, video_id: str) -> Optional[datetime]:
+    """
+    When a claim() refused because of the failure ledger or another crawler's lease can
+    next succeed: the end of the video's failure backoff or of the live lease, whichever
+    is later (now if neither still applies). None if the video is quarantined.
+    """
+    now = datetime.utcnow()
+    failure = db.get(VideoFailure, video_id)
+    if failure is not None and failure.quarantined:
+        return None
+    leased_until = db.execute(
+        select(VideoLease.leased_until).where(VideoLease.video_id == video_id)
+    ).scalar()
+    return max(filter(None, (now, failure and failure.next_retry_at, leased_until)))
+
+def renew(db: Session, video_id: str, owner: str = None, ttl: int = None) -> bool:
+    """Extend a held lease. Commits. False if the lease was lost to someone else"""
+    renewed = db.execute(
+        update(VideoLease)
+        .where(VideoLease.video_id == video_id, VideoLease.owner == (owner or lease_owner()))
+        .values(leased_until=datetime.utcnow() + timedelta(seconds=ttl or LEASE_SECONDS))
+    ).rowcount == 1
+    db.commit()
+    return renewed
+
+def release(db: Session, video_id: str, owner: str = None) -> None:
+    """Drop a held lease. Commits"""
+    db.execute(
+        delete(VideoLease).where(VideoLease.video_id == video_id, VideoLease.owner == (owner or lease_owner()))
+    )
+    db.commit()
+
+def reclaim_stale(db: Session) -> int:
+    """Delete expired leases left behind by crashed crawlers. Commits"""
+    count = db.execute(delete(VideoLease).where(VideoLease.leased_until < datetime.utcnow())).rowcount
+    db.commit()
+    if count:
+        logger.info(f"Reclaimed {count} stale video leases")
+    return count
+
+@contextmanager
+def video_lease(video_id: str, ttl: int = None):
+    """
+    Hold a lease on a video for the duration of the block, renewing it in the background.
+
+    Yields True if the lease was acquired, False if another crawler holds it, the video
+    is already processed or the failure ledger is holding it back. Mark the video
+    processed inside the block so the mark is committed before the lease is released.
+    """
+    ttl = ttl or LEASE_SECONDS
+    owner = lease_owner()
+    with session_scope() as db:
+        acquired = claim(db, video_id, owner, ttl)
+    if not acquired:
+        yield False
+        return
+
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(ttl / 3):
+            try:
+                with session_scope() as db:
+                    if not renew(db, video_id, owner, ttl):
+                        logger.warning(f"Lost lease on video {video_id}")
+                        return
+            except Exception as e:
+                logger.error(f"Error renewing lease on video {video_id}: {str(e)}")
+
+    thread = threading.Thread(target=heartbeat, name=f"lease-{video_id}", daemon=True)
+    thread.start()
+    try:
+        yield True
+    finally:
+        stop.set()
+        thread.join()
+        with session_scope() as db:
+            release(db, video_id, owner)
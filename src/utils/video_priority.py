@@ -0,0 +1,107 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Union
+from decouple import config
+import heapq
+import itertools
+import math
+
+# Words that suggest a video is about a place to eat or drink
+RESTAURANT_KEYWORDS = {
+    'restaurant', 'food', 'foodie', 'dining', 'dinner', 'lunch', 'brunch', 'breakfast',
+    'meal', 'michelin', 'chef', 'cuisine', 'menu', 'eating', 'eat', 'cafe', 'coffee',
+    'bar', 'bistro', 'pizza', 'sushi', 'ramen', 'tapas', 'bakery', 'wine', 'cocktail',
+    'restaurante', 'comida', 'cocina', 'foodguide', 'foodreview', 'whereto', 'hiddengem',
+}
+
+# Videos lose half their recency weight every RECENCY_HALF_LIFE_DAYS
+RECENCY_HALF_LIFE_DAYS = config('PRIORITY_RECENCY_HALF_LIFE_DAYS', default=180, cast=float)
+
+def restaurant_likelihood(description: Optional[str], hashtags: Iterable[str] = ()) -> float:
+    """Rough 0-1 estimate that a video features a restaurant, from its text"""
+    words = set((description or '').lower().replace('#', ' ').split())
+    words.update(tag.lower().lstrip('#') for tag in hashtags if tag)
+    hits = sum(1 for word in words if word in RESTAURANT_KEYWORDS)
+    return 1 - math.exp(-hits / 2)
+
+def _age_days(created_at: Union[datetime, int, float, None], now: datetime) -> Optional[float]:
+    if created_at is None:
+        return None
+    if isinstance(created_at, (int, float)):
+        created_at = datetime.fromtimestamp(created_at, tz=timezone.utc)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return max((now - created_at).total_seconds() / 86400, 0.0)
+
+def score_video(views: Optional[int] = None, likes: Optional[int] = None,
+                created_at: Union[datetime, int, float, None] = None, description: Optional[str] = None,
+                hashtags: Iterable[str] = (), now: datetime = None) -> float:
+    """
+    Priority of a candidate video; higher is processed first.
+
+    Reach is log-scaled views plus an engagement bonus from the like ratio, discounted
+    by age (exponential decay with RECENCY_HALF_LIFE_DAYS) and weighted by how likely
+    the video is to be about a restaurant. Missing counts or dates score neutrally.
+    """
+    now = now or datetime.now(timezone.utc)
+    views = views or 0
+    likes = likes or 0
+
+    reach = math.log10(views + 1)
+    engagement = min(likes / views, 0.5) * 4 if views else 0.0
+
+    age_days = _age_days(created_at, now)
+    recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS) if age_days is not None else 0.5
+
+    likelihood = restaurant_likelihood(description, hashtags)
+    return round((reach + engagement) * (0.5 + 0.5 * recency) * (0.25 + likelihood), 4)
+
+@dataclass(order=True)
+class _Entry:
+    sort_key: float
+    sequence: int
+    video_id: str = field(compare=False)
+    video: Dict = field(compare=False)
+
+class CandidateQueue:
+    """
+    Max-priority queue of candidate videos, deduplicated by video id.
+
+    Pushing a video again only raises its priority; stale heap entries are skipped on pop.
+    Ties are served in insertion order.
+    """
+
+    def __init__(self, videos: Iterable[Dict] = ()):
+        self._heap: List[_Entry] = []
+        self._best: Dict[str, float] = {}
+        self._counter = itertools.count()
+        for video in videos:
+            self.push(video)
+
+    def push(self, video: Dict, priority: float = None) -> None:
+        """Add a video dict (needs video_id; priority defaults to video['priority'])"""
+        priority = video.get('priority', 0) if priority is None else priority
+        video_id = str(video['video_id'])
+        if video_id in self._best and self._best[video_id] >= priority:
+            return
+        self._best[video_id] = priority
+        heapq.heappush(self._heap, _Entry(-priority, next(self._counter), video_id, {**video, 'priority': priority}))
+
+    def pop(self) -> Dict:
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if self._best.get(entry.video_id) == -entry.sort_key:
+                del self._best[entry.video_id]
+                return entry.video
+        raise IndexError("pop from an empty CandidateQueue")
+
+    def __len__(self) -> int:
+        return len(self._best)
+
+    def __bool__(self) -> bool:
+        return bool(self._best)
+
+    def drain(self):
+        """Yield videos from highest to lowest priority"""
+        while self:
+            yield self.pop()
@@ -0,0 +1,99 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.video_processing import artifact_store
+from src.services.video_processing.artifact_store import ArtifactStore
+
+def test_resume_and_invalidate():
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        store.put('123', 'download', {'url': 'https://www.tiktok.com/@a/video/123'})
+        assert store.first_incomplete('123') == 'dedup'
+        store.put('123', 'dedup', {'fingerprint': None, 'duplicate_of': None})
+        store.put('123', 'transcribe', "hello")
+        store.put('123', 'ocr', "menu")
+        assert store.first_incomplete('123') == 'llm'
+        assert store.get('123', 'transcribe') == "hello"
+
+        store.mark_failed('123', 'llm', "timeout")
+        assert store.first_incomplete('123') == 'llm'
+
+        store.put('123', 'llm', {'name': 'Cafe'})
+        store.invalidate('123', 'ocr')
+        assert store.first_incomplete('123') == 'ocr'
+        assert store.get('123', 'llm') is None
+        assert store.get('123', 'transcribe') == "hello"
+
+def test_content_addressed_and_versioned():
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        assert store.put('1', 'ocr', "same text") == store.put('2', 'ocr', "same text")
+
+        original = artifact_store.STAGE_VERSIONS['ocr']
+        artifact_store.STAGE_VERSIONS['ocr'] = original + 1
+        try:
+            assert not store.is_done('1', 'ocr')
+        finally:
+            artifact_store.STAGE_VERSIONS['ocr'] = original
+
+def test_upstream_change_reruns_downstream():
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        store.put('1', 'download', {'video_file': 'a.mp4', 'stream': {'source': 'signed-url-1'}})
+        store.put('1', 'transcribe', "hello")
+        store.put('1', 'ocr', "menu")
+        store.put('1', 'llm', {'name': 'Cafe'})
+        store.put('1', 'geocode', {'Cafe': {}})
+        assert store.is_done('1', 'geocode')
+
+        original = artifact_store.STAGE_VERSIONS['transcribe']
+        artifact_store.STAGE_VERSIONS['transcribe'] = original + 1
+        try:
+            # Everything reading the transcript is stale, OCR is not
+            assert store.first_incomplete('1') == 'dedup'
+            assert store.is_done('1', 'ocr')
+            assert not store.is_done('1', 'llm') and not store.is_done('1', 'geocode')
+
+            # Recomputed with the same transcript: the downstream outputs still hold
+            store.put('1', 'transcribe', "hello")
+            assert store.is_done('1', 'geocode')
+
+            # A different transcript marks them stale until they run again
+            store.put('1', 'transcribe', "hello again")
+            assert store.status('1')['llm'] == 'stale'
+            assert not store.is_done('1', 'geocode')
+            store.put('1', 'llm', {'name': 'Cafe'})
+            assert not store.is_done('1', 'geocode')
+        finally:
+            artifact_store.STAGE_VERSIONS['transcribe'] = original
+
+        # A re-download with the same media but a fresh signed URL keeps the extraction outputs
+        store.put('1', 'download', {'video_file': 'a.mp4', 'stream': {'source': 'signed-url-2'}})
+        assert store.is_done('1', 'ocr')
+        store.put('1', 'download', {'video_file': 'b.mp4', 'stream': None})
+        assert not store.is_done('1', 'ocr') and not store.is_done('1', 'llm')
+
+def test_failed_input_reruns_dependents():
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        store.put('1', 'download', {'video_file': 'a.mp4'})
+        store.put('1', 'ocr', "menu")
+        store.mark_failed('1', 'transcribe', "whisper crashed")
+        # The pipeline carries on without the transcript
+        store.put('1', 'llm', {'name': 'Cafe'})
+        assert store.is_done('1', 'llm')
+
+        # Once a retry produces the transcript, the LLM stage has to see it
+        store.put('1', 'transcribe', "hello")
+        assert not store.is_done('1', 'llm')
+
+if __name__ == "__main__":
+    test_resume_and_invalidate()
+    test_content_addressed_and_versioned()
+    test_upstream_change_reruns_downstream()
+    test_failed_input_reruns_dependents()
+    print("All artifact store tests passed")
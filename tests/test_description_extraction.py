@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.video_processing.download_video import description_from_html
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+VIDEO_ID = '7185551271389072682'
+
+def test_description_from_rehydration_scripts():
+    for fixture in ('tiktok_video_page.html', 'tiktok_video_page_sigi.html'):
+        html = (FIXTURES / fixture).read_text(encoding='utf-8')
+        description = description_from_html(html, VIDEO_ID)
+        assert description.startswith("Best carbonara in Rome"), fixture
+
+    assert description_from_html("<html><script>var a = 1;</script></html>") is None
+
+if __name__ == "__main__":
+    test_description_from_rehydration_scripts()
+    print("All description extraction tests passed")
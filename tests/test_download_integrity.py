@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+import pytest
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.video_processing import download_video
+from src.services.video_processing.download_video import verify_download
+from src.services.video_processing.errors import DownloadIntegrityError
+from src.services.video_processing.media_probe import MediaInfo
+
+INFO = {'id': '123', 'vcodec': 'h264', 'duration': 30.0, 'filesize': 1000}
+
+@pytest.fixture
+def video_file(tmp_path, monkeypatch):
+    # Stand in for ffprobe/ffmpeg: the file holds the seconds the demuxer would find
+    monkeypatch.setattr(download_video, 'probe_media', lambda path: MediaInfo(duration=30.0, video_codec='h264'))
+    monkeypatch.setattr(download_video, 'demuxed_duration', lambda path: float(Path(path).read_bytes().strip()))
+    path = tmp_path / '123.mp4'
+    def write(seconds, size=1000):
+        path.write_bytes(str(seconds).encode().ljust(size))
+        return str(path)
+    return write
+
+def test_complete_download_passes(video_file):
+    assert verify_download(video_file(29.9), INFO).has_video
+
+def test_short_file_is_truncated(video_file):
+    with pytest.raises(DownloadIntegrityError, match="bytes"):
+        verify_download(video_file(30.0, size=600), INFO)
+
+def test_missing_duration_is_truncated(video_file):
+    # The container header still claims 30s; only the demuxed packets show the gap
+    with pytest.raises(DownloadIntegrityError, match="12.0s of 30.0s"):
+        verify_download(video_file(12.0), INFO)
+
+def test_unreadable_container(video_file, monkeypatch):
+    def fail(path):
+        raise RuntimeError("moov atom not found")
+    monkeypatch.setattr(download_video, 'demuxed_duration', fail)
+    with pytest.raises(DownloadIntegrityError, match="moov atom"):
+        verify_download(video_file(30.0), INFO)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,94 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+import pytest
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.video_processing import download_manager
+from src.services.video_processing.download_manager import DownloadManager, TokenBucket
+from src.services.video_processing.media_cache import MediaCache
+
+def test_token_bucket_paces_after_burst():
+    async def take(bucket, n):
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(take(TokenBucket(rate=20, capacity=5), 5)) < 0.05
+    # Burst of 5, then 5 more at 20/s
+    assert asyncio.run(take(TokenBucket(rate=20, capacity=5), 10)) >= 0.2
+    # No rate: unlimited
+    assert asyncio.run(take(TokenBucket(rate=0, capacity=1), 100)) < 0.05
+
+def test_download_all_bounds_concurrency(monkeypatch, tmp_path):
+    in_flight, peak = 0, 0
+
+    class FakeDownloader:
+        def __init__(self, config, session, throttle):
+            self.throttle = throttle
+            self.stream_source = None
+            self.media_info = None
+
+        async def process(self, url):
+            nonlocal in_flight, peak
+            await self.throttle(url)
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if url.endswith('/bad'):
+                raise RuntimeError("unavailable")
+            return url.rsplit('/', 1)[1], None, None, "", {}
+
+    monkeypatch.setattr(download_manager, 'VideoDownloader', FakeDownloader)
+    manager = DownloadManager(max_concurrent=3, host_rate=1000, host_burst=1000, download_config=object(),
+                              cache=MediaCache(root=str(tmp_path)))
+
+    async def collect():
+        urls = [f"https://www.tiktok.com/@a/video/{i}" for i in range(10)] + ["https://www.tiktok.com/bad"]
+        return [result async for result in manager.download_all(urls)]
+
+    results = asyncio.run(collect())
+    assert len(results) == 11 and peak == 3
+    assert [result.url for result in results if not result.ok] == ["https://www.tiktok.com/bad"]
+    assert manager.stats()['completed'] == 10 and manager.stats()['failed'] == 1
+
+    # The process-wide manager outlives the loop it first ran on
+    assert asyncio.run(manager.download("https://www.tiktok.com/@a/video/11")).video_id == '11'
+
+def test_download_all_raises_source_error(monkeypatch, tmp_path):
+    class FakeDownloader:
+        def __init__(self, config, session, throttle):
+            self.stream_source = None
+            self.media_info = None
+
+        async def process(self, url):
+            return url.rsplit('/', 1)[1], None, None, "", {}
+
+    monkeypatch.setattr(download_manager, 'VideoDownloader', FakeDownloader)
+    manager = DownloadManager(max_concurrent=2, host_rate=0, download_config=object(),
+                              cache=MediaCache(root=str(tmp_path)))
+
+    def urls():
+        yield "https://www.tiktok.com/@a/video/1"
+        raise ValueError("url file unreadable")
+
+    async def async_urls():
+        for url in urls():
+            yield url
+
+    async def collect(source):
+        return [result async for result in manager.download_all(source)]
+
+    for source in (urls, async_urls):
+        # Raises instead of leaving the workers waiting for more URLs
+        with pytest.raises(ValueError, match="unreadable"):
+            asyncio.run(asyncio.wait_for(collect(source()), timeout=5))
+
+if __name__ == "__main__":
+    test_token_bucket_paces_after_burst()
+    print("All download manager tests passed")
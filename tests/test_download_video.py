@@ -23,24 +23,19 @@ async def test_video_download():
     print("\nTest Results:")
     print(f"Video ID: {video_id}")
     print(f"Video File: {video_file}")
-    print(f"Audio File: {audio_file}")
+    print(f"Audio File: {audio_file} (audio is decoded from the video at transcription)")
     print(f"Description: {description[:100]}..." if description else "No description found")
     print(f"Creator Info: {creator_info}")  # Added creator info printing
     
     # Verify files exist
     print("\nVerifying files:")
     print(f"Video file exists: {os.path.exists(video_file)}")
-    print(f"Audio file exists: {os.path.exists(audio_file)}")
     
     # Print file sizes
     if os.path.exists(video_file):
         video_size = os.path.getsize(video_file) / (1024 * 1024)  # Convert to MB
         print(f"Video file size: {video_size:.2f} MB")
     
-    if os.path.exists(audio_file):
-        audio_size = os.path.getsize(audio_file) / (1024 * 1024)  # Convert to MB
-        print(f"Audio file size: {audio_size:.2f} MB")
-        
     return True
         
 
@@ -0,0 +1,72 @@
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+import pytest
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.models.models import VideoFailure
+from src.services.video_processing.artifact_store import ArtifactStore
+from src.services.video_processing.errors import PipelineStageError
+from src.utils import failure_ledger
+from src.utils.failure_ledger import failure_tracking
+
+def make_session():
+    engine = create_engine('sqlite://')
+    VideoFailure.__table__.create(engine)
+    return sessionmaker(bind=engine)()
+
+def test_backoff_then_quarantine():
+    db = make_session()
+    error = PipelineStageError('ocr', ValueError("no frames"))
+
+    first = failure_ledger.record_failure(db, '1', error, elapsed_seconds=30, cpu_used=20)
+    assert (first.stage, first.error_class, first.attempts) == ('ocr', 'ValueError', 1)
+    assert failure_ledger.is_blocked(db, '1') and not first.quarantined
+
+    for _ in range(failure_ledger.QUARANTINE_ATTEMPTS - 1):
+        failure = failure_ledger.record_failure(db, '1', error, elapsed_seconds=30, cpu_used=20)
+    assert failure.quarantined
+    assert failure_ledger.blocked_video_ids(db, ['1', '2']) == {'1'}
+
+    summary = failure_ledger.failure_summary(db)
+    assert summary[0]['attempts'] == failure_ledger.QUARANTINE_ATTEMPTS
+    assert summary[0]['quarantined'] == 1
+
+    assert failure_ledger.release(db, '1')
+    assert not failure_ledger.is_blocked(db, '1')
+
+def test_stage_left_failed_counts_as_failure(tmp_path, monkeypatch):
+    db = make_session()
+    store = ArtifactStore(str(tmp_path))
+
+    @contextmanager
+    def test_scope():
+        yield db
+        db.commit()
+    monkeypatch.setattr(failure_ledger, 'session_scope', test_scope)
+    monkeypatch.setattr(failure_ledger, 'get_artifact_store', lambda: store)
+
+    # Transcription failed but the run carried on and stored what it had
+    with pytest.raises(PipelineStageError):
+        with failure_tracking('1'):
+            store.mark_failed('1', 'transcribe', "CUDA out of memory")
+            store.put('1', 'ocr', "menu")
+    failure = db.get(VideoFailure, '1')
+    assert (failure.stage, failure.error_class, failure.attempts) == ('transcribe', 'StageFailedError', 1)
+
+    # Only a run that completes every stage clears the history
+    with failure_tracking('1'):
+        store.put('1', 'transcribe', "hello")
+    assert db.get(VideoFailure, '1') is None
+
+if __name__ == "__main__":
+    test_backoff_then_quarantine()
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test_stage_left_failed_counts_as_failure(Path(tmp_dir), monkeypatch)
+    print("All failure ledger tests passed")
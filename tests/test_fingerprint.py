@@ -0,0 +1,94 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+import numpy as np
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.models.models import VideoFingerprint
+from src.services.video_processing.fingerprint import BKTree, Fingerprint, _audio_hash, _frame_hash, hamming
+from src.utils.fingerprint_index import FingerprintIndex
+
+def make_session():
+    engine = create_engine('sqlite://')
+    VideoFingerprint.__table__.create(engine)
+    return sessionmaker(bind=engine)()
+
+def scene(seed, height=540, width=304):
+    rng = np.random.default_rng(seed)
+    # Smooth shapes rather than noise, like real frames
+    small = rng.integers(0, 255, (6, 4, 3), dtype=np.uint8)
+    return np.kron(small, np.ones((height // 6, width // 4, 1), dtype=np.uint8))
+
+def reencode(frame, seed):
+    # Re-upload: scaled down and noisy
+    noisy = frame[::2, ::2].astype(np.int16) + np.random.default_rng(seed).integers(-12, 12, frame[::2, ::2].shape)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+def fingerprint(frames, audio, duration=30.0):
+    return Fingerprint([_frame_hash(frame) for frame in frames], _audio_hash(audio), duration)
+
+def test_reupload_matches_and_other_video_does_not():
+    envelope = np.repeat(np.random.default_rng(0).random(200), 600).astype(np.float32)
+    tone = np.sin(np.arange(len(envelope)) / 3).astype(np.float32)
+    original = fingerprint([scene(i) for i in range(5)], envelope * tone)
+    reupload = fingerprint([reencode(scene(i), i) for i in range(5)], 0.5 * envelope * tone, duration=30.4)
+    other = fingerprint([scene(i + 10) for i in range(5)], envelope * tone)
+
+    assert original.is_near_duplicate(reupload)
+    assert not original.is_near_duplicate(other)
+    # Same shots, different soundtrack
+    assert not original.is_near_duplicate(Fingerprint(reupload.frames, reupload.audio ^ (2 ** 40 - 1), 30.0))
+    assert Fingerprint.from_dict(original.to_dict()) == original
+    assert _audio_hash(np.zeros(16000, np.float32)) is None
+
+def test_bk_tree_radius_search():
+    rng = np.random.default_rng(1)
+    keys = [int(value) for value in rng.integers(0, 2 ** 63, 500, dtype=np.int64)]
+    tree = BKTree()
+    for i, key in enumerate(keys):
+        tree.add(key, i)
+    query = keys[7] ^ 0b1011
+    found = {value for _, value in tree.search(query, 5)}
+    assert found == {i for i, key in enumerate(keys) if hamming(key, query) <= 5}
+    assert 7 in found and len(tree) == 500
+
+def test_index_resolves_copies_to_the_original():
+    db = make_session()
+    index = FingerprintIndex()
+    original = Fingerprint([1, 2 ** 40, 2 ** 50 + 3], 12345, 20.0)
+    copy = Fingerprint([3, 2 ** 40 + 1, 2 ** 50 + 3], 12345, 20.2)
+
+    assert index.find_duplicate(db, '1', original) is None
+    index.record(db, '1', original)
+    index.record(db, '2', copy, duplicate_of='1')
+    db.commit()
+
+    # A fresh process loads the index from the table
+    fresh = FingerprintIndex()
+    assert fresh.find_duplicate(db, '3', copy) == '1'
+    assert fresh.find_duplicate(db, '1', original) == '1'  # Its copy points back at it
+    assert fresh.find_duplicate(db, '4', Fingerprint([~1 & (2 ** 64 - 1)] * 3, None, 20.0)) is None
+
+def test_refresh_loads_late_commits_with_earlier_timestamps():
+    db = make_session()
+    index = FingerprintIndex()
+    index.record(db, '1', Fingerprint([1, 2, 3], None, 20.0))
+    db.commit()
+    assert index.refresh(db) == 0
+
+    # Committed by another node after that refresh, stamped a minute earlier
+    db.add(VideoFingerprint(video_id='2', frame_hashes='%016x' % 2 ** 40, duration=20.0,
+                            created_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+    assert index.refresh(db) == 1 and '2' in index.fingerprints
+
+if __name__ == "__main__":
+    test_reupload_matches_and_other_video_does_not()
+    test_bk_tree_radius_search()
+    test_index_resolves_copies_to_the_original()
+    test_refresh_loads_late_commits_with_earlier_timestamps()
+    print("All fingerprint tests passed")
@@ -0,0 +1,44 @@
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.models.models import Job
+from src.utils import job_queue
+from src.utils.job_queue import STATUS_QUEUED, JobDeferred
+
+def test_deferred_job_is_requeued_without_using_an_attempt(monkeypatch):
+    engine = create_engine('sqlite://')
+    Job.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+
+    @contextmanager
+    def test_scope():
+        yield db
+        db.commit()
+    monkeypatch.setattr(job_queue, 'session_scope', test_scope)
+
+    job_queue.enqueue(db, [{'video_id': '1', 'url': 'https://www.tiktok.com/@a/video/1'}])
+    retry_at = datetime.utcnow() + timedelta(hours=1)
+
+    def handler(job):
+        # e.g. the failure ledger has the video backing off for another hour
+        raise JobDeferred(retry_at, "backing off")
+
+    assert job_queue.run_worker(handler, drain=True) == 0
+    job = db.get(Job, 1)
+    db.refresh(job)
+    assert (job.status, job.attempts, job.available_at) == (STATUS_QUEUED, 0, retry_at)
+    # Not leasable until the backoff is over, instead of being completed
+    assert job_queue.lease(db) is None
+
+if __name__ == "__main__":
+    import pytest
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_deferred_job_is_requeued_without_using_an_attempt(monkeypatch)
+    print("All job queue tests passed")
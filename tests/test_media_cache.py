@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.video_processing.media_cache import MediaCache
+
+def write_media(directory, name, size, fill=b'x'):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(fill * size)
+    return path
+
+def test_lru_eviction_skips_pinned(tmp_path):
+    staging = str(tmp_path / 'staging')
+    os.makedirs(staging)
+    cache = MediaCache(root=str(tmp_path / 'cache'), max_bytes=2500)
+
+    first = cache.add('1', 'video', write_media(staging, '1.mp4', 1000, b'a'))
+    second = cache.add('2', 'video', write_media(staging, '2.mp4', 1000, b'b'))
+    assert not os.path.exists(os.path.join(staging, '1.mp4'))
+    # Identical content is stored once
+    assert cache.add('1-repost', 'video', write_media(staging, '3.mp4', 1000, b'a')) == first
+
+    past = time.time() - 60
+    os.utime(first, (past, past))
+    os.utime(second, (past + 1, past + 1))
+    assert cache.get('2', 'video') == second  # Now the most recently used
+
+    with cache.pin('1'):
+        cache.add('4', 'video', write_media(staging, '4.mp4', 1000, b'c'))
+        # Over budget: video 1 is older but pinned, so video 2 goes
+        assert cache.get('1', 'video') == first
+        assert cache.get('2', 'video') is None
+    assert cache.usage() <= 2500
+
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_lru_eviction_skips_pinned(Path(tmp_dir))
+    print("All media cache tests passed")
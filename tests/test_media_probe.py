@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.video_processing.media_probe import MediaInfo, _parse_probe, skip_reasons
+
+def test_parse_probe_rotated_portrait():
+    info = _parse_probe({
+        'format': {'duration': '12.5', 'size': '1000'},
+        'streams': [
+            {'codec_type': 'video', 'codec_name': 'h264', 'width': 1920, 'height': 1080,
+             'avg_frame_rate': '30000/1001', 'side_data_list': [{'rotation': -90}]},
+            {'codec_type': 'audio', 'codec_name': 'aac'},
+        ],
+    })
+    # Decoded frames come out auto-rotated, so the displayed size is transposed
+    assert (info.width, info.height) == (1080, 1920)
+    assert round(info.fps, 2) == 29.97
+    assert info.has_audio and info.duration == 12.5
+    assert MediaInfo.from_dict(info.to_dict()) == info
+
+def test_skip_reasons():
+    assert skip_reasons(MediaInfo(duration=30, video_codec='h264', audio_codec='aac')) == {}
+    assert set(skip_reasons(MediaInfo(duration=1, video_codec='h264', audio_codec='aac'))) == {'transcribe', 'ocr'}
+    assert set(skip_reasons(MediaInfo(duration=30, video_codec='h264'))) == {'transcribe'}
+    assert set(skip_reasons(MediaInfo(duration=30, audio_codec='aac'), audio_only=True)) == {'ocr'}
+    # No probe (older download records): only the policy decides
+    assert skip_reasons(None) == {}
+
+if __name__ == "__main__":
+    test_parse_probe_rotated_portrait()
+    test_skip_reasons()
+    print("All media probe tests passed")
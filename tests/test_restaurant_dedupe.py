@@ -0,0 +1,66 @@
+import math
+import random
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.restaurant_dedupe import (
+    RestaurantPoint,
+    build_merge_map,
+    distance_meters,
+    find_duplicate_groups,
+    grid_cell,
+    neighbour_cells,
+    normalize_name,
+)
+
+def make_point(restaurant_id, name, latitude, longitude, video_count=0):
+    return RestaurantPoint(restaurant_id, name, normalize_name(name), latitude, longitude, video_count)
+
+def test_normalize_name():
+    assert normalize_name("Café de l'Écluse") == "cafe de l ecluse"
+    assert normalize_name("The Pancake Bakery Restaurant") == "pancake bakery"
+    assert normalize_name("Bar & Grill") == "bar and grill"
+
+def test_nearby_points_share_or_neighbour_cells():
+    a = grid_cell(52.3731, 4.8922, 150)
+    b = grid_cell(52.3740, 4.8930, 150)
+    assert b in neighbour_cells(a, 150)
+
+def test_neighbour_cells_hold_far_from_longitude_zero():
+    rng = random.Random(0)
+    # Amsterdam, Tokyo, Los Angeles, New York, Sydney, Reykjavik
+    for latitude, longitude in ((52.37, 4.89), (35.68, 139.69), (34.05, -118.24),
+                                (40.71, -74.01), (-33.87, 151.21), (64.15, -21.94)):
+        for _ in range(2000):
+            a = (latitude + rng.uniform(-0.05, 0.05), longitude + rng.uniform(-0.05, 0.05))
+            bearing, distance = rng.uniform(0, 2 * math.pi), rng.uniform(0, 150)
+            b = (a[0] + math.degrees(distance * math.cos(bearing) / 6371000),
+                 a[1] + math.degrees(distance * math.sin(bearing) / 6371000 / math.cos(math.radians(a[0]))))
+            if distance_meters(*a, *b) > 150:
+                continue
+            assert grid_cell(*b, 150) in neighbour_cells(grid_cell(*a, 150), 150), (a, b)
+
+def test_find_duplicate_groups():
+    points = [
+        make_point(1, "Pancake Bakery", 52.37730, 4.88420, video_count=1),
+        make_point(2, "The Pancake Bakery", 52.37735, 4.88425, video_count=3),
+        # Same name far away: a different branch
+        make_point(3, "Pancake Bakery", 52.09070, 5.12140),
+        # Next door but a different restaurant
+        make_point(4, "Bar Centraal", 52.37732, 4.88421),
+    ]
+    groups = find_duplicate_groups(points)
+    assert [sorted(p.id for p in group) for group in groups] == [[1, 2]]
+
+    # The restaurant with the most videos is kept
+    assert build_merge_map(groups) == {1: 2}
+
+if __name__ == "__main__":
+    test_normalize_name()
+    test_nearby_points_share_or_neighbour_cells()
+    test_neighbour_cells_hold_far_from_longitude_zero()
+    test_find_duplicate_groups()
+    print("All restaurant dedupe tests passed")
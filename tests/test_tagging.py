@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+from src.models.models import Restaurant, Tag, restaurant_tags
+from src.utils import tagging
+
+def make_session():
+    engine = create_engine('sqlite://')
+    for table in (Restaurant.__table__, Tag.__table__, restaurant_tags):
+        table.create(engine)
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    return sessionmaker(bind=engine)(), statements
+
+def test_repeated_assigns_hit_the_cache():
+    tagging.clear_tag_cache()
+    db, statements = make_session()
+    db.add_all([Restaurant(id=i, name=f"r{i}", location="", city="", location_link="") for i in (1, 2)])
+    db.commit()
+
+    # Tags created in a rolled back transaction are neither kept nor cached
+    tagging.assign(db, ["curated"], [1])
+    db.rollback()
+    assert db.scalar(select(func.count(Tag.id))) == 0
+
+    tagging.assign(db, ["curated", "michelin"], [1])
+    db.commit()
+
+    statements.clear()
+    assert tagging.assign(db, ["curated", "michelin"], [2]) == 2
+    db.commit()
+    # Only the association insert: tag ids came from the cache
+    assert len(statements) == 1 and 'restaurant_tags' in statements[0]
+
+    # After consolidation the ids are looked up again
+    tagging.clear_tag_cache()
+    statements.clear()
+    tagging.assign(db, ["curated"], [2])
+    assert any('FROM tags' in statement for statement in statements[:-1])
+
+if __name__ == "__main__":
+    test_repeated_assigns_hit_the_cache()
+    print("All tagging tests passed")
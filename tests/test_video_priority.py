@@ -0,0 +1,42 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.video_priority import CandidateQueue, restaurant_likelihood, score_video
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+def test_score_prefers_reach_recency_and_restaurants():
+    base = dict(likes=1000, created_at=NOW - timedelta(days=10), description="best ramen in town #foodie", now=NOW)
+    assert score_video(views=1_000_000, **base) > score_video(views=10_000, **base)
+
+    fresh = score_video(100_000, 5000, NOW - timedelta(days=1), "dinner at this restaurant", now=NOW)
+    old = score_video(100_000, 5000, NOW - timedelta(days=720), "dinner at this restaurant", now=NOW)
+    assert fresh > old
+
+    food = score_video(100_000, 5000, NOW, "sushi restaurant #foodie", now=NOW)
+    dance = score_video(100_000, 5000, NOW, "new dance trend", now=NOW)
+    assert food > dance
+    assert restaurant_likelihood("new dance trend") == 0
+
+def test_candidate_queue_orders_and_dedupes():
+    queue = CandidateQueue([
+        {'video_id': '1', 'url': 'a', 'priority': 2.0},
+        {'video_id': '2', 'url': 'b', 'priority': 5.0},
+        {'video_id': '3', 'url': 'c', 'priority': 1.0},
+    ])
+    # Seen again with a higher score: moves up, still only once in the queue
+    queue.push({'video_id': '3', 'url': 'c'}, priority=9.0)
+    queue.push({'video_id': '2', 'url': 'b'}, priority=0.5)
+
+    assert len(queue) == 3
+    assert [video['video_id'] for video in queue.drain()] == ['3', '2', '1']
+    assert len(queue) == 0
+
+if __name__ == "__main__":
+    test_score_prefers_reach_recency_and_restaurants()
+    test_candidate_queue_orders_and_dedupes()
+    print("All video priority tests passed")
@@ -3,15 +3,13 @@ import os
 from pathlib import Path
 import logging
 import asyncio
-import concurrent.futures
 import time
 
 # Add the parent directory to Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from src.services.video_processing.download_video import VideoDownloader
-from src.services.video_processing.extract_audio import AudioExtractor
-from src.services.video_processing.extract_text_paddleocr import TextExtractor
+from src.services.video_processing.stage_executor import AUDIO_STAGE, get_stage_executor
 from src.services.video_processing.utils import query_chatgpt, search_location, store_video_data
 
 # Set up logging
@@ -37,43 +35,17 @@ async def process_video(url: str):
         video_id, video_file, audio_file, description, creator_info = await VideoDownloader().process(url)
         logger.info(f"Download completed. Video ID: {video_id}")
         
-        # 2. Extract audio and text in parallel using ThreadPoolExecutor
+        # 2. Extract audio and text concurrently in separate worker processes.
+        # There is no WAV any more (audio_file is None); audio is decoded from the video file.
         logger.info("Starting parallel audio and text extraction...")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            # Submit both tasks
-            audio_future = executor.submit(
-                AudioExtractor().transcribe_audio, 
-                audio_file
-            )
-            text_future = executor.submit(
-                TextExtractor().extract_text,
-                video_file,
-                video_id
-            )
-            
-            # Wait for both tasks to complete
-            completed_tasks = concurrent.futures.wait(
-                [audio_future, text_future],
-                return_when=concurrent.futures.ALL_COMPLETED
-            )
-
-            # Get audio data
-            try:
-                audio_data = audio_future.result()
-                logger.info(f"Audio extraction completed. Length: {len(audio_data)}")
-                logger.debug(f"Audio data: {audio_data[:100]}...")
-            except Exception as e:
-                logger.error(f"Audio extraction failed: {str(e)}", exc_info=True)
-                audio_data = ""
-            
-            # Get text data
-            try:
-                text_data = text_future.result()
-                logger.info(f"Text extraction completed. Length: {len(text_data)}")
-                logger.debug(f"Extracted text: {text_data[:100]}...")
-            except Exception as e:
-                logger.error(f"Text extraction failed: {str(e)}", exc_info=True)
-                text_data = ""
+        audio_data, text_data, stage_timings = get_stage_executor().run_extraction(
+            audio_file or video_file,
+            video_file,
+            video_id
+        )
+        # A failed stage yields "" and is left out of the timings
+        assert AUDIO_STAGE in stage_timings, "transcription failed"
+        assert audio_data, "empty transcript"
         
         # 3. Extract location from text
         logger.info("Starting ChatGPT query...")